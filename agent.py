@@ -1,7 +1,10 @@
-from autogen import ConversableAgent
+import threading
+from autogen import ConversableAgent, LLMConfig
 from config import llm_config
 
-from tool import provide_analysis_plan, route_to_agent, get_log, provide_log_result, get_metric, provide_metric_result, get_trace, provide_trace_result, prepare_vote, complete_vote, provide_final_report
+from tool import provide_analysis_plan, route_to_agent, list_cases, get_log, get_log_templates, provide_log_result, get_metric, provide_metric_result, get_trace, get_trace_critical_path, provide_trace_result, get_correlation, prepare_vote, complete_vote, provide_final_report
+
+from consensus import reviewer_names
 
 from prompt import (
     plan_agent_prompt,
@@ -10,78 +13,106 @@ from prompt import (
     logic_validator_prompt, data_consistency_validator_prompt, feasibility_validator_prompt
 )
 
+# 评审专家的复审角度：(系统提示词, 描述)
+reviewer_roles = [
+    (logic_validator_prompt, "验证分析推理的逻辑严谨性。"),
+    (data_consistency_validator_prompt, "校验分析中数据的一致性和准确性。"),
+    (feasibility_validator_prompt, "评估建议措施的实施可行性和风险。"),
+]
 
-with llm_config:
-    plan_agent = ConversableAgent(
-        name="plan_agent",
-        system_message=plan_agent_prompt,
-        functions=[provide_analysis_plan, route_to_agent],
-        description="生成并管理待办流程的智能体"
-    )
-    
-    log_agent = ConversableAgent(
-        name="log_agent",
-        system_message=log_agent_prompt,
-        functions=[get_log, provide_log_result],
-        description="分析系统日志并提供根因线索。"
-    )
+# `with llm_config:` 把上下文令牌保存在共享的 llm_config 实例上，多个线程同时创建智能体会互相覆盖令牌
+_create_lock = threading.Lock()
 
-    metric_agent = ConversableAgent(
-        name="metric_agent",
-        system_message=metric_agent_prompt,
-        functions=[get_metric, provide_metric_result],
-        description="分析系统监控指标并识别资源和性能异常。"
-    )
 
-    trace_agent = ConversableAgent(
-        name="trace_agent",
-        system_message=trace_agent_prompt,
-        functions=[get_trace, provide_trace_result],
-        description="分析调用链数据并识别性能瓶颈和异常调用。"
-    )
-    
-    review_agent = ConversableAgent(
-        name="review_agent",
-        system_message=review_agent_prompt,
-        functions=[prepare_vote],
-        description="发起复审并协调投票流程。"
-    )
+def pooled_llm_config(http_client) -> LLMConfig:
+    """
+    复制 config.llm_config，各配置项改用给定的 httpx 客户端（共享连接池）；全局的 llm_config 保持不变
+    """
+    options = {key: value for key, value in llm_config.model_dump().items() if key != "config_list"}
+    entries = [entry.model_copy(update={"http_client": http_client}) for entry in llm_config.config_list]
+    return LLMConfig(*entries, **options)
+
 
-    reviewers = [
-        ConversableAgent(
-            name="agent_a", 
-            system_message=logic_validator_prompt, 
-            description="验证分析推理的逻辑严谨性。"
-        ),
-        ConversableAgent(
-            name="agent_b", 
-            system_message=data_consistency_validator_prompt,
-            description="校验分析中数据的一致性和准确性。"
-        ),
-        ConversableAgent(
-            name="agent_c", 
-            system_message=feasibility_validator_prompt, 
-            description="评估建议措施的实施可行性和风险。"
+def create_agents(human_input_mode: str = "ALWAYS", llm: LLMConfig = None) -> dict:
+    """
+    创建一套全新的智能体实例，每次分析运行独立使用；llm 默认取 config.llm_config
+    """
+    with _create_lock, (llm or llm_config):
+        plan_agent = ConversableAgent(
+            name="plan_agent",
+            system_message=plan_agent_prompt,
+            functions=[provide_analysis_plan, route_to_agent, list_cases],
+            description="生成并管理待办流程的智能体"
         )
-    ]
 
-    vote_agent = ConversableAgent(
-        name="vote_agent",
-        system_message=vote_agent_prompt,
-        functions=[complete_vote],
-        description="统计复审投票并判断是否通过。"
-    )
+        log_agent = ConversableAgent(
+            name="log_agent",
+            system_message=log_agent_prompt,
+            functions=[get_log, get_log_templates, provide_log_result],
+            description="分析系统日志并提供根因线索。"
+        )
+
+        metric_agent = ConversableAgent(
+            name="metric_agent",
+            system_message=metric_agent_prompt,
+            functions=[get_metric, provide_metric_result],
+            description="分析系统监控指标并识别资源和性能异常。"
+        )
+
+        trace_agent = ConversableAgent(
+            name="trace_agent",
+            system_message=trace_agent_prompt,
+            functions=[get_trace, get_trace_critical_path, provide_trace_result],
+            description="分析调用链数据并识别性能瓶颈和异常调用。"
+        )
+
+        review_agent = ConversableAgent(
+            name="review_agent",
+            system_message=review_agent_prompt,
+            functions=[prepare_vote],
+            description="发起复审并协调投票流程。"
+        )
+
+        # 评审专家按 逻辑验证 / 数据一致性 / 建议可行性 三个角度轮流分配，数量由 reviewer_count 配置
+        reviewers = [
+            ConversableAgent(
+                name=name,
+                system_message=reviewer_roles[i % len(reviewer_roles)][0],
+                description=reviewer_roles[i % len(reviewer_roles)][1]
+            )
+            for i, name in enumerate(reviewer_names)
+        ]
+
+        vote_agent = ConversableAgent(
+            name="vote_agent",
+            system_message=vote_agent_prompt,
+            functions=[complete_vote],
+            description="统计复审投票并判断是否通过。"
+        )
+
+        report_agent = ConversableAgent(
+            name="report_agent",
+            system_message=report_agent_prompt,
+            functions=[get_correlation, provide_final_report],
+            description="整合分析结果并生成综合根因分析报告。"
+        )
 
-    report_agent = ConversableAgent(
-        name="report_agent",
-        system_message=report_agent_prompt,
-        functions=[provide_final_report],
-        description="整合分析结果并生成综合根因分析报告。"
+    # 用户代理，用于接收用户输入；无人值守（NEVER）时不自动回复，流程交回用户即结束
+    user_proxy = ConversableAgent(
+        name="user_proxy ",
+        human_input_mode=human_input_mode,
+        max_consecutive_auto_reply=0 if human_input_mode == "NEVER" else None,
+        description="代表用户在对话中提供输入。"
     )
 
-# 用户代理，用于接收用户输入
-user_proxy = ConversableAgent(
-    name="user_proxy ",
-    human_input_mode="ALWAYS",
-    description="代表用户在对话中提供输入。"
-)
\ No newline at end of file
+    return {
+        "plan_agent": plan_agent,
+        "log_agent": log_agent,
+        "metric_agent": metric_agent,
+        "trace_agent": trace_agent,
+        "review_agent": review_agent,
+        "reviewers": reviewers,
+        "vote_agent": vote_agent,
+        "report_agent": report_agent,
+        "user_proxy": user_proxy,
+    }
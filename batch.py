@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+from catalog import case_sort_key
+
+import config
+
+# 批量运行的默认并发进程数和结果目录
+batch_workers = getattr(config, "batch_workers", 4)
+batch_output_path = getattr(config, "batch_output_path", "result")
+
+
+def parse_case_ids(spec: str) -> List[str]:
+    """
+    解析案例ID列表，支持逗号分隔和区间写法，如 "1-10,15,20"；"all" 表示数据集清单中的全部案例
+    """
+    if spec.strip() == "all":
+        from catalog import load_catalog
+        return sorted(load_catalog(), key=case_sort_key)
+    case_ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            case_ids.extend(str(i) for i in range(int(start), int(end) + 1))
+        else:
+            case_ids.append(part)
+    # 去重并保持输入顺序
+    return list(dict.fromkeys(case_ids))
+
+
+def run_one(case_id: str, output_dir: str, max_rounds: int, cache_mode: str = None, resume: bool = False, compaction: str = None) -> dict:
+    """
+    在子进程中运行单个案例，输出写入 case_<id>.log，结果写入 case_<id>.json，运行记录写入 case_<id>.trace.jsonl，
+    检查点写入 checkpoints/ 目录；resume 时从检查点中最近一个已通过复审的阶段继续
+    """
+    log_file = os.path.join(output_dir, f"case_{case_id}.log")
+    record = {"case_id": case_id, "status": "ok", "error": "", "rounds": 0, "last_agent": ""}
+    final_context = {}
+
+    start = time.perf_counter()
+    with open(log_file, "a" if resume else "w", encoding="utf-8") as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
+        try:
+            # 延迟到子进程内导入，每个案例都会创建全新的上下文变量和智能体实例
+            from workflow import run_case
+            chat_result, context_variables, last_agent = run_case(
+                case_id, human_input_mode="NEVER", max_rounds=max_rounds, cache_mode=cache_mode,
+                trace_file=os.path.join(output_dir, f"case_{case_id}.trace.jsonl"),
+                checkpoint_dir=os.path.join(output_dir, "checkpoints"), resume=resume, compaction=compaction
+            )
+            final_context = context_variables.to_dict()
+            record["rounds"] = len(chat_result.chat_history)
+            record["last_agent"] = getattr(last_agent, "name", "")
+            if final_context.get("workflow_stage") != "final_report":
+                record["status"] = "incomplete"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+
+    with open(os.path.join(output_dir, f"case_{case_id}.json"), "w", encoding="utf-8") as f:
+        json.dump({**record, "context_variables": final_context}, f, ensure_ascii=False, indent=2, default=str)
+    return record
+
+
+def summarize(records: List[dict], wall_seconds: float) -> dict:
+    """
+    汇总批量运行的吞吐量统计
+    """
+    elapsed = sorted(r["elapsed_seconds"] for r in records)
+    status_counts = {}
+    for r in records:
+        status_counts[r["status"]] = status_counts.get(r["status"], 0) + 1
+    return {
+        "total_cases": len(records),
+        "status_counts": status_counts,
+        "wall_seconds": round(wall_seconds, 3),
+        "cases_per_minute": round(len(records) / wall_seconds * 60, 3) if wall_seconds > 0 else 0,
+        "case_seconds": {
+            "mean": round(sum(elapsed) / len(elapsed), 3) if elapsed else 0,
+            "p50": elapsed[len(elapsed) // 2] if elapsed else 0,
+            "max": elapsed[-1] if elapsed else 0,
+        },
+        "cases": sorted(records, key=lambda r: case_sort_key(r["case_id"])),
+    }
+
+
+def run_batch(case_ids: List[str], output_dir: str = None, max_workers: int = batch_workers, max_rounds: int = 100, cache_mode: str = None, resume: bool = False, compaction: str = None) -> dict:
+    """
+    在进程池中以有限并发运行多个案例，返回并写出汇总结果 summary.json；resume 时在已有的结果目录中从检查点继续
+    """
+    output_dir = output_dir or os.path.join(batch_output_path, f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    records = []
+    start = time.perf_counter()
+    # spawn 启动方式保证每个子进程不继承父进程的智能体、线程和网络连接状态
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(run_one, case_id, output_dir, max_rounds, cache_mode, resume, compaction): case_id for case_id in case_ids}
+        for future in as_completed(futures):
+            case_id = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"case_id": case_id, "status": "error", "error": f"{type(e).__name__}: {e}", "elapsed_seconds": 0.0}
+            records.append(record)
+            print(f"[{len(records)}/{len(case_ids)}] 案例 {case_id}: {record['status']}，耗时 {record['elapsed_seconds']} 秒")
+
+    summary = summarize(records, time.perf_counter() - start)
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"共 {summary['total_cases']} 个案例，状态：{summary['status_counts']}，"
+          f"总耗时 {summary['wall_seconds']} 秒，吞吐量 {summary['cases_per_minute']} 个/分钟")
+    print(f"结果目录：{output_dir}")
+    return summary
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="批量运行根因分析工作流")
+    parser.add_argument("--cases", required=True, help='案例ID列表，如 "1-10,15,20"，或 "all" 表示数据集中的全部案例')
+    parser.add_argument("--shard", default=None, help='只运行第 K 个分片（共 N 个，按数据量均衡划分），格式 "K/N"，K 从 0 开始')
+    parser.add_argument("--workers", type=int, default=batch_workers, help="并发进程数")
+    parser.add_argument("--output", default=None, help="结果输出目录")
+    parser.add_argument("--max-rounds", type=int, default=100, help="每个案例的最大对话轮数")
+    parser.add_argument("--llm-cache", choices=["record", "replay", "bypass"], default=None, help="LLM 响应缓存模式，默认取 config.llm_cache_mode")
+    parser.add_argument("--resume", action="store_true", help="从 --output 目录中的检查点继续，已通过复审的阶段不再重跑")
+    parser.add_argument("--compaction", choices=["stage", "off"], default=None, help="对话压缩模式，默认取 config.compaction_mode")
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        sys.exit("--resume 需要通过 --output 指定之前的结果目录")
+
+    case_ids = parse_case_ids(args.cases)
+    if args.shard:
+        from catalog import shard_cases
+        index, shards = (int(v) for v in args.shard.split("/"))
+        case_ids = shard_cases(case_ids, shards, index)
+    if not case_ids:
+        sys.exit("没有需要运行的案例")
+    run_batch(case_ids, output_dir=args.output, max_workers=args.workers, max_rounds=args.max_rounds, cache_mode=args.llm_cache, resume=args.resume, compaction=args.compaction)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+服务级别日志聚合基准：对比逐服务布尔掩码循环与单次分组聚合引擎在服务数增长时的耗时
+
+用法：python benchmarks/bench_log_services.py --rows 200000 --services 10,100,500,1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_engine import aggregate_services
+
+
+def make_logs(rows: int, services: int, seed: int = 0) -> pd.DataFrame:
+    """
+    生成按时间排序的合成日志数据
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(1_700_000_000 + rng.uniform(0, 3600, rows))
+    df = pd.DataFrame({
+        "timestamp": timestamps,
+        "level": rng.choice(["INFO", "WARN", "ERROR", "DEBUG"], rows, p=[0.8, 0.1, 0.05, 0.05]),
+        "service": rng.choice([f"service-{i}" for i in range(services)], rows),
+    })
+    df["datetime"] = pd.to_datetime(df["timestamp"], unit="s")
+    return df
+
+
+def loop_service_analysis(df: pd.DataFrame) -> dict:
+    """
+    原实现：每个服务对整表做一次布尔掩码，再对 ERROR 级别做一次掩码，复杂度 O(服务数 × 行数)
+    """
+    service_analysis = {}
+    for service in df["service"].unique():
+        service_logs = df[df["service"] == service]
+        service_errors = service_logs[service_logs["level"] == "ERROR"]
+        service_analysis[service] = {
+            "total_logs": len(service_logs),
+            "error_logs": len(service_errors),
+            "error_time_range": {
+                "start": service_errors["datetime"].min() if len(service_errors) > 0 else None,
+                "end": service_errors["datetime"].max() if len(service_errors) > 0 else None
+            }
+        }
+    return service_analysis
+
+
+def grouped_service_analysis(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    新实现：一次分组聚合得到全部服务的统计
+    """
+    return aggregate_services(df["datetime"], df["level"], df["service"])
+
+
+def best_of(func, df: pd.DataFrame, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="服务级别日志聚合基准")
+    parser.add_argument("--rows", type=int, default=200_000, help="日志行数")
+    parser.add_argument("--services", default="10,100,500,1000", help="逗号分隔的服务数列表")
+    parser.add_argument("--repeat", type=int, default=3, help="每组重复次数，取最小值")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'服务数':>8} {'循环(秒)':>12} {'分组聚合(秒)':>14} {'加速比':>8}")
+    for services in [int(s) for s in args.services.split(",")]:
+        df = make_logs(args.rows, services)
+        loop_seconds = best_of(loop_service_analysis, df, args.repeat)
+        grouped_seconds = best_of(grouped_service_analysis, df, args.repeat)
+        speedup = loop_seconds / grouped_seconds if grouped_seconds > 0 else float("inf")
+        results.append({
+            "rows": args.rows,
+            "services": services,
+            "loop_seconds": round(loop_seconds, 6),
+            "grouped_seconds": round(grouped_seconds, 6),
+            "speedup": round(speedup, 2),
+        })
+        print(f"{services:>8} {loop_seconds:>12.4f} {grouped_seconds:>14.4f} {speedup:>8.1f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+分析工具基准：在不同规模的合成案例上测量 get_log / get_log_templates / get_metric / get_trace 的耗时和峰值内存（RSS）
+
+每个 (规模, 工具) 组合在独立的子进程中运行，峰值 RSS 互不干扰；首次调用（cold）前清除案例的列式缓存，
+包含 CSV 解析和缓存构建，之后的重复调用（warm）读取缓存，取最小耗时。结果写为 JSON，可用 --compare 与另一次提交的结果对比。
+
+用法：
+    python benchmarks/bench_tools.py --sizes small,medium --output bench.json
+    python benchmarks/bench_tools.py --sizes 500000x100 --compare bench_base.json
+"""
+import os
+import sys
+import json
+import shutil
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from gen_cases import generate_case
+
+# 预设规模：日志行数 x 服务数（调用链数量为日志行数的 1/20，每条 5 个跨度）
+SIZE_PRESETS = {
+    "small": (20_000, 10),
+    "medium": (200_000, 50),
+    "large": (2_000_000, 200),
+}
+TOOLS = ["get_log", "get_log_templates", "get_metric", "get_trace"]
+CASE_FILES = ["logs.csv", "metrics.csv", "traces.csv"]
+
+
+def parse_sizes(spec: str) -> list:
+    """
+    解析规模列表，支持预设名称和 <日志行数>x<服务数> 写法，如 "small,500000x100"
+    """
+    sizes = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part in SIZE_PRESETS:
+            rows, services = SIZE_PRESETS[part]
+        else:
+            rows, services = (int(v) for v in part.lower().split("x"))
+        sizes.append((part, rows, services))
+    return sizes
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB，macOS 下为字节
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+
+
+def measure_tool(dataset: str, case_id: str, tool_name: str, repeat: int, queue) -> None:
+    """
+    子进程入口：将数据集目录指向合成案例后导入 tool，测量一次冷调用和 repeat 次热调用
+    """
+    import config
+    config.dataset_path = dataset
+    import tool
+    from case_store import invalidate
+    from log_templates import index_dir
+
+    for name in CASE_FILES:
+        invalidate(os.path.join(dataset, f"case_{case_id}", name))
+    shutil.rmtree(index_dir(os.path.join(dataset, f"case_{case_id}", "logs.csv")), ignore_errors=True)
+
+    func = getattr(tool, tool_name)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    result = func(case_id)
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(case_id)
+        warm.append(time.perf_counter() - start)
+
+    message = getattr(result, "message", str(result))
+    queue.put({
+        "cold_seconds": round(cold, 4),
+        "warm_seconds": round(min(warm), 4) if warm else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_delta_mb": round(peak_rss_mb() - rss_before, 1),
+        "message_chars": len(message),
+    })
+
+
+def run_isolated(dataset: str, case_id: str, tool_name: str, repeat: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure_tool, args=(dataset, case_id, tool_name, repeat, queue))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"error": f"子进程退出码 {process.exitcode}"}
+    return queue.get()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: list, baseline_file: str) -> None:
+    """
+    与基线结果按 (规模, 工具) 对比耗时和峰值内存，比值小于 1 表示更快 / 更省内存
+    """
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = {(r["size"], r["tool"]): r for r in json.load(f)["results"]}
+    print(f"\n对比基线 {baseline_file}")
+    print(f"{'规模':>12} {'工具':>12} {'cold 比值':>10} {'warm 比值':>10} {'RSS 比值':>10}")
+    for r in results:
+        base = baseline.get((r["size"], r["tool"]))
+        if not base or "error" in r or "error" in base:
+            continue
+        ratios = [
+            r[key] / base[key] if base.get(key) and r.get(key) is not None else float("nan")
+            for key in ("cold_seconds", "warm_seconds", "peak_rss_mb")
+        ]
+        print(f"{r['size']:>12} {r['tool']:>12} {ratios[0]:>10.2f} {ratios[1]:>10.2f} {ratios[2]:>10.2f}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="分析工具耗时与峰值内存基准")
+    parser.add_argument("--sizes", default="small,medium", help='规模列表，预设 small/medium/large 或 "<日志行数>x<服务数>"')
+    parser.add_argument("--tools", default=",".join(TOOLS), help="逗号分隔的工具列表")
+    parser.add_argument("--repeat", type=int, default=3, help="热调用重复次数，取最小值")
+    parser.add_argument("--data-dir", default=os.path.join(REPO_ROOT, "result", "bench_data"), help="合成案例目录，已存在的案例会复用")
+    parser.add_argument("--output", default=None, help="结果 JSON 输出路径")
+    parser.add_argument("--compare", default=None, help="用于对比的基线结果 JSON")
+    args = parser.parse_args(argv)
+
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    results = []
+    print(f"{'规模':>12} {'工具':>12} {'cold(秒)':>10} {'warm(秒)':>10} {'峰值RSS(MB)':>12}")
+    for size, rows, services in parse_sizes(args.sizes):
+        case_id = f"bench_{rows}x{services}"
+        if not os.path.exists(os.path.join(args.data_dir, f"case_{case_id}", "case.json")):
+            generate_case(args.data_dir, case_id, log_rows=rows, services=services)
+        for tool_name in tools:
+            record = {"size": size, "rows": rows, "services": services, "tool": tool_name}
+            record.update(run_isolated(args.data_dir, case_id, tool_name, args.repeat))
+            results.append(record)
+            if "error" in record:
+                print(f"{size:>12} {tool_name:>12} 失败：{record['error']}")
+            else:
+                print(f"{size:>12} {tool_name:>12} {record['cold_seconds']:>10.3f} {record['warm_seconds']:>10.3f} {record['peak_rss_mb']:>12.1f}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+合成案例生成器：按指定规模写出 case_<id>/logs.csv、metrics.csv、traces.csv，并在一个服务上注入故障；
+case.json 中的 fault.service / fault.type 可作为 evaluate.py 的评分标注
+
+故障注入：故障时间窗内，故障服务的 ERROR 日志比例升高、CPU 与延迟指标抬升、调用链跨度耗时放大。
+
+用法：python benchmarks/gen_cases.py --output data --case-id 1 --log-rows 200000 --services 50
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+START_TIME = 1_700_000_000
+LEVELS = np.array(["INFO", "WARN", "ERROR", "DEBUG"])
+LEVEL_P = [0.85, 0.08, 0.02, 0.05]
+MESSAGES = np.array([
+    "request handled",
+    "cache hit",
+    "cache miss, loading from db",
+    "retrying upstream call",
+    "connection pool exhausted",
+    "timeout calling downstream service",
+])
+OPERATIONS = np.array(["GET /api", "POST /api", "db.query", "cache.get", "rpc.call", "mq.publish"])
+
+
+def service_names(services: int) -> np.ndarray:
+    return np.array([f"service-{i}" for i in range(services)])
+
+
+def fault_window(duration: float, fault_start: float, fault_length: float) -> tuple:
+    start = START_TIME + duration * fault_start
+    return start, start + duration * fault_length
+
+
+def make_logs(rng, rows: int, names: np.ndarray, duration: float, fault: tuple, fault_service: int, error_rate: float) -> pd.DataFrame:
+    """
+    日志：时间均匀分布；故障窗口内故障服务的日志以 error_rate 的比例变为 ERROR
+    """
+    timestamps = np.sort(START_TIME + rng.uniform(0, duration, rows))
+    service = rng.integers(0, len(names), rows)
+    level = rng.choice(len(LEVELS), rows, p=LEVEL_P)
+    in_fault = (service == fault_service) & (timestamps >= fault[0]) & (timestamps < fault[1])
+    level[in_fault & (rng.random(rows) < error_rate)] = 2
+    message = rng.integers(0, 3, rows)
+    message[level == 2] = rng.integers(3, len(MESSAGES), int((level == 2).sum()))
+    return pd.DataFrame({
+        "timestamp": np.round(timestamps, 6),
+        "level": LEVELS[level],
+        "service": names[service],
+        "message": MESSAGES[message],
+    })
+
+
+def make_metrics(rng, names: np.ndarray, duration: float, interval: float, fault: tuple, fault_service: int) -> pd.DataFrame:
+    """
+    指标：宽表格式 time + <service>_<cpu|mem|latency>；故障窗口内故障服务的 CPU 和延迟抬升
+    """
+    times = np.arange(START_TIME, START_TIME + duration, interval)
+    in_fault = (times >= fault[0]) & (times < fault[1])
+    columns = {"time": times}
+    for i, name in enumerate(names):
+        cpu = rng.normal(40, 5, len(times))
+        latency = rng.gamma(2.0, 20.0, len(times))
+        if i == fault_service:
+            cpu[in_fault] += 45
+            latency[in_fault] *= 6
+        columns[f"{name}_cpu"] = np.round(np.clip(cpu, 0, 100), 2)
+        columns[f"{name}_mem"] = np.round(rng.normal(60, 3, len(times)), 2)
+        columns[f"{name}_latency"] = np.round(latency, 2)
+    return pd.DataFrame(columns)
+
+
+def make_traces(rng, traces: int, spans_per_trace: int, names: np.ndarray, duration: float, fault: tuple, fault_service: int) -> pd.DataFrame:
+    """
+    调用链：每条调用链 spans_per_trace 个跨度，第 k 个跨度的父跨度从前 k 个中随机选取，
+    子跨度耗时为父跨度的一部分；故障窗口内故障服务的跨度耗时放大
+    """
+    base = START_TIME + rng.uniform(0, duration, traces)
+    span = np.arange(spans_per_trace)
+    parent = np.full((traces, spans_per_trace), -1)
+    service = rng.integers(0, len(names), (traces, spans_per_trace))
+    service[:, 0] = 0
+    durations = np.empty((traces, spans_per_trace))
+    durations[:, 0] = rng.uniform(50, 200, traces)
+    for k in range(1, spans_per_trace):
+        parent[:, k] = rng.integers(0, k, traces)
+        durations[:, k] = durations[np.arange(traces), parent[:, k]] * rng.uniform(0.1, 0.5, traces)
+
+    in_fault = (service == fault_service) & ((base >= fault[0]) & (base < fault[1]))[:, None]
+    durations[in_fault] *= 5
+
+    trace_id = np.char.add("trace-", np.arange(traces).astype(str))
+    span_ids = np.char.add(np.char.add(np.repeat(trace_id, spans_per_trace), "-"), np.tile(span.astype(str), traces))
+    parent_flat = parent.ravel()
+    parent_ids = np.char.add(np.char.add(np.repeat(trace_id, spans_per_trace), "-"), np.maximum(parent_flat, 0).astype(str))
+    parent_ids = np.where(parent_flat < 0, "", parent_ids)
+    return pd.DataFrame({
+        "timestamp": np.round((base[:, None] + span[None, :] * 0.001).ravel(), 6),
+        "trace_id": np.repeat(trace_id, spans_per_trace),
+        "span_id": span_ids,
+        "parent_span_id": parent_ids,
+        "service": names[service.ravel()],
+        "operation": OPERATIONS[rng.integers(0, len(OPERATIONS), traces * spans_per_trace)],
+        "duration": np.round(durations.ravel(), 3),
+    })
+
+
+def generate_case(
+        output: str,
+        case_id: str,
+        log_rows: int = 100_000,
+        services: int = 20,
+        traces: int = None,
+        spans_per_trace: int = 5,
+        duration: float = 3600,
+        metric_interval: float = 5,
+        fault_service: int = 0,
+        fault_start: float = 0.5,
+        fault_length: float = 0.1,
+        error_rate: float = 0.3,
+        seed: int = 0
+) -> dict:
+    """
+    生成一个案例目录，返回包含规模和注入故障信息的元数据（同时写入 case_<id>/case.json）
+    """
+    rng = np.random.default_rng(seed)
+    names = service_names(services)
+    traces = traces if traces is not None else max(1, log_rows // 20)
+    fault = fault_window(duration, fault_start, fault_length)
+    case_dir = os.path.join(output, f"case_{case_id}")
+    os.makedirs(case_dir, exist_ok=True)
+
+    make_logs(rng, log_rows, names, duration, fault, fault_service, error_rate).to_csv(os.path.join(case_dir, "logs.csv"), index=False)
+    make_metrics(rng, names, duration, metric_interval, fault, fault_service).to_csv(os.path.join(case_dir, "metrics.csv"), index=False)
+    make_traces(rng, traces, spans_per_trace, names, duration, fault, fault_service).to_csv(os.path.join(case_dir, "traces.csv"), index=False)
+
+    meta = {
+        "case_id": case_id,
+        "log_rows": log_rows,
+        "services": services,
+        "traces": traces,
+        "spans": traces * spans_per_trace,
+        "metric_points": int(np.ceil(duration / metric_interval)),
+        "fault": {
+            "service": str(names[fault_service]),
+            # 注入的主要信号是 CPU 抬升，延迟、错误日志和跨度耗时随之变化
+            "type": "cpu",
+            "start": float(fault[0]),
+            "end": float(fault[1]),
+            "error_rate": error_rate,
+        },
+    }
+    with open(os.path.join(case_dir, "case.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="生成合成根因分析案例")
+    parser.add_argument("--output", required=True, help="数据集目录，案例写入 <output>/case_<id>")
+    parser.add_argument("--case-id", default="1", help="案例ID")
+    parser.add_argument("--log-rows", type=int, default=100_000, help="日志行数")
+    parser.add_argument("--services", type=int, default=20, help="服务数")
+    parser.add_argument("--traces", type=int, default=None, help="调用链数量，默认日志行数的 1/20")
+    parser.add_argument("--spans-per-trace", type=int, default=5, help="每条调用链的跨度数")
+    parser.add_argument("--duration", type=float, default=3600, help="时间跨度（秒）")
+    parser.add_argument("--metric-interval", type=float, default=5, help="指标采样间隔（秒）")
+    parser.add_argument("--fault-service", type=int, default=0, help="注入故障的服务序号")
+    parser.add_argument("--fault-start", type=float, default=0.5, help="故障开始时间占时间跨度的比例")
+    parser.add_argument("--fault-length", type=float, default=0.1, help="故障持续时间占时间跨度的比例")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="故障窗口内故障服务日志变为 ERROR 的比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args(argv)
+
+    meta = generate_case(
+        args.output, args.case_id,
+        log_rows=args.log_rows,
+        services=args.services,
+        traces=args.traces,
+        spans_per_trace=args.spans_per_trace,
+        duration=args.duration,
+        metric_interval=args.metric_interval,
+        fault_service=args.fault_service,
+        fault_start=args.fault_start,
+        fault_length=args.fault_length,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(json.dumps(meta, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+本地模拟的 OpenAI 兼容接口（/v1/chat/completions）：按智能体的系统提示词给出固定的工具调用，驱动工作流完整走完
+规划 → 日志 → 指标 → 调用链 → 报告 各阶段（每次复审 2 票通过），用于在没有真实模型的情况下测试 service.py 和 batch.py。
+
+支持 HTTP/1.1 长连接；GET /stats 返回累计请求数和 TCP 连接数，可用来确认客户端复用了连接。
+
+用法：python benchmarks/mock_openai.py --port 8799 --delay 0.05
+config.py 中：llm_config = LLMConfig({"api_type": "openai", "model": "mock", "api_key": "sk-mock", "base_url": "http://127.0.0.1:8799/v1"})
+"""
+import re
+import json
+import time
+import argparse
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 分析智能体 -> (取数工具, 提交结果工具)
+ANALYSTS = {
+    "log_agent": ("get_log", "provide_log_result"),
+    "metric_agent": ("get_metric", "provide_metric_result"),
+    "trace_agent": ("get_trace", "provide_trace_result"),
+}
+
+call_ids = itertools.count()
+stats = {"requests": 0, "connections": 0}
+stats_lock = threading.Lock()
+
+
+def tool_call(name: str, arguments: dict) -> dict:
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": f"call_{next(call_ids)}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}}],
+    }
+
+
+def last_tool(messages: list) -> str:
+    """
+    最后一条消息是工具结果时，返回对应的工具名
+    """
+    if messages[-1].get("role") != "tool":
+        return None
+    for message in reversed(messages):
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            return message["tool_calls"][-1]["function"]["name"]
+    return None
+
+
+def find_case_id(messages: list) -> str:
+    for message in messages:
+        match = re.search(r"Case ID 为(\S+?)的", str(message.get("content") or ""))
+        if match:
+            return match.group(1)
+    return "1"
+
+
+def reply(messages: list) -> dict:
+    system = messages[0]["content"]
+    previous = last_tool(messages)
+    case_id = find_case_id(messages)
+
+    if "（plan_agent）" in system:
+        planned = any(m.get("tool_calls") and m["tool_calls"][0]["function"]["name"] == "provide_analysis_plan" for m in messages)
+        if planned:
+            return tool_call("route_to_agent", {})
+        return tool_call("provide_analysis_plan", {"analysis_plan": f"根因分析计划：案例ID={case_id}，步骤：日志分析→指标分析→调用链分析→报告生成"})
+    for agent, (fetch, submit) in ANALYSTS.items():
+        if f"（{agent}）" in system:
+            if previous == fetch:
+                return tool_call(submit, {"analysis_result": f"{agent}：案例 {case_id} 的异常集中在 service-0"})
+            return tool_call(fetch, {"case_id": case_id})
+    if "（report_agent）" in system:
+        return tool_call("provide_final_report", {"final_report": f"案例 {case_id}\n根因服务：service-0\n故障类型：cpu"})
+    if "（review_agent）" in system:
+        return tool_call("prepare_vote", {})
+    if "投票管理者" in system:
+        if previous == "complete_vote":
+            return {"role": "assistant", "content": "投票完成"}
+        return tool_call("complete_vote", {"votes": ["APPROVE", "APPROVE", "REJECT"]})
+    if "可行性" in system:
+        return {"role": "assistant", "content": "REJECT\n理由：缺少回滚方案"}
+    return {"role": "assistant", "content": "APPROVE\n理由：结论与数据一致"}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+
+    def setup(self) -> None:
+        super().setup()
+        with stats_lock:
+            stats["connections"] += 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def send_json(self, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        with stats_lock:
+            self.send_json(dict(stats))
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with stats_lock:
+            stats["requests"] += 1
+        time.sleep(self.delay)
+        message = reply(body["messages"])
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body["messages"]) // 4
+        self.send_json({
+            "id": f"chatcmpl-{next(call_ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop", "message": message}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        })
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="模拟的 OpenAI 兼容接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--delay", type=float, default=0.05, help="每个请求的模拟延迟（秒）")
+    args = parser.parse_args(argv)
+
+    MockHandler.delay = args.delay
+    print(f"模拟接口：http://{args.host}:{args.port}/v1", flush=True)
+    ThreadingHTTPServer((args.host, args.port), MockHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import os
+import json
+import shutil
+import tempfile
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+from schema import read_case_csv, read_header
+
+import config
+
+# 列式缓存根目录，未配置时缓存放在各案例目录下的 .care_cache 中
+cache_path = getattr(config, "case_cache_path", None)
+
+CACHE_DIRNAME = ".care_cache"
+CACHE_VERSION = 3
+
+
+def _cache_dir(csv_path: str) -> str:
+    """
+    计算 CSV 文件对应的缓存目录
+    """
+    case_dir, file_name = os.path.split(os.path.abspath(csv_path))
+    stem = os.path.splitext(file_name)[0]
+    if cache_path:
+        return os.path.join(cache_path, os.path.basename(case_dir), stem)
+    return os.path.join(case_dir, CACHE_DIRNAME, stem)
+
+
+def _fingerprint(csv_path: str) -> dict:
+    """
+    源文件指纹：大小 + 修改时间，任一变化即视为缓存失效
+    """
+    stat = os.stat(csv_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _read_meta(store_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(store_dir, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_fresh(meta: Optional[dict], csv_path: str) -> bool:
+    return (
+        meta is not None
+        and meta.get("version") == CACHE_VERSION
+        and meta.get("source") == _fingerprint(csv_path)
+    )
+
+
+def _save_column(series: pd.Series, directory: str, file_id: str) -> dict:
+    """
+    写出单列：数值列直接存 .npy，分类列存字典编码（int32 编码 + 类别表），
+    其余字符串列（取值几乎各不相同，如标识和日志消息）存 UTF-8 字节 + int64 偏移，不生成与列等长的类别表
+    """
+    entry = {"name": str(series.name), "file": f"{file_id}.npy"}
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        entry["kind"] = "numeric"
+        np.save(os.path.join(directory, entry["file"]), series.to_numpy())
+    elif not isinstance(series.dtype, pd.CategoricalDtype):
+        entry["kind"] = "string"
+        entry["data"] = f"{file_id}.data.npy"
+        valid = series.notna().to_numpy()
+        encoded = [str(v).encode("utf-8") if ok else b"" for v, ok in zip(series.tolist(), valid)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        np.save(os.path.join(directory, entry["file"]), offsets)
+        np.save(os.path.join(directory, entry["data"]), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        if not valid.all():
+            entry["nulls"] = f"{file_id}.nulls.npy"
+            np.save(os.path.join(directory, entry["nulls"]), ~valid)
+    else:
+        # 类别按字典序排列，使 groupby 等操作的输出顺序与直接读取 CSV 一致
+        try:
+            codes, uniques = pd.factorize(series, sort=True)
+        except TypeError:
+            codes, uniques = pd.factorize(series)
+        entry["kind"] = "category"
+        entry["categories"] = f"{file_id}.json"
+        np.save(os.path.join(directory, entry["file"]), codes.astype(np.int32))
+        with open(os.path.join(directory, entry["categories"]), "w", encoding="utf-8") as f:
+            json.dump([str(v) for v in uniques], f, ensure_ascii=False)
+    return entry
+
+
+def _write_meta(store_dir: str, meta: dict) -> None:
+    tmp_path = os.path.join(store_dir, f".meta_{os.getpid()}.json")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(store_dir, "meta.json"))
+
+
+def _write_store(df: pd.DataFrame, store_dir: str, source: dict, header: List[str], meta: Optional[dict] = None) -> dict:
+    """
+    将 DataFrame 按列写入缓存目录，列文件以该列在 CSV 表头中的位置命名。
+    meta 为同一源文件的已有缓存时，只追加新列并原子替换 meta.json；否则整个目录原子重建
+    """
+    position = {name: i for i, name in enumerate(header)}
+    if meta is not None:
+        # 追加列：每个列文件先写入临时目录再改名，并发追加同一列时互不破坏
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=store_dir)
+        try:
+            entries = [_save_column(df[name], tmp_dir, f"c{position[name]}") for name in df.columns]
+            for entry in entries:
+                for key in ("file", "categories", "data", "nulls"):
+                    if key in entry:
+                        os.replace(os.path.join(tmp_dir, entry[key]), os.path.join(store_dir, entry[key]))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        known = {entry["name"] for entry in entries}
+        columns = [entry for entry in meta["columns"] if entry["name"] not in known] + entries
+        meta = dict(meta, columns=sorted(columns, key=lambda entry: position[entry["name"]]))
+        _write_meta(store_dir, meta)
+        return meta
+
+    parent = os.path.dirname(store_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=parent)
+    try:
+        columns = [_save_column(df[name], tmp_dir, f"c{position[name]}") for name in df.columns]
+        meta = {"version": CACHE_VERSION, "source": source, "rows": len(df), "header": header, "columns": columns}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        # 原子替换：先移除旧缓存，再把临时目录改名为正式目录
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.replace(tmp_dir, store_dir)
+    finally:
+        # 并发写入时另一进程可能已完成替换，此时丢弃本进程的临时目录即可
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return meta
+
+
+def _load_strings(store_dir: str, entry: dict, offsets: np.ndarray):
+    """
+    加载字符串列：安装了 pyarrow 时直接以内存映射的字节和偏移构造 Arrow 字符串数组，不逐行创建 Python 字符串；否则逐行解码
+    """
+    blob = np.load(os.path.join(store_dir, entry["data"]), mmap_mode="r")
+    nulls = np.load(os.path.join(store_dir, entry["nulls"])) if "nulls" in entry else None
+    if importlib.util.find_spec("pyarrow") is not None:
+        import pyarrow as pa
+
+        bitmap = None if nulls is None else pa.py_buffer(np.packbits(~nulls, bitorder="little"))
+        array = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(blob), bitmap)
+        return pd.arrays.ArrowStringArray(array)
+    data = blob.tobytes()
+    values = np.array([data[start:end].decode("utf-8") for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())], dtype=object)
+    if nulls is not None:
+        values[nulls] = None
+    return values
+
+
+def _read_store(store_dir: str, meta: dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    以内存映射方式加载缓存列
+    """
+    wanted = None if columns is None else set(columns)
+    data = {}
+    for entry in meta["columns"]:
+        if wanted is not None and entry["name"] not in wanted:
+            continue
+        values = np.load(os.path.join(store_dir, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "category":
+            with open(os.path.join(store_dir, entry["categories"]), encoding="utf-8") as f:
+                categories = json.load(f)
+            data[entry["name"]] = pd.Categorical.from_codes(values, categories=categories)
+        elif entry["kind"] == "string":
+            data[entry["name"]] = _load_strings(store_dir, entry, values)
+        else:
+            data[entry["name"]] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def load_table(csv_path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    读取案例 CSV 文件，优先使用列式缓存；columns 指定需要的列，缓存中缺少的列才解析 CSV（按 schema 的列类型）并补进缓存，
+    源文件变化时整个缓存重建
+    """
+    store_dir = _cache_dir(csv_path)
+    meta = _read_meta(store_dir)
+    if not _is_fresh(meta, csv_path):
+        meta = None
+
+    header = meta["header"] if meta is not None else read_header(csv_path)
+    wanted = header if columns is None else [name for name in header if name in set(columns)]
+    cached = {entry["name"] for entry in meta["columns"]} if meta is not None else set()
+    missing = [name for name in wanted if name not in cached]
+    if not missing:
+        return _read_store(store_dir, meta, wanted)
+
+    source = _fingerprint(csv_path) if meta is None else meta["source"]
+    df = read_case_csv(csv_path, missing)
+    try:
+        meta = _write_store(df, store_dir, source, header, meta)
+    except OSError:
+        # 数据目录只读等情况下退化为直接读取 CSV
+        if meta is None:
+            return df
+        return pd.concat([_read_store(store_dir, meta, wanted), df], axis=1)[wanted]
+    return _read_store(store_dir, meta, wanted)
+
+
+def invalidate(csv_path: str) -> None:
+    """
+    删除指定 CSV 文件的列式缓存
+    """
+    shutil.rmtree(_cache_dir(csv_path), ignore_errors=True)
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import config
+
+# config.dataset_path 对应的数据集清单文件，未配置时写在数据集目录下；其他数据集的清单始终写在各自目录下
+catalog_path = getattr(config, "catalog_path", None)
+
+CATALOG_VERSION = 1
+CATALOG_FILENAME = ".care_catalog.json"
+
+# 案例文件 -> 时间列
+CASE_FILES = {"logs.csv": "timestamp", "metrics.csv": "time", "traces.csv": "timestamp"}
+
+
+def manifest_file(dataset: str = None) -> str:
+    dataset = dataset or config.dataset_path
+    if catalog_path and os.path.abspath(dataset) == os.path.abspath(config.dataset_path):
+        return catalog_path
+    return os.path.join(dataset, CATALOG_FILENAME)
+
+
+def case_sort_key(case_id: str) -> tuple:
+    """
+    案例ID的自然顺序：数字ID按数值排列（2 在 10 之前），非数字ID排在其后按字符串排列
+    """
+    return (not case_id.isdigit(), int(case_id) if case_id.isdigit() else 0, case_id)
+
+
+def file_fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_services(path: str, file_name: str) -> List[str]:
+    """
+    文件中出现的服务：日志和调用链取 service 列的类别表，宽表格式的指标从列名解析
+    """
+    # 只有统计文件时才需要 pandas；清单未过期时查询只读 JSON，命令行可以快速启动
+    import pandas as pd
+    from case_store import load_table
+    from metric_engine import parse_metric_columns
+
+    if file_name == "metrics.csv":
+        header = pd.read_csv(path, nrows=0).columns
+        if "service" not in header:
+            return list(parse_metric_columns(header))
+    service = load_table(path, ["service"])["service"]
+    categories = service.cat.categories if isinstance(service.dtype, pd.CategoricalDtype) else pd.unique(service.dropna())
+    return [str(s) for s in categories]
+
+
+def scan_file(path: str, file_name: str) -> dict:
+    """
+    统计单个案例文件：行数、时间范围和服务；只读取时间列和服务列，并顺带建立这两列的列式缓存
+    """
+    import numpy as np
+    from case_store import load_table
+
+    time_column = CASE_FILES[file_name]
+    table = load_table(path, [time_column])
+    entry = dict(file_fingerprint(path), rows=len(table), start=None, end=None)
+    if time_column in table.columns and len(table):
+        times = table[time_column].to_numpy(dtype=np.float64)
+        entry["start"], entry["end"] = float(np.nanmin(times)), float(np.nanmax(times))
+    entry["services"] = file_services(path, file_name)
+    return entry
+
+
+def scan_case(case_dir: str, previous: Optional[dict] = None) -> dict:
+    """
+    生成单个案例的清单条目；文件指纹与上次清单一致时直接沿用上次的统计结果
+    """
+    files = {}
+    for file_name in CASE_FILES:
+        path = os.path.join(case_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        old = (previous or {}).get("files", {}).get(file_name)
+        fingerprint = file_fingerprint(path)
+        if old and old["size"] == fingerprint["size"] and old["mtime_ns"] == fingerprint["mtime_ns"]:
+            files[file_name] = old
+        else:
+            files[file_name] = scan_file(path, file_name)
+
+    starts = [f["start"] for f in files.values() if f["start"] is not None]
+    ends = [f["end"] for f in files.values() if f["end"] is not None]
+    services = sorted({s for f in files.values() for s in f["services"]})
+    return {
+        "case_id": os.path.basename(case_dir)[len("case_"):],
+        "path": os.path.abspath(case_dir),
+        "total_bytes": sum(f["size"] for f in files.values()),
+        "rows": {file_name: f["rows"] for file_name, f in files.items()},
+        "start": min(starts) if starts else None,
+        "end": max(ends) if ends else None,
+        "duration": max(ends) - min(starts) if starts and ends else 0.0,
+        "services": services,
+        "files": files,
+    }
+
+
+def read_manifest(dataset: str = None) -> Optional[dict]:
+    try:
+        with open(manifest_file(dataset), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CATALOG_VERSION:
+        return None
+    # 清单文件可能属于另一个数据集（如 catalog_path 指向共享位置），此时视为不存在
+    return manifest if manifest.get("dataset_path") == os.path.abspath(dataset or config.dataset_path) else None
+
+
+def build_catalog(dataset: str = None, refresh: bool = False) -> dict:
+    """
+    扫描数据集目录下的所有 case_<id> 目录并写出清单；未变化的案例沿用已有清单，refresh 时全部重新统计
+    """
+    dataset = dataset or config.dataset_path
+    previous = {} if refresh else (read_manifest(dataset) or {}).get("cases", {})
+    cases = {}
+    names = [name for name in os.listdir(dataset) if name.startswith("case_")]
+    for name in sorted(names, key=lambda name: case_sort_key(name[len("case_"):])):
+        case_dir = os.path.join(dataset, name)
+        if os.path.isdir(case_dir):
+            entry = scan_case(case_dir, previous.get(name[len("case_"):]))
+            cases[entry["case_id"]] = entry
+
+    manifest = {
+        "version": CATALOG_VERSION,
+        "dataset_path": os.path.abspath(dataset),
+        "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "cases": cases,
+    }
+    path = manifest_file(dataset)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 数据集目录只读时只返回清单，不落盘
+        pass
+    return manifest
+
+
+def is_current(manifest: dict, dataset: str) -> bool:
+    """
+    清单是否与数据集一致：案例目录没有增减，且每个文件的大小和修改时间未变（只做 stat，不读文件内容）
+    """
+    case_ids = {name[len("case_"):] for name in os.listdir(dataset) if name.startswith("case_") and os.path.isdir(os.path.join(dataset, name))}
+    if case_ids != set(manifest["cases"]):
+        return False
+    for entry in manifest["cases"].values():
+        for file_name in CASE_FILES:
+            path = os.path.join(entry["path"], file_name)
+            old = entry["files"].get(file_name)
+            if os.path.exists(path) != (old is not None):
+                return False
+            if old is not None and {"size": old["size"], "mtime_ns": old["mtime_ns"]} != file_fingerprint(path):
+                return False
+    return True
+
+
+def load_catalog(dataset: str = None) -> Dict[str, dict]:
+    """
+    返回 案例ID -> 清单条目；清单不存在或与数据集不一致时增量重建（只重新统计变化的文件）
+    """
+    dataset = dataset or config.dataset_path
+    manifest = read_manifest(dataset)
+    if manifest is not None and is_current(manifest, dataset):
+        return manifest["cases"]
+    return build_catalog(dataset)["cases"]
+
+
+def list_case_entries(
+        dataset: str = None,
+        service: str = None,
+        sort_by: str = "total_bytes",
+        descending: bool = True,
+        limit: int = None
+) -> List[dict]:
+    """
+    查询清单：按服务过滤，按 total_bytes / duration / start / case_id 排序
+    """
+    entries = list(load_catalog(dataset).values())
+    if service:
+        entries = [e for e in entries if service in e["services"]]
+    # 缺少该字段（如没有时间列）的案例始终排在最后
+    key = (lambda e: case_sort_key(e["case_id"])) if sort_by == "case_id" else (lambda e: e[sort_by])
+    present = sorted((e for e in entries if e[sort_by] is not None), key=key, reverse=descending)
+    entries = present + [e for e in entries if e[sort_by] is None]
+    return entries[:limit] if limit else entries
+
+
+def shard_cases(case_ids: List[str], shards: int, index: int, dataset: str = None) -> List[str]:
+    """
+    按文件大小把案例均衡地分到 shards 个分片，返回第 index 个分片的案例（大案例在前）。
+    最大优先贪心：每个案例放入当前总字节数最小的分片；不在清单中的案例按 0 字节计
+    """
+    catalog = load_catalog(dataset)
+    ordered = sorted(case_ids, key=lambda case_id: -catalog.get(case_id, {}).get("total_bytes", 0))
+    loads = [0] * shards
+    assigned = [[] for _ in range(shards)]
+    for case_id in ordered:
+        target = loads.index(min(loads))
+        assigned[target].append(case_id)
+        loads[target] += catalog.get(case_id, {}).get("total_bytes", 0)
+    return assigned[index]
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    构建并打印数据集清单：python catalog.py [--refresh] [--sort total_bytes] [--service svc]
+    """
+    parser = argparse.ArgumentParser(description="构建和查询数据集清单")
+    parser.add_argument("--dataset", default=None, help="数据集目录，默认取 config.dataset_path")
+    parser.add_argument("--refresh", action="store_true", help="忽略已有清单，重新统计所有案例")
+    parser.add_argument("--sort", default="total_bytes", choices=["total_bytes", "duration", "start", "case_id"], help="排序字段")
+    parser.add_argument("--service", default=None, help="只列出包含该服务的案例")
+    args = parser.parse_args(argv)
+
+    if args.refresh:
+        build_catalog(args.dataset, refresh=True)
+    entries = list_case_entries(args.dataset, service=args.service, sort_by=args.sort, descending=args.sort != "case_id")
+    print(f"{'案例ID':<16} {'大小(MB)':>10} {'日志行数':>10} {'指标行数':>10} {'跨度数':>10} {'时长(秒)':>10} {'服务数':>6}")
+    for e in entries:
+        rows = e["rows"]
+        print(
+            f"{e['case_id']:<16} {e['total_bytes'] / 1024 / 1024:>10.1f} {rows.get('logs.csv', 0):>10} {rows.get('metrics.csv', 0):>10} "
+            f"{rows.get('traces.csv', 0):>10} {e['duration']:>10.0f} {len(e['services']):>6}"
+        )
+    print(f"共 {len(entries)} 个案例，清单文件：{manifest_file(args.dataset)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+from typing import Optional, Tuple
+from autogen import ConversableAgent
+from autogen.agentchat.group import ContextVariables
+from context_variables import create_context_variables
+
+import config
+
+# 检查点目录，设置后每次复审投票和阶段切换都会保存上下文变量和消息历史；为 None 时不保存
+checkpoint_path = getattr(config, "checkpoint_path", None)
+
+# 按顺序排列的已通过复审的阶段：(阶段, 通过复审后的结果键, 分析结果键)
+consensus_stages = [
+    ("log_consensus", "final_log_analysis_result", "log_analysis_result"),
+    ("metric_consensus", "final_metric_analysis_result", "metric_analysis_result"),
+    ("trace_consensus", "final_trace_analysis_result", "trace_analysis_result"),
+]
+
+# 恢复时保留的上下文变量；复审中的任务、评审结果等进行中的状态一律丢弃
+DURABLE_KEYS = ["plan_result", "vote_rounds", "final_report"] + [key for _, key, _ in consensus_stages]
+
+
+def checkpoint_file(directory: str, case_id: str, name: str = "") -> str:
+    return os.path.join(directory, f"case_{case_id}{'_' + name if name else ''}.json")
+
+
+def save_checkpoint(path: str, case_id: str, context_variables: ContextVariables, messages: list) -> None:
+    """
+    原子写入检查点：先写临时文件再替换，进程在写入过程中退出也不会留下损坏的检查点
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {
+        "case_id": case_id,
+        "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "workflow_stage": context_variables.get("workflow_stage", ""),
+        "context_variables": context_variables.to_dict(),
+        "messages": messages,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def restore_context(checkpoint: dict) -> Tuple[ContextVariables, str]:
+    """
+    从检查点恢复到最近一个已通过复审的阶段：保留计划和已通过复审的结果，进行中的复审和未通过的分析全部丢弃。
+    返回恢复后的上下文变量和工作流阶段
+    """
+    saved = checkpoint.get("context_variables", {})
+    context_variables = create_context_variables()
+    for key in DURABLE_KEYS:
+        if key in saved:
+            context_variables[key] = saved[key]
+
+    stage = "planning"
+    for consensus_stage, final_key, analysis_key in consensus_stages:
+        if not saved.get(final_key):
+            break
+        stage = consensus_stage
+        context_variables[analysis_key] = saved.get(analysis_key) or saved[final_key]
+    if saved.get("workflow_stage") == "final_report" and saved.get("final_report"):
+        stage = "final_report"
+    context_variables["workflow_stage"] = stage
+    return context_variables, stage
+
+
+class Checkpointer:
+    """
+    在智能体每次回复前检查工作流状态，投票统计或阶段切换后保存检查点
+    """
+
+    def __init__(self, path: str, case_id: str, context_variables: ContextVariables):
+        self.path = path
+        self.case_id = case_id
+        self.context_variables = context_variables
+        self._last_key = None
+
+    def _state_key(self) -> tuple:
+        return tuple(str(self.context_variables.get(key, "")) for key in ["workflow_stage"] + DURABLE_KEYS)
+
+    def attach(self, agents: list) -> None:
+        for agent in agents:
+            agent.register_hook(hookable_method="update_agent_state", hook=self.on_turn)
+
+    def on_turn(self, agent: ConversableAgent, messages: list) -> None:
+        self.context_variables = agent.context_variables
+        if self._state_key() != self._last_key:
+            self.save_from(agent, messages)
+
+    def save_from(self, agent: ConversableAgent, messages: list = None) -> None:
+        # 群聊管理器持有完整的对话历史，智能体自身只保存与管理器之间的消息
+        manager = getattr(agent, "_group_manager", None)
+        if manager is not None:
+            messages = manager.groupchat.messages
+        save_checkpoint(self.path, self.case_id, self.context_variables, messages or [])
+        self._last_key = self._state_key()
@@ -0,0 +1,149 @@
+import os
+import sys
+import argparse
+from typing import List
+
+import lazy_config
+
+# 子命令只在执行时导入各自的模块：查看配置、列出案例等命令不加载 autogen，也不创建智能体
+
+
+def cmd_run(args: argparse.Namespace) -> None:
+    from workflow import run_case, workflow_mode
+
+    chat_result, final_context, last_agent = run_case(
+        args.case,
+        human_input_mode=args.human_input,
+        max_rounds=args.max_rounds,
+        mode=args.mode or workflow_mode,
+        cache_mode=args.llm_cache,
+        trace_file=args.trace,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        compaction=args.compaction,
+    )
+    report = final_context.get("final_report") if final_context is not None else None
+    if report:
+        print(f"\n最终报告：\n{report}")
+
+
+def cmd_batch(args: argparse.Namespace) -> None:
+    import batch
+    batch.main(args.extra)
+
+
+def cmd_eval(args: argparse.Namespace) -> None:
+    import evaluate
+    evaluate.main(args.extra)
+
+
+def cmd_cases(args: argparse.Namespace) -> None:
+    import catalog
+    catalog.main(args.extra)
+
+
+def cmd_serve(args: argparse.Namespace) -> None:
+    import service
+    service.main([args.command] + args.extra)
+
+
+def cmd_trace(args: argparse.Namespace) -> None:
+    import instrumentation
+    instrumentation.main([args.file])
+
+
+def cmd_config(args: argparse.Namespace) -> None:
+    """
+    打印 config.py 中的设置项：导入和定义原样打印语句，字面量直接打印取值，其余设置项（如 llm_config）只打印源码，不执行 config.py
+    """
+    import config
+
+    if isinstance(config, lazy_config.LazyConfig):
+        literals = {name: value for name, value in vars(config).items() if not name.startswith("_")}
+        dynamic = config.dynamic_settings
+        statements = list(dict.fromkeys(config.definitions.values()))
+    else:
+        literals = {name: value for name, value in vars(config).items() if not name.startswith("_") and not callable(value) and not isinstance(value, type(os))}
+        dynamic = {}
+        statements = []
+
+    if args.get:
+        if args.get in literals:
+            print(literals[args.get])
+        elif hasattr(config, args.get):
+            print(getattr(config, args.get))
+        else:
+            sys.exit(f"config.py 中没有设置项 {args.get}")
+        return
+
+    print(f"# {config.__file__}")
+    for statement in statements:
+        print(statement)
+    for name, value in literals.items():
+        print(f"{name} = {value!r}")
+    for name, source in dynamic.items():
+        print(f"{name} = {source}  # 运行时求值")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="care", description="多智能体根因分析工作流")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="对单个案例运行根因分析工作流")
+    run.add_argument("--case", required=True, help="案例ID")
+    run.add_argument("--mode", choices=["serial", "fanout"], default=None, help="工作流模式，默认取 config.workflow_mode")
+    run.add_argument("--max-rounds", type=int, default=100, help="最大对话轮数")
+    run.add_argument("--human-input", choices=["ALWAYS", "TERMINATE", "NEVER"], default="ALWAYS", help="人工输入模式")
+    run.add_argument("--llm-cache", choices=["record", "replay", "bypass"], default=None, help="LLM 响应缓存模式，默认取 config.llm_cache_mode")
+    run.add_argument("--trace", default=None, help="运行记录输出文件，默认按 config.instrumentation_path 生成")
+    run.add_argument("--checkpoint-dir", default=None, help="检查点目录，默认取 config.checkpoint_path")
+    run.add_argument("--resume", action="store_true", help="从检查点继续，已通过复审的阶段不再重跑")
+    run.add_argument("--compaction", choices=["stage", "off"], default=None, help="对话压缩模式，默认取 config.compaction_mode")
+    run.set_defaults(func=cmd_run)
+
+    # 参数原样转交给 batch.py / evaluate.py / catalog.py 的命令行解析
+    batch = subparsers.add_parser("batch", help="批量运行，参数同 python batch.py", add_help=False)
+    batch.set_defaults(func=cmd_batch, passthrough=True)
+
+    evaluation = subparsers.add_parser("eval", help="批量运行并对照标注评估准确率和开销，参数同 python evaluate.py", add_help=False)
+    evaluation.set_defaults(func=cmd_eval, passthrough=True)
+
+    cases = subparsers.add_parser("cases", help="列出数据集中的案例，参数同 python catalog.py", add_help=False)
+    cases.set_defaults(func=cmd_cases, passthrough=True, lazy_config=True)
+
+    serve = subparsers.add_parser("serve", help="启动常驻的根因分析服务，参数同 python service.py serve", add_help=False)
+    serve.set_defaults(func=cmd_serve, passthrough=True)
+
+    submit = subparsers.add_parser("submit", help="向服务提交任务并跟随进度，参数同 python service.py submit", add_help=False)
+    submit.set_defaults(func=cmd_serve, passthrough=True)
+
+    trace = subparsers.add_parser("trace", help="打印运行记录文件的汇总表")
+    trace.add_argument("file", help="运行记录文件（JSONL）")
+    trace.set_defaults(func=cmd_trace)
+
+    show = subparsers.add_parser("config", help="打印当前配置")
+    show.add_argument("--get", default=None, help="只打印指定设置项的值")
+    show.set_defaults(func=cmd_config, lazy_config=True)
+    return parser
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    命令行入口：care run --case 1 | care batch --cases 1-10 | care eval --cases 1-10 | care serve | care submit --case 1 | care cases | care trace <file> | care config
+    """
+    # 与直接运行 python workflow.py 一致，从当前目录查找 config.py
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and not getattr(args, "passthrough", False):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    # 只读取设置项的命令使用惰性 config，不加载 autogen；运行工作流的命令导入真正的 config，与作为库使用时取值一致
+    if getattr(args, "lazy_config", False):
+        lazy_config.install()
+    args.extra = extra
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from autogen import ConversableAgent
+from autogen.events.base_event import BaseEvent, wrap_event
+from autogen.io import IOStream
+from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+
+from instrumentation import record_compaction
+from payload import estimate_tokens
+
+import config
+
+# 对话历史压缩：off 时各智能体看到完整的共享对话（默认）；stage 时已通过复审的阶段替换为复审通过的结论，过期的工具输出截断
+compaction_mode = getattr(config, "compaction_mode", "off")
+COMPACTION_MODES = ("stage", "off")
+# 截断后的工具输出保留的字符数
+compaction_tool_chars = getattr(config, "compaction_tool_chars", 200)
+
+# 工具 -> 所属阶段；工具响应、评审和投票消息归入它们之前最近一次工具调用所在的阶段
+STAGE_TOOLS = {
+    "provide_analysis_plan": "planning",
+    "list_cases": "planning",
+    "get_log": "log",
+    "get_log_templates": "log",
+    "provide_log_result": "log",
+    "get_metric": "metric",
+    "provide_metric_result": "metric",
+    "get_trace": "trace",
+    "get_trace_critical_path": "trace",
+    "provide_trace_result": "trace",
+    "get_correlation": "report",
+    "provide_final_report": "report",
+}
+# 分析智能体 -> 所属阶段；没有调用工具的发言按发言者归入阶段
+STAGE_AGENTS = {
+    "log_agent": "log",
+    "metric_agent": "metric",
+    "trace_agent": "trace",
+    "report_agent": "report",
+}
+# 可压缩的阶段 -> (阶段名称, 复审通过的结论在上下文变量中的键)
+STAGE_RESULTS = {
+    "log": ("日志分析", "final_log_analysis_result"),
+    "metric": ("系统指标分析", "final_metric_analysis_result"),
+    "trace": ("调用链分析", "final_trace_analysis_result"),
+}
+# 返回原始数据的工具：完整输出只给发起调用的智能体，其他智能体只看到开头部分
+DATA_TOOLS = {"list_cases", "get_log", "get_log_templates", "get_metric", "get_trace", "get_trace_critical_path", "get_correlation"}
+# 智能体 -> 需要看到哪些已完成阶段的结论；不在表中的智能体看到全部结论
+AGENT_SUMMARIES = {
+    "plan_agent": ("log", "metric", "trace"),
+    "log_agent": (),
+    "metric_agent": ("log",),
+    "trace_agent": ("log", "metric"),
+    "review_agent": (),
+    "vote_agent": (),
+    "report_agent": ("log", "metric", "trace"),
+}
+SUMMARY_NAME = "stage_summary"
+
+
+@lru_cache(maxsize=4096)
+def text_tokens(text: str) -> int:
+    return estimate_tokens(text)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    """
+    估计一条消息发送给模型时的 token 数：工具响应消息只计各响应的内容，其余消息计正文和工具调用参数
+    """
+    if message.get("tool_responses"):
+        return sum(text_tokens(str(response.get("content") or "")) for response in message["tool_responses"])
+    tokens = text_tokens(str(message.get("content") or ""))
+    for call in message.get("tool_calls") or []:
+        tokens += text_tokens(str(call.get("function", {}).get("arguments") or ""))
+    return tokens
+
+
+def tool_names(message: Dict[str, Any]) -> List[str]:
+    return [call.get("function", {}).get("name", "") for call in message.get("tool_calls") or []]
+
+
+def label_stages(messages: List[Dict[str, Any]]) -> List[str]:
+    """
+    为每条消息标注所属阶段：工具调用按 STAGE_TOOLS 切换阶段，分析智能体的发言按 STAGE_AGENTS 切换阶段，其余消息沿用当前阶段
+    """
+    stage = "planning"
+    labels = []
+    for message in messages:
+        names = tool_names(message)
+        for name in names:
+            stage = STAGE_TOOLS.get(name, stage)
+        if not names and message.get("name") in STAGE_AGENTS:
+            stage = STAGE_AGENTS[message["name"]]
+        labels.append(stage)
+    return labels
+
+
+def format_savings(tokens_before: int, tokens_after: int) -> str:
+    share = (tokens_before - tokens_after) / tokens_before if tokens_before else 0.0
+    return f"对话压缩：发送给模型的对话历史 {tokens_before} -> {tokens_after} token（估计），节省 {tokens_before - tokens_after}（{share:.1%}）"
+
+
+@wrap_event
+class CompactionEvent(BaseEvent):
+    """
+    一次运行结束时的对话压缩统计（ag2 事件）：终端输出流打印一行汇总，服务任务的输出流转为进度事件
+    """
+
+    tokens_before: int
+    tokens_after: int
+    tokens_saved: int
+
+    def print(self, f: Optional[Callable[..., Any]] = None) -> None:
+        f = f or print
+        f(format_savings(self.tokens_before, self.tokens_after), flush=True)
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}…（已截断 {len(text) - limit} 字符）"
+
+
+class StageCompaction:
+    """
+    单个智能体的消息变换（ag2 MessageTransform 协议）：
+    - 已通过复审且不在进行中的分析阶段，整段对话替换为一条复审通过的结论，只保留该智能体需要的阶段结论
+    - 原始数据工具的输出只对发起调用的智能体完整保留，且只保留同一工具最近一次的输出，其余截断
+    第一条消息（用户任务）和进行中的阶段始终原样保留；整段替换时工具调用与工具响应一起移除，不会出现不成对的工具消息
+    """
+
+    def __init__(self, agent: ConversableAgent, policy: "CompactionPolicy"):
+        self.agent = agent
+        self.policy = policy
+        self.summaries = AGENT_SUMMARIES.get(agent.name, tuple(STAGE_RESULTS))
+
+    def _approved(self, stage: str) -> str:
+        context_variables = self.agent.context_variables
+        if stage not in STAGE_RESULTS or context_variables is None:
+            return ""
+        return context_variables.get(STAGE_RESULTS[stage][1], "") or ""
+
+    def apply_transform(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not messages:
+            return messages
+        labels = label_stages(messages)
+        active = labels[-1]
+
+        # 工具调用编号 -> (工具名, 发起调用的智能体)，以及每个 (智能体, 工具) 最近一次调用的编号
+        calls: Dict[str, Tuple[str, str]] = {}
+        latest: Dict[Tuple[str, str], str] = {}
+        for message in messages:
+            for call in message.get("tool_calls") or []:
+                key = (message.get("name", ""), call.get("function", {}).get("name", ""))
+                calls[call.get("id")] = key[::-1]
+                latest[key] = call.get("id")
+
+        compacted = []
+        summarized = set()
+        for i, message in enumerate(messages):
+            stage = labels[i]
+            result = self._approved(stage) if i > 0 and stage != active else ""
+            if result:
+                if stage in self.summaries and stage not in summarized:
+                    summarized.add(stage)
+                    compacted.append({"role": "user", "name": SUMMARY_NAME, "content": f"【{STAGE_RESULTS[stage][0]}已通过复审，原始对话已省略】\n{result}"})
+                continue
+            if message.get("tool_responses"):
+                message = self._truncate_responses(message, calls, latest)
+            compacted.append(message)
+
+        self.policy.record(self.agent.name, sum(message_tokens(m) for m in messages), sum(message_tokens(m) for m in compacted), len(messages), len(compacted))
+        return compacted
+
+    def _truncate_responses(self, message: Dict[str, Any], calls: Dict[str, Tuple[str, str]], latest: Dict[Tuple[str, str], str]) -> Dict[str, Any]:
+        responses = []
+        changed = False
+        for response in message["tool_responses"]:
+            call_id = response.get("tool_call_id")
+            function, caller = calls.get(call_id, ("", ""))
+            if function in DATA_TOOLS and (caller != self.agent.name or latest.get((caller, function)) != call_id):
+                content = str(response.get("content") or "")
+                response = dict(response, content=truncate(content, compaction_tool_chars))
+                changed = changed or len(content) > compaction_tool_chars
+            responses.append(response)
+        if not changed:
+            return message
+        return dict(message, tool_responses=responses, content="\n\n".join(str(r.get("content") or "") for r in responses))
+
+    def get_logs(self, pre_transform_messages: List[Dict[str, Any]], post_transform_messages: List[Dict[str, Any]]) -> Tuple[str, bool]:
+        before = sum(message_tokens(m) for m in pre_transform_messages)
+        after = sum(message_tokens(m) for m in post_transform_messages)
+        return f"{self.agent.name}: 对话压缩 {before} -> {after} token", after < before
+
+
+class CompactionPolicy:
+    """
+    一次运行的对话压缩：为各智能体挂载 StageCompaction，并按智能体累计压缩前后的 token 数。
+    统计同时写入当前运行记录（instrumentation），运行结束时可输出节省的 token；mode 默认取 config.compaction_mode
+    """
+
+    def __init__(self, mode: str = None):
+        self.mode = mode or compaction_mode
+        if self.mode not in COMPACTION_MODES:
+            raise ValueError(f"未知的对话压缩模式：{self.mode}")
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, agents: List[ConversableAgent]) -> None:
+        if self.mode == "off":
+            return
+        for agent in agents:
+            TransformMessages(transforms=[StageCompaction(agent, self)], verbose=False).add_to_agent(agent)
+
+    def record(self, agent: str, before: int, after: int, messages_before: int, messages_after: int) -> None:
+        with self._lock:
+            row = self.stats.setdefault(agent, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+            row["calls"] += 1
+            row["tokens_before"] += before
+            row["tokens_after"] += after
+        record_compaction(agent, before, after, messages_before, messages_after)
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            before = sum(row["tokens_before"] for row in self.stats.values())
+            after = sum(row["tokens_after"] for row in self.stats.values())
+        return {"tokens_before": before, "tokens_after": after, "tokens_saved": before - after}
+
+    def format(self) -> Optional[str]:
+        totals = self.totals()
+        if not totals["tokens_before"]:
+            return None
+        return format_savings(totals["tokens_before"], totals["tokens_after"])
+
+    def report(self) -> None:
+        """
+        以 CompactionEvent 发送到 ag2 当前的输出流：终端中打印汇总行，服务中进入任务的事件流
+        """
+        totals = self.totals()
+        if totals["tokens_before"]:
+            IOStream.get_default().send(CompactionEvent(**totals))
+
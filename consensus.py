@@ -0,0 +1,124 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from autogen import ChatResult, ConversableAgent
+from autogen.agentchat import initiate_chats
+
+import config
+
+# 复审模式：sequential 按顺序逐个调用（默认），parallel 同时向所有评审专家发送任务，
+# quorum 分批调用，投票结果一旦确定（通过或不可能通过）即停止向剩余评审专家发送
+review_mode = getattr(config, "review_mode", "sequential")
+# 评审专家数量及通过所需的 APPROVE 票数（默认过半数）
+reviewer_count = getattr(config, "reviewer_count", 3)
+approve_threshold = getattr(config, "approve_threshold", reviewer_count // 2 + 1)
+
+# 评审专家名称：agent_a, agent_b, ...，复审结果保存在上下文变量 <name>_result 中
+reviewer_names = [f"agent_{chr(ord('a') + i)}" for i in range(reviewer_count)]
+
+
+def parse_vote(response: str) -> str:
+    """
+    从评审专家的回复中提取投票：第一行包含 APPROVE 即为 APPROVE，否则视为 REJECT
+    """
+    lines = (response or "").strip().splitlines()
+    return "APPROVE" if lines and "APPROVE" in lines[0].upper() else "REJECT"
+
+
+def vote_outcome(votes: list, total: int = None, threshold: int = None) -> str:
+    """
+    根据已收到的投票判断结果：APPROVE 票数达到阈值为 APPROVE，剩余票数全部赞成也达不到阈值为 REJECT，否则尚未确定返回空字符串
+    """
+    total = reviewer_count if total is None else total
+    threshold = approve_threshold if threshold is None else threshold
+    approvals = sum(1 for vote in votes if vote.upper() == "APPROVE")
+    if approvals >= threshold:
+        return "APPROVE"
+    if approvals + (total - len(votes)) < threshold:
+        return "REJECT"
+    return ""
+
+
+def votes_to_decide(votes: list, total: int = None, threshold: int = None) -> int:
+    """
+    在最理想情况下还需要多少票才能确定结果：min(还差的赞成票, 还差的反对票)
+    """
+    total = reviewer_count if total is None else total
+    threshold = approve_threshold if threshold is None else threshold
+    approvals = sum(1 for vote in votes if vote.upper() == "APPROVE")
+    rejections = len(votes) - approvals
+    return max(1, min(threshold - approvals, (total - threshold + 1) - rejections))
+
+
+def submit_chat(pool: ThreadPoolExecutor, chat: dict) -> Future:
+    """
+    在工作线程中运行一个嵌套对话；可调用的 summary_method 会写入共享的上下文变量，工作线程中只取最后一条消息，留给 collect_chat 在调用线程中执行。
+    每个任务携带当前线程上下文的副本，使 LLM 响应缓存等上下文状态在工作线程中同样生效
+    """
+    worker_chat = dict(chat, summary_method="last_msg") if callable(chat.get("summary_method")) else chat
+    return pool.submit(contextvars.copy_context().run, initiate_chats, [worker_chat])
+
+
+def collect_chat(chat: dict, future: Future) -> ChatResult:
+    """
+    在调用线程中等待嵌套对话结束，并执行它的 summary_method
+    """
+    result = future.result()[-1]
+    summary_method = chat.get("summary_method")
+    if callable(summary_method):
+        result.summary = summary_method(chat["sender"], chat["recipient"], chat.get("summary_args") or {})
+    return result
+
+
+def parallel_summary_from_nested_chats(
+        chat_queue: list,
+        recipient: ConversableAgent,
+        messages: list = None,
+        sender: ConversableAgent = None,
+        config=None
+) -> tuple:
+    """
+    并行执行嵌套对话队列中的各个对话，返回最后一个非空摘要
+    """
+    chats = ConversableAgent._get_chats_to_run(chat_queue, recipient, messages, sender, config)
+    if not chats:
+        return True, None
+
+    # 每个评审专家是一次独立的 LLM 调用，放入线程池同时发出，一轮复审只需等待最慢的一次调用；
+    # 复审结果按队列顺序在调用线程中写入上下文变量
+    with ThreadPoolExecutor(max_workers=len(chats)) as pool:
+        futures = [submit_chat(pool, chat) for chat in chats]
+        results = [collect_chat(chat, future) for chat, future in zip(chats, futures)]
+
+    summaries = [result.summary for result in results if result.summary]
+    return True, summaries[-1] if summaries else None
+
+
+def quorum_summary_from_nested_chats(
+        chat_queue: list,
+        recipient: ConversableAgent,
+        messages: list = None,
+        sender: ConversableAgent = None,
+        config=None
+) -> tuple:
+    """
+    分批并行执行嵌套对话：每批只发出确定结果所需的最少评审数，结果确定后不再调用剩余评审专家
+    """
+    chats = ConversableAgent._get_chats_to_run(chat_queue, recipient, messages, sender, config)
+    if not chats:
+        return True, None
+
+    votes = []
+    summaries = []
+    remaining = list(chats)
+    with ThreadPoolExecutor(max_workers=len(chats)) as pool:
+        while remaining and not vote_outcome(votes, total=len(chats)):
+            batch_size = votes_to_decide(votes, total=len(chats))
+            batch, remaining = remaining[:batch_size], remaining[batch_size:]
+            futures = [submit_chat(pool, chat) for chat in batch]
+            for chat, future in zip(batch, futures):
+                result = collect_chat(chat, future)
+                votes.append(parse_vote(result.chat_history[-1].get("content") if result.chat_history else ""))
+                if result.summary:
+                    summaries.append(result.summary)
+
+    return True, summaries[-1] if summaries else None
@@ -1,29 +1,37 @@
 from autogen.agentchat.group import ContextVariables
+from consensus import reviewer_names
 
-# 状态管理上下文
-context_variables = ContextVariables(data={
-    # 工作流阶段：planning->log_analysis->log_consensus->metric_analysis->metric_consensus->trace_analysis->trace_consensus->final_report
-    "workflow_stage": "planning",
+def create_context_variables() -> ContextVariables:
+    """
+    创建一份全新的状态管理上下文，每次分析运行独立使用
+    """
+    return ContextVariables(data={
+        # 工作流阶段：planning->log_analysis->log_consensus->metric_analysis->metric_consensus->trace_analysis->trace_consensus->final_report
+        "workflow_stage": "planning",
+
+        # 各阶段的分析结果
+        "plan_result": "",
+        "log_analysis_result": "",
+        "metric_analysis_result": "",
+        "trace_analysis_result": "",
 
-    # 各阶段的分析结果
-    "plan_result": "",
-    "log_analysis_result": "",
-    "metric_analysis_result": "",
-    "trace_analysis_result": "",
+        # 投票相关变量
+        "current_task": "",
+        **{f"{name}_result": "" for name in reviewer_names},
+        "review_complete": False,
+        # 已完成的投票轮数（含未通过的轮次）
+        "vote_rounds": 0,
+        "consensus_votes": [],
+        "approve_count": 0,
+        "reject_count": 0,
+        "final_result": "",
 
-    # 投票相关变量
-    "current_task": "",
-    "agent_a_result": "",
-    "agent_b_result": "",
-    "agent_c_result": "",
-    "consensus_votes": [],
-    "approve_count": 0,
-    "reject_count": 0,
-    "final_result": "",
+        # 最终结果
+        "final_log_analysis_result": "",
+        "final_metric_analysis_result": "",
+        "final_trace_analysis_result": "",
+        "final_report": ""
+    })
 
-    # 最终结果
-    "final_log_analysis_result": "",
-    "final_metric_analysis_result": "",
-    "final_trace_analysis_result": "",
-    "final_report": ""
-})
\ No newline at end of file
+# 状态管理上下文
+context_variables = create_context_variables()
@@ -0,0 +1,294 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from case_store import load_table
+from log_engine import LOG_COLUMNS
+from metric_engine import METRIC_TYPES, parse_metric_columns, to_wide
+
+import config
+
+# 跨模态对齐的时间桶宽度（秒），与 get_log 的错误时间线一致
+correlation_bucket_seconds = getattr(config, "correlation_bucket_seconds", 5)
+# 某个信号在时间桶上的 z 分数超过该值时视为异常，与各工具的 mean + 2*std 口径一致
+correlation_z_threshold = getattr(config, "correlation_z_threshold", 2.0)
+
+# 对齐矩阵的信号维度：信号 -> 名称
+SIGNALS = {"errors": "错误日志数", **{metric: label for metric, label in METRIC_TYPES.items()}, "span_duration": "跨度耗时"}
+# 模态 -> 所含信号；同一时间桶内至少两个模态异常视为跨模态共现
+MODALITIES = {"日志": ["errors"], "指标": list(METRIC_TYPES), "调用链": ["span_duration"]}
+TRACE_COLUMNS = ["timestamp", "service", "duration"]
+
+
+def service_codes(series: pd.Series, services: pd.Index) -> np.ndarray:
+    """
+    将服务列映射为服务表中的位置；列式缓存返回的分类列只映射类别表，不逐行比较字符串
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lookup = np.append(services.get_indexer(series.cat.categories.astype(str)), -1)
+        codes = series.cat.codes.to_numpy()
+        return lookup[np.where(codes < 0, len(lookup) - 1, codes)]
+    return services.get_indexer(series.astype(str))
+
+
+def masked_correlation(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    按行计算两个 (服务 × 时间桶) 矩阵的皮尔逊相关系数，只使用两者均有数据的时间桶；数据不足或无波动时为 NaN
+    """
+    both = ~(np.isnan(x) | np.isnan(y))
+    n = both.sum(axis=1)
+    x = np.where(both, x, 0.0)
+    y = np.where(both, y, 0.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean_x = x.sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dx = np.where(both, x - mean_x[:, None], 0.0)
+        dy = np.where(both, y - mean_y[:, None], 0.0)
+        corr = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+    corr[n < 3] = np.nan
+    return corr
+
+
+class CorrelationIndex:
+    """
+    跨模态时间对齐索引：日志、指标、调用链按统一的时间桶对齐为一个 (信号 × 服务 × 时间桶) 矩阵。
+
+    - values: 每个时间桶的错误日志数、各指标均值和跨度平均耗时，无数据时为 NaN（错误日志数在日志时间范围内补 0）
+    - anomaly: 每个信号在所属服务的时间序列上 z 分数超过阈值的时间桶
+    - co_occurrence: 同一服务、同一时间桶内至少两个模态异常
+
+    构建一次后，排序和相关性查询的代价只与服务数 × 时间桶数有关
+    """
+
+    def __init__(
+            self,
+            logs: Optional[pd.DataFrame],
+            metrics: Optional[pd.DataFrame],
+            traces: Optional[pd.DataFrame],
+            bucket_seconds: float = None,
+            z_threshold: float = None
+    ):
+        self.bucket_seconds = bucket_seconds or correlation_bucket_seconds
+        self.z_threshold = correlation_z_threshold if z_threshold is None else z_threshold
+        metrics = to_wide(metrics) if metrics is not None else None
+        metric_index = parse_metric_columns(metrics.columns) if metrics is not None else {}
+
+        names = set(metric_index)
+        times = []
+        if logs is not None and len(logs):
+            names.update(str(s) for s in pd.unique(logs["service"].dropna()))
+            times.append(logs["timestamp"].to_numpy(dtype=np.float64))
+        if metrics is not None and len(metrics):
+            times.append(metrics["time"].to_numpy(dtype=np.float64))
+        if traces is not None and len(traces):
+            names.update(str(s) for s in pd.unique(traces["service"].dropna()))
+            times.append(traces["timestamp"].to_numpy(dtype=np.float64))
+
+        self.services = pd.Index(sorted(names))
+        self.start = np.floor(min(t.min() for t in times) / self.bucket_seconds) * self.bucket_seconds if times else 0.0
+        end = max(t.max() for t in times) if times else self.start
+        self.bucket_count = int((end - self.start) // self.bucket_seconds) + 1
+        self.signals = list(SIGNALS)
+        self.values = np.full((len(self.signals), len(self.services), self.bucket_count), np.nan, dtype=np.float32)
+
+        if logs is not None and len(logs):
+            self._add_logs(logs)
+        if metrics is not None and len(metrics):
+            self._add_metrics(metrics, metric_index)
+        if traces is not None and len(traces):
+            self._add_traces(traces)
+
+        self.anomaly = self._anomaly()
+        # (模态 × 服务 × 时间桶)：模态内任一信号异常即视为该模态异常
+        self.modality_anomaly = np.stack([
+            self.anomaly[[self.signals.index(s) for s in signals]].any(axis=0)
+            for signals in MODALITIES.values()
+        ])
+        self.co_occurrence = self.modality_anomaly.sum(axis=0) >= 2
+
+    def _bucket(self, timestamps: np.ndarray) -> np.ndarray:
+        return ((timestamps - self.start) // self.bucket_seconds).astype(np.int64)
+
+    def _add_logs(self, logs: pd.DataFrame) -> None:
+        bucket = self._bucket(logs["timestamp"].to_numpy(dtype=np.float64))
+        service = service_codes(logs["service"], self.services)
+        is_error = (logs["level"] == "ERROR").to_numpy() & (service >= 0)
+        counts = np.bincount(
+            service[is_error] * self.bucket_count + bucket[is_error],
+            minlength=len(self.services) * self.bucket_count
+        ).reshape(len(self.services), self.bucket_count)
+        # 错误日志数在日志覆盖的时间范围内补 0，范围之外保持缺失
+        first, last = bucket.min(), bucket.max()
+        self.values[self.signals.index("errors"), :, first:last + 1] = counts[:, first:last + 1]
+
+    def _add_metrics(self, metrics: pd.DataFrame, metric_index: Dict[str, Dict[str, str]]) -> None:
+        columns = [col for service_metrics in metric_index.values() for col in service_metrics.values()]
+        bucket = self._bucket(metrics["time"].to_numpy(dtype=np.float64))
+        # 一次分组得到所有指标列的时间桶均值
+        means = metrics[columns].astype(np.float64).groupby(bucket).mean()
+        present = means.index.to_numpy()
+        position = {col: i for i, col in enumerate(columns)}
+        table = means.to_numpy()
+        for service, service_metrics in metric_index.items():
+            row = self.services.get_loc(service)
+            for metric, col in service_metrics.items():
+                self.values[self.signals.index(metric), row, present] = table[:, position[col]]
+
+    def _add_traces(self, traces: pd.DataFrame) -> None:
+        bucket = self._bucket(traces["timestamp"].to_numpy(dtype=np.float64))
+        service = service_codes(traces["service"], self.services)
+        valid = service >= 0
+        key = service[valid] * self.bucket_count + bucket[valid]
+        size = len(self.services) * self.bucket_count
+        total = np.bincount(key, weights=traces["duration"].to_numpy(dtype=np.float64)[valid], minlength=size)
+        count = np.bincount(key, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, np.nan)
+        self.values[self.signals.index("span_duration")] = mean.reshape(len(self.services), self.bucket_count)
+
+    def _anomaly(self) -> np.ndarray:
+        """
+        对每个 (信号, 服务) 的时间序列计算 z 分数，忽略缺失的时间桶
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            mean = np.nanmean(self.values, axis=2, keepdims=True)
+            std = np.nanstd(self.values, axis=2, ddof=1, keepdims=True)
+            z = (self.values - mean) / std
+        return np.nan_to_num(z, nan=0.0) > self.z_threshold
+
+    def bucket_time(self, bucket: int) -> pd.Timestamp:
+        return pd.to_datetime(self.start + bucket * self.bucket_seconds, unit="s")
+
+    def correlate(self, service: str) -> Dict[Tuple[str, str], float]:
+        """
+        单个服务各跨模态信号对的相关系数，代价为 O(时间桶数)
+        """
+        row = self.services.get_loc(service)
+        return {
+            pair: float(corr[0])
+            for pair, corr in self._pair_correlations(slice(row, row + 1)).items()
+        }
+
+    def _pair_correlations(self, rows) -> Dict[Tuple[str, str], np.ndarray]:
+        modality_of = {signal: modality for modality, signals in MODALITIES.items() for signal in signals}
+        pairs = {}
+        for i, a in enumerate(self.signals):
+            for b in self.signals[i + 1:]:
+                if modality_of[a] != modality_of[b]:
+                    pairs[(a, b)] = masked_correlation(
+                        self.values[self.signals.index(a), rows].astype(np.float64),
+                        self.values[self.signals.index(b), rows].astype(np.float64),
+                    )
+        return pairs
+
+    def ranking(self) -> pd.DataFrame:
+        """
+        按跨模态共现的时间桶数排序服务，同分时按异常时间桶总数、最早共现时间排序
+        """
+        co_buckets = self.co_occurrence.sum(axis=1)
+        any_anomaly = self.anomaly.any(axis=0)
+        first_co = np.where(co_buckets > 0, self.co_occurrence.argmax(axis=1), self.bucket_count)
+        frame = pd.DataFrame({
+            "co_buckets": co_buckets,
+            "anomaly_buckets": any_anomaly.sum(axis=1),
+            "first_co": first_co,
+        }, index=self.services)
+        return frame.sort_values(["co_buckets", "anomaly_buckets", "first_co"], ascending=[False, False, True], kind="stable")
+
+    @staticmethod
+    def runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        将时间桶掩码游程编码为 [开始, 结束) 时间桶区间
+        """
+        edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+        return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+    def intervals(self, mask: np.ndarray) -> List[dict]:
+        return [
+            {"开始": self.bucket_time(start), "结束": self.bucket_time(end), "时间桶数": end - start}
+            for start, end in self.runs(mask)
+        ]
+
+    def summary(self, top_k: int = 10) -> dict:
+        """
+        输出对齐概况、按跨模态共现排序的服务，以及全局的共现时间段
+        """
+        ranking = self.ranking()
+        ranked = ranking[ranking["co_buckets"] > 0].head(top_k)
+        rows = [self.services.get_loc(service) for service in ranked.index]
+        correlations = self._pair_correlations(rows) if rows else {}
+
+        services = {}
+        for k, (service, row) in enumerate(zip(ranked.index, rows)):
+            modality_buckets = {
+                modality: int((self.modality_anomaly[m, row] & self.co_occurrence[row]).sum())
+                for m, modality in enumerate(MODALITIES)
+            }
+            pair_corr = {
+                f"{SIGNALS[a]}~{SIGNALS[b]}": round(float(corr[k]), 3)
+                for (a, b), corr in correlations.items()
+                if not np.isnan(corr[k])
+            }
+            services[service] = {
+                "共现时间桶数": int(ranked.loc[service, "co_buckets"]),
+                "异常时间桶数": int(ranked.loc[service, "anomaly_buckets"]),
+                "最早共现时间": self.bucket_time(int(ranked.loc[service, "first_co"])),
+                "共现中各模态异常时间桶数": modality_buckets,
+                "共现时间段": self.intervals(self.co_occurrence[row]),
+                "跨模态相关系数": dict(sorted(pair_corr.items(), key=lambda item: -abs(item[1]))),
+            }
+
+        # 全局：每个时间桶内出现跨模态共现的服务数
+        services_per_bucket = self.co_occurrence.sum(axis=0)
+        return {
+            "对齐概况": {
+                "服务数": len(self.services),
+                "时间桶数": self.bucket_count,
+                "时间桶宽度（秒）": self.bucket_seconds,
+                "开始时间": self.bucket_time(0),
+                "结束时间": self.bucket_time(self.bucket_count),
+                "z 分数阈值": self.z_threshold,
+                "存在跨模态共现的服务数": int((ranking["co_buckets"] > 0).sum()),
+            },
+            "服务排序": services,
+            "全局共现时间段": [
+                {
+                    "开始": self.bucket_time(start),
+                    "结束": self.bucket_time(end),
+                    "时间桶数": end - start,
+                    "最多共现服务数": int(services_per_bucket[start:end].max()),
+                }
+                for start, end in self.runs(services_per_bucket > 0)
+            ],
+        }
+
+
+def _signature(paths: List[str]) -> tuple:
+    # 文件大小 + 修改时间，任一文件变化即重新构建索引
+    return tuple(
+        (os.stat(path).st_size, os.stat(path).st_mtime_ns) if os.path.exists(path) else None
+        for path in paths
+    )
+
+
+@lru_cache(maxsize=8)
+def _build_index(case_path: str, signature: tuple) -> CorrelationIndex:
+    def read(name: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        path = os.path.join(case_path, name)
+        return load_table(path, columns) if os.path.exists(path) else None
+
+    return CorrelationIndex(read("logs.csv", LOG_COLUMNS), read("metrics.csv"), read("traces.csv", TRACE_COLUMNS))
+
+
+def load_correlation_index(case_path: str) -> CorrelationIndex:
+    """
+    获取案例的跨模态对齐索引；同一进程内每个案例只构建一次，案例文件变化后重新构建
+    """
+    case_path = os.path.abspath(case_path)
+    files = [os.path.join(case_path, name) for name in ("logs.csv", "metrics.csv", "traces.csv")]
+    return _build_index(case_path, _signature(files))
@@ -0,0 +1,319 @@
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from metric_engine import METRIC_TYPES, parse_metric_columns
+
+import config
+
+# 基线点数：每列前若干个有效值的均值和标准差作为基线水平和噪声，之后的数据点才参与检测
+detector_baseline_points = getattr(config, "detector_baseline_points", 30)
+# EWMA 平滑系数；EWMA 均值相对基线的残差按 EWMA 统计量的标准差（σ·sqrt(α/(2-α))）标准化
+detector_ewma_alpha = getattr(config, "detector_ewma_alpha", 0.3)
+# 中位数 / MAD 的窗口点数
+detector_mad_window = getattr(config, "detector_mad_window", 30)
+# EWMA 控制图和分块 MAD 稳健 z 分数的报警阈值，以及构成一次报警所需的连续超限点数（过滤重尾噪声中的单点尖刺）
+detector_z_threshold = getattr(config, "detector_z_threshold", 5.0)
+detector_min_run = getattr(config, "detector_min_run", 2)
+# CUSUM 参考偏移 k 和决策阈值 h（以基线标准差为单位）
+detector_cusum_k = getattr(config, "detector_cusum_k", 1.0)
+detector_cusum_h = getattr(config, "detector_cusum_h", 10.0)
+# 一个指标至少有几个检测器报警才认定为异常；单个检测器在长序列上难免误报，多检测器一致时才输出
+detector_min_votes = getattr(config, "detector_min_votes", 2)
+
+# MAD 换算为正态分布标准差的系数
+MAD_SCALE = 1.4826
+
+DETECTORS = ("EWMA", "MAD", "CUSUM")
+
+# update 内部每次处理的最大行数
+UPDATE_ROWS = 65536
+
+
+class MetricDetectors:
+    """
+    对 (时间 × 指标列) 矩阵的所有列同时运行三种单遍异常检测，数据可以分块到达：
+    - EWMA 残差：平滑后的均值偏离基线的程度，对持续数个采样点的抬升敏感，对单点噪声不敏感
+    - 分块中位数 / MAD：观测值与上一个完整窗口的中位数之差除以该窗口的 MAD，对异常值稳健
+    - CUSUM：相对基线的双侧累积和，适合持续的水平偏移；变点取报警前累积和最后一次为 0 的位置
+    EWMA 由 pandas 的 Cython 实现逐列单遍计算，窗口中位数由一次向量化排序得到，CUSUM 用累积和与前缀最小值的闭式解，
+    均不逐行循环。数据块之间只保留每列的基线、EWMA 均值、最近窗口的中位数和 MAD、CUSUM 累积和、连续超限状态
+    以及未凑满一个窗口的数据，分块处理与整体处理的结果一致
+    """
+
+    def __init__(
+            self,
+            baseline_points: int = detector_baseline_points,
+            alpha: float = detector_ewma_alpha,
+            window: int = detector_mad_window,
+            z_threshold: float = detector_z_threshold,
+            min_run: int = detector_min_run,
+            cusum_k: float = detector_cusum_k,
+            cusum_h: float = detector_cusum_h,
+            min_votes: int = detector_min_votes
+    ):
+        self.baseline_points = baseline_points
+        self.alpha = alpha
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_run = min_run
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.min_votes = min_votes
+
+        self.columns: List[str] = []
+        self._position: Dict[str, int] = {}
+        # 基线建立前各列已收集的有效值
+        self._pending: Dict[str, List[float]] = {}
+        self.base_level = np.zeros(0)
+        self.base_sigma = np.zeros(0)
+        self.ready = np.zeros(0, dtype=bool)
+        self.ewma_mean = np.zeros(0)
+        # 分块 MAD：尚未凑满一块的数据，以及最近一个完整块的中位数和 MAD
+        self._partial = pd.DataFrame()
+        self.block_median = np.zeros(0)
+        self.block_mad = np.zeros(0)
+        # CUSUM 上、下累积和，以及当前偏移段的起始时间（累积和为 0 时为 NaN）
+        self.cusum = np.zeros((2, 0))
+        self.excursion_start = np.zeros((2, 0))
+        # EWMA / MAD 当前连续超限的点数和起始时间
+        self.run_length = {name: np.zeros(0, dtype=np.int64) for name in DETECTORS[:2]}
+        self.run_start = {name: np.zeros(0) for name in DETECTORS[:2]}
+        # 检测结果：各检测器首次报警时间（EWMA / MAD 为首个达标连续段的起点）、报警点数、方向；CUSUM 另有变点时间
+        self.first_alarm = {name: np.zeros(0) for name in DETECTORS}
+        self.alarm_count = {name: np.zeros(0, dtype=np.int64) for name in DETECTORS}
+        self.direction = {name: np.zeros(0, dtype=np.int8) for name in DETECTORS}
+        self.change_point = np.zeros(0)
+
+    def _ensure_columns(self, columns: List[str]) -> np.ndarray:
+        """
+        返回数据块各列在状态数组中的位置，新出现的列追加到末尾
+        """
+        added = [col for col in columns if col not in self._position]
+        if added:
+            pad = len(added)
+            for col in added:
+                self._position[col] = len(self.columns)
+                self.columns.append(col)
+                self._pending[col] = []
+            self.base_level = np.concatenate([self.base_level, np.full(pad, np.nan)])
+            self.base_sigma = np.concatenate([self.base_sigma, np.full(pad, np.nan)])
+            self.ready = np.concatenate([self.ready, np.zeros(pad, dtype=bool)])
+            self.ewma_mean = np.concatenate([self.ewma_mean, np.full(pad, np.nan)])
+            self.block_median = np.concatenate([self.block_median, np.full(pad, np.nan)])
+            self.block_mad = np.concatenate([self.block_mad, np.full(pad, np.nan)])
+            self.cusum = np.concatenate([self.cusum, np.zeros((2, pad))], axis=1)
+            self.excursion_start = np.concatenate([self.excursion_start, np.full((2, pad), np.nan)], axis=1)
+            for name in DETECTORS:
+                self.first_alarm[name] = np.concatenate([self.first_alarm[name], np.full(pad, np.nan)])
+                self.alarm_count[name] = np.concatenate([self.alarm_count[name], np.zeros(pad, dtype=np.int64)])
+                self.direction[name] = np.concatenate([self.direction[name], np.zeros(pad, dtype=np.int8)])
+            for name in self.run_length:
+                self.run_length[name] = np.concatenate([self.run_length[name], np.zeros(pad, dtype=np.int64)])
+                self.run_start[name] = np.concatenate([self.run_start[name], np.full(pad, np.nan)])
+            self.change_point = np.concatenate([self.change_point, np.full(pad, np.nan)])
+        return np.array([self._position[col] for col in columns], dtype=np.int64)
+
+    def _establish_baselines(self, values: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """
+        为尚无基线的列收集前 baseline_points 个有效值，凑齐后计算基线水平和噪声；
+        返回本块中参与检测的掩码（基线点本身和基线建立前的点不参与检测）
+        """
+        active = np.broadcast_to(self.ready[index], values.shape).copy()
+        for j in np.flatnonzero(~self.ready[index]):
+            col = self.columns[index[j]]
+            valid_rows = np.flatnonzero(~np.isnan(values[:, j]))
+            need = self.baseline_points - len(self._pending[col])
+            self._pending[col].extend(values[valid_rows[:need], j].tolist())
+            if len(self._pending[col]) < self.baseline_points:
+                continue
+            baseline = np.asarray(self._pending.pop(col))
+            level = float(np.mean(baseline))
+            # 噪声下限取基线水平的 1%，避免常量基线上的微小波动被判为异常
+            sigma = max(float(np.std(baseline, ddof=1)), 0.01 * abs(level), 1e-9)
+            i = index[j]
+            self.base_level[i], self.base_sigma[i], self.ready[i] = level, sigma, True
+            self.ewma_mean[i] = level
+            active[valid_rows[need - 1] + 1:, j] = True
+        return active
+
+    def _record(self, name: str, flags: np.ndarray, signs: np.ndarray, times: np.ndarray, index: np.ndarray) -> None:
+        """
+        连续超限 min_run 个点构成报警：累计报警点数，记录首次报警所在连续段的起点时间和方向。
+        以每行结尾的 min_run 个点是否全部超限由超限点数的累积和相减得到，块首不足的部分由上一块结束时的连续段长度补齐
+        """
+        rows, width = flags.shape
+        carried_length = self.run_length[name][index]
+        carried_start = np.where(carried_length > 0, self.run_start[name][index], times[0])
+        lead = np.arange(self.min_run - 1, 0, -1)[:, None] <= carried_length
+        counts = np.zeros((rows + self.min_run, width), dtype=np.int32)
+        np.cumsum(np.vstack([lead, flags]), axis=0, out=counts[1:])
+        alarms = counts[self.min_run:] - counts[:rows] >= self.min_run
+
+        self.alarm_count[name][index] += alarms.sum(axis=0)
+        first_row = alarms.argmax(axis=0)
+        for j in np.flatnonzero(alarms.any(axis=0) & np.isnan(self.first_alarm[name][index])):
+            # 只对首次报警的列回溯连续段的起点
+            clear = np.flatnonzero(~flags[:first_row[j] + 1, j])
+            self.first_alarm[name][index[j]] = times[clear[-1] + 1] if len(clear) else carried_start[j]
+            self.direction[name][index[j]] = signs[first_row[j], j]
+
+        any_clear = ~flags.all(axis=0)
+        last_clear = rows - 1 - (~flags[::-1]).argmax(axis=0)
+        length = np.where(any_clear, rows - 1 - last_clear, carried_length + rows)
+        self.run_length[name][index] = length
+        self.run_start[name][index] = np.where(length == 0, np.nan, np.where(any_clear, times[np.minimum(last_clear + 1, rows - 1)], carried_start))
+
+    def _ewma(self, values: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """
+        EWMA 残差 z 分数：EWMA 均值与基线水平之差除以 EWMA 统计量的标准差。
+        把上一块结束时的 EWMA 均值作为第一行接在数据块前面，adjust=False 的递推从该状态继续
+        """
+        means = pd.DataFrame(np.vstack([self.ewma_mean[index], values])).ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean().to_numpy()
+        self.ewma_mean[index] = means[-1]
+        residual = np.where(np.isnan(values), np.nan, means[1:] - self.base_level[index])
+        return residual / (self.base_sigma[index] * np.sqrt(self.alpha / (2 - self.alpha)))
+
+    def _mad(self, values: np.ndarray, index: np.ndarray, columns: List[str]) -> np.ndarray:
+        """
+        分块中位数 / MAD 稳健 z 分数：按全局行号每 window 个点为一块，块内各点与上一个完整块的中位数和 MAD 比较，
+        当前块不参与自身的基准。各块的中位数由一次向量化排序得到，代价与点数成线性；跨块边界的未完整块留到下一次
+        """
+        partial = self._partial.reindex(columns=columns).to_numpy(dtype=np.float64) if len(self._partial) else np.empty((0, len(columns)))
+        frame = np.vstack([partial, values])
+        blocks = len(frame) // self.window
+        complete = frame[:blocks * self.window].reshape(blocks, self.window, len(columns))
+        median = nan_median(complete)
+        mad = nan_median(np.abs(complete - median[:, None, :])) * MAD_SCALE
+        # 第 b 块的基准为第 b-1 块；全部缺失的块沿用更早的基准
+        reference_median = pd.DataFrame(np.vstack([self.block_median[index], median])).ffill().to_numpy()
+        reference_mad = pd.DataFrame(np.vstack([self.block_mad[index], mad])).ffill().to_numpy()
+        block_of_row = np.arange(len(partial), len(frame)) // self.window
+        self.block_median[index], self.block_mad[index] = reference_median[-1], reference_mad[-1]
+        self._partial = pd.DataFrame(frame[blocks * self.window:], columns=columns)
+        return (values - reference_median[block_of_row]) / np.maximum(reference_mad[block_of_row], self.base_sigma[index])
+
+    def _cusum(self, values: np.ndarray, times: np.ndarray, index: np.ndarray) -> None:
+        """
+        双侧 CUSUM：S_t = max(0, S_{t-1} + z_t - k) 等价于 S_t = D_t - min(0, min_{s<=t} D_s)，
+        其中 D 为以上一块结束时的 S 为起点的 (z - k) 累积和；变点取报警时刻之前 S 最后一次为 0 之后的第一个点
+        """
+        rows = len(values)
+        z = (values - self.base_level[index]) / self.base_sigma[index]
+        for side, sign in ((0, 1), (1, -1)):
+            step = np.where(np.isnan(z), 0.0, sign * z - self.cusum_k)
+            drift = np.cumsum(step, axis=0)
+            drift += self.cusum[side, index]
+            s = drift - np.minimum(np.minimum.accumulate(drift, axis=0), 0.0)
+            # 本块中尚未归零的列，偏移段从上一块延续；上一块结束时为 0 则从本块第一个点开始
+            carried = np.where(np.isnan(self.excursion_start[side, index]), times[0], self.excursion_start[side, index])
+
+            alarms = s > self.cusum_h
+            self.alarm_count["CUSUM"][index] += alarms.sum(axis=0)
+            first_row = alarms.argmax(axis=0)
+            for j in np.flatnonzero(alarms.any(axis=0)):
+                alarm_time = times[first_row[j]]
+                # 两侧都报警时保留较早的变点
+                if not np.isnan(self.first_alarm["CUSUM"][index[j]]) and alarm_time >= self.first_alarm["CUSUM"][index[j]]:
+                    continue
+                zeros = np.flatnonzero(s[:first_row[j], j] == 0)
+                self.first_alarm["CUSUM"][index[j]] = alarm_time
+                self.change_point[index[j]] = times[zeros[-1] + 1] if len(zeros) else carried[j]
+                self.direction["CUSUM"][index[j]] = sign
+
+            zero = s == 0
+            last_zero = rows - 1 - zero[::-1].argmax(axis=0)
+            self.cusum[side, index] = s[-1]
+            self.excursion_start[side, index] = np.where(zero[-1], np.nan, np.where(zero.any(axis=0), times[np.minimum(last_zero + 1, rows - 1)], carried))
+
+    def update(self, times: np.ndarray, values: np.ndarray, columns: List[str]) -> None:
+        """
+        并入一块按时间排序的数据：times 为秒级时间戳，values 为 (行 × 列) 矩阵，columns 为列名。
+        大块数据按 UPDATE_ROWS 行切片处理，中间数组的内存占用与总行数无关
+        """
+        if len(times) == 0 or not columns:
+            return
+        times = np.asarray(times, dtype=np.float64)
+        index = self._ensure_columns(columns)
+        for begin in range(0, len(times), UPDATE_ROWS):
+            self._update(times[begin:begin + UPDATE_ROWS], np.asarray(values[begin:begin + UPDATE_ROWS], dtype=np.float64), index, columns)
+
+    def _update(self, times: np.ndarray, values: np.ndarray, index: np.ndarray, columns: List[str]) -> None:
+        active = self._establish_baselines(values, index)
+        # 基线建立前的点不参与检测，也不进入 EWMA 和窗口中位数
+        values = np.where(active, values, np.nan)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            ewma_z = self._ewma(values, index)
+            mad_z = self._mad(values, index, columns)
+            for name, z in (("EWMA", ewma_z), ("MAD", mad_z)):
+                flags = np.abs(z) > self.z_threshold
+                self._record(name, flags, np.sign(z).astype(np.int8), times, index)
+            self._cusum(values, times, index)
+
+    def onsets(self) -> Dict[str, dict]:
+        """
+        按服务汇总：至少 min_votes 个检测器报警的指标视为异常，其起始时间取各检测器中最早的（CUSUM 取变点）；
+        服务的异常起始时间取其异常指标中最早的。没有异常指标的服务不列出
+        """
+        result = {}
+        for service, metrics in parse_metric_columns(self.columns).items():
+            metric_results = {}
+            for metric, label in METRIC_TYPES.items():
+                if metric not in metrics:
+                    continue
+                i = self._position[metrics[metric]]
+                detected = {}
+                if not np.isnan(self.change_point[i]):
+                    detected["CUSUM"] = {
+                        "变点时间": to_timestamp(self.change_point[i]),
+                        "报警时间": to_timestamp(self.first_alarm["CUSUM"][i]),
+                        "方向": "上升" if self.direction["CUSUM"][i] > 0 else "下降",
+                    }
+                for name in ("EWMA", "MAD"):
+                    if not np.isnan(self.first_alarm[name][i]):
+                        detected[name] = {
+                            "首次报警时间": to_timestamp(self.first_alarm[name][i]),
+                            "报警点数": int(self.alarm_count[name][i]),
+                            "方向": "上升" if self.direction[name][i] > 0 else "下降",
+                        }
+                if len(detected) >= self.min_votes:
+                    onset = min(d.get("变点时间", d.get("首次报警时间")) for d in detected.values())
+                    metric_results[label] = {"异常起始时间": onset, **detected}
+            if metric_results:
+                result[service] = {
+                    "异常起始时间": min(m["异常起始时间"] for m in metric_results.values()),
+                    "报警检测器数": sum(len(m) - 1 for m in metric_results.values()),
+                    "异常指标": metric_results,
+                }
+        # 基线估计偏差造成的误报通常只有一两个检测器、出现在序列早期，按证据强度优先、起始时间其次排序
+        return dict(sorted(result.items(), key=lambda item: (-item[1]["报警检测器数"], item[1]["异常起始时间"])))
+
+
+def nan_median(blocks: np.ndarray) -> np.ndarray:
+    """
+    (块 × 块内点 × 列) 数组沿块内点求中位数，忽略缺失值：排序后缺失值在末尾，按各块有效点数取中间位置
+    """
+    ordered = np.sort(blocks, axis=1)
+    count = (~np.isnan(blocks)).sum(axis=1)
+    low = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[:, None, :], axis=1)[:, 0, :]
+    high = np.take_along_axis(ordered, np.maximum(count // 2, 0)[:, None, :], axis=1)[:, 0, :]
+    return np.where(count > 0, (low + high) / 2, np.nan)
+
+
+def to_timestamp(seconds: float) -> pd.Timestamp:
+    return pd.Timestamp(seconds, unit="s")
+
+
+def detect_metric_onsets(df: pd.DataFrame, detectors: Optional[MetricDetectors] = None) -> Dict[str, dict]:
+    """
+    对宽表格式的指标数据（time + <service>_<metric> 列）运行全部检测器，返回各服务的异常起始时间
+    """
+    detectors = detectors or MetricDetectors()
+    order = np.argsort(df["time"].to_numpy(), kind="stable")
+    columns = [col for metrics in parse_metric_columns(df.columns).values() for col in metrics.values()]
+    values = df[columns].to_numpy(dtype=np.float64)[order] if columns else np.empty((len(df), 0))
+    detectors.update(df["time"].to_numpy(dtype=np.float64)[order], values, columns)
+    return detectors.onsets()
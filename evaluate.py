@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import json
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import config
+
+# 根因服务的 top-k 准确率取哪些 k
+evaluate_top_k = getattr(config, "evaluate_top_k", [1, 3])
+# 各案例目录中的标注文件，取其中的 fault.service（根因服务）和 fault.type（故障类型）
+evaluate_label_file = getattr(config, "evaluate_label_file", "case.json")
+
+# 故障类型 -> 报告中可能出现的写法；按顺序匹配，先出现的类型优先
+FAULT_TYPES = {
+    "cpu": ["cpu", "处理器"],
+    "memory": ["memory", "mem", "oom", "内存"],
+    "disk": ["disk", "磁盘", "io"],
+    "network": ["network", "网络", "丢包", "packet loss"],
+    "latency": ["latency", "延迟", "超时", "timeout"],
+    "error": ["error", "exception", "错误"],
+}
+
+# 报告中明确给出根因服务和故障类型的行，如 "根因服务：service-0, service-3"、"故障类型：cpu"
+SERVICE_LINE = re.compile(r"根因服务[^：:\n]*[：:]\s*(.+)")
+FAULT_TYPE_LINE = re.compile(r"故障类型[^：:\n]*[：:]\s*(.+)")
+SEPARATORS = re.compile(r"[，,、;；/\s]+")
+
+
+def service_pattern(service: str) -> re.Pattern:
+    # 服务名前后不能紧跟字母、数字、下划线或连字符，避免 service-1 匹配到 service-10
+    return re.compile(rf"(?<![\w-]){re.escape(service)}(?![\w-])", re.IGNORECASE)
+
+
+def normalize_fault_type(text: str) -> Optional[str]:
+    """
+    将故障类型的各种写法归一化为 FAULT_TYPES 中的类型名，无法识别时返回 None
+    """
+    text = str(text or "").lower()
+    found = []
+    for fault_type, keywords in FAULT_TYPES.items():
+        positions = [m.start() for keyword in keywords for m in re.finditer(rf"(?<![a-z]){re.escape(keyword)}(?![a-z])", text)]
+        if positions:
+            found.append((min(positions), fault_type))
+    return min(found)[1] if found else None
+
+
+def extract_services(report: str, services: List[str]) -> List[str]:
+    """
+    从最终报告中提取按可能性排序的候选根因服务：先取“根因服务：”行中列出的服务，
+    再按首次提及的位置补上报告中出现的其他已知服务
+    """
+    report = report or ""
+    candidates = []
+    match = SERVICE_LINE.search(report)
+    if match:
+        for token in SEPARATORS.split(match.group(1).strip()):
+            token = token.strip("`*\"'（）()[]【】。.")
+            known = [s for s in services if s.lower() == token.lower()]
+            if known or (token and not services):
+                candidates.append(known[0] if known else token)
+    mentioned = []
+    for service in services:
+        hit = service_pattern(service).search(report)
+        if hit:
+            mentioned.append((hit.start(), service))
+    candidates.extend(service for _, service in sorted(mentioned))
+    return list(dict.fromkeys(candidates))
+
+
+def extract_fault_type(report: str) -> Optional[str]:
+    """
+    从最终报告中提取故障类型：优先取“故障类型：”行，否则取全文中最先出现的类型关键词
+    """
+    report = report or ""
+    match = FAULT_TYPE_LINE.search(report)
+    if match:
+        fault_type = normalize_fault_type(match.group(1))
+        if fault_type:
+            return fault_type
+    return normalize_fault_type(report)
+
+
+def load_labels(case_ids: List[str], labels_file: str = None, dataset: str = None) -> Dict[str, dict]:
+    """
+    读取案例标注：labels_file 为 {案例ID: {"service": ..., "type": ...}} 格式的 JSON（值也可以只是服务名）；
+    未指定时读取各案例目录中 evaluate_label_file 的 fault 字段。没有标注的案例不参与评分
+    """
+    labels = {}
+    if labels_file:
+        with open(labels_file, encoding="utf-8") as f:
+            raw = json.load(f)
+        for case_id in case_ids:
+            label = raw.get(case_id)
+            if label is not None:
+                labels[case_id] = label if isinstance(label, dict) else {"service": label}
+        return labels
+
+    dataset = dataset or config.dataset_path
+    for case_id in case_ids:
+        path = os.path.join(dataset, f"case_{case_id}", evaluate_label_file)
+        try:
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        fault = meta.get("fault", meta)
+        if fault.get("service"):
+            labels[case_id] = {"service": fault["service"], "type": fault.get("type")}
+    return labels
+
+
+def case_services(case_ids: List[str], dataset: str = None) -> Dict[str, List[str]]:
+    """
+    各案例数据中出现的服务（取自数据集清单），用于在报告中识别服务名
+    """
+    from catalog import load_catalog
+    catalog = load_catalog(dataset)
+    return {case_id: catalog.get(case_id, {}).get("services", []) for case_id in case_ids}
+
+
+def score_report(report: str, label: dict, services: List[str], ks: List[int] = None) -> dict:
+    """
+    对单个案例的最终报告评分：根因服务是否在前 k 个候选中，故障类型是否一致（标注没有故障类型时为 None）
+    """
+    ks = ks or evaluate_top_k
+    candidates = extract_services(report, services)
+    expected = str(label["service"]).lower()
+    rank = next((i + 1 for i, s in enumerate(candidates) if s.lower() == expected), None)
+    predicted_type = extract_fault_type(report)
+    label_type = normalize_fault_type(label.get("type")) if label.get("type") else None
+    return {
+        "label_service": label["service"],
+        "label_type": label_type,
+        "predicted_services": candidates[:max(ks)],
+        "predicted_type": predicted_type,
+        "service_rank": rank,
+        **{f"top{k}": rank is not None and rank <= k for k in ks},
+        "type_correct": None if label_type is None else predicted_type == label_type,
+    }
+
+
+def trace_cost(trace_file: str) -> dict:
+    """
+    从运行记录汇总单个案例的 LLM 调用次数、缓存命中、LLM 耗时、token 数和对话压缩节省的 token 数（估计）
+    """
+    from instrumentation import summarize_events
+
+    cost = {"llm_calls": 0, "cached_calls": 0, "llm_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+    try:
+        with open(trace_file, encoding="utf-8") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return dict(cost, compaction_tokens_saved=0)
+    summary = summarize_events(events)
+    for row in summary["agents"].values():
+        for key in cost:
+            cost[key] += row[key]
+    cost["compaction_tokens_saved"] = sum(row["tokens_saved"] for row in summary["compaction"].values())
+    cost["llm_seconds"] = round(cost["llm_seconds"], 3)
+    return cost
+
+
+def mean(values: list) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def evaluate_output(output_dir: str, case_ids: List[str], labels: Dict[str, dict], ks: List[int] = None, dataset: str = None) -> dict:
+    """
+    读取批量运行结果目录中各案例的 case_<id>.json 和运行记录，逐案例评分并汇总准确率、耗时和 LLM 开销
+    """
+    ks = ks or evaluate_top_k
+    services = case_services(case_ids, dataset)
+    cases = []
+    for case_id in case_ids:
+        try:
+            with open(os.path.join(output_dir, f"case_{case_id}.json"), encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = {"status": "missing", "elapsed_seconds": None, "context_variables": {}}
+        report = (result.get("context_variables") or {}).get("final_report") or ""
+        cost = trace_cost(os.path.join(output_dir, f"case_{case_id}.trace.jsonl"))
+        row = {
+            "case_id": case_id,
+            "status": result.get("status"),
+            "elapsed_seconds": result.get("elapsed_seconds"),
+            **cost,
+            "total_tokens": cost["prompt_tokens"] + cost["completion_tokens"],
+        }
+        if case_id in labels:
+            row.update(score_report(report, labels[case_id], services.get(case_id, []), ks))
+        cases.append(row)
+
+    scored = [c for c in cases if "service_rank" in c]
+    typed = [c for c in scored if c["type_correct"] is not None]
+    elapsed = sorted(c["elapsed_seconds"] for c in cases if c["elapsed_seconds"] is not None)
+    return {
+        "total_cases": len(cases),
+        "scored_cases": len(scored),
+        "accuracy": {
+            **{f"top{k}": mean([float(c[f"top{k}"]) for c in scored]) for k in ks},
+            "fault_type": mean([float(c["type_correct"]) for c in typed]),
+        },
+        "per_case": {
+            "elapsed_seconds_mean": mean(elapsed),
+            "elapsed_seconds_p50": elapsed[len(elapsed) // 2] if elapsed else None,
+            "elapsed_seconds_max": elapsed[-1] if elapsed else None,
+            "llm_calls_mean": mean([c["llm_calls"] for c in cases]),
+            "prompt_tokens_mean": mean([c["prompt_tokens"] for c in cases]),
+            "completion_tokens_mean": mean([c["completion_tokens"] for c in cases]),
+            "total_tokens_mean": mean([c["total_tokens"] for c in cases]),
+            "compaction_tokens_saved_mean": mean([c["compaction_tokens_saved"] for c in cases]),
+        },
+        "cases": cases,
+    }
+
+
+def format_evaluation(evaluation: dict, ks: List[int] = None) -> str:
+    """
+    将评分结果格式化为逐案例表格和汇总行
+    """
+    ks = ks or evaluate_top_k
+    lines = [f"{'案例ID':<12} {'状态':<10} {'标注服务':<16} {'预测服务':<28} {'排名':>4} {'类型':>6} {'耗时(秒)':>9} {'LLM调用':>8} {'token':>9}"]
+    for c in evaluation["cases"]:
+        predicted = ",".join(c.get("predicted_services", []))
+        type_mark = {True: "对", False: "错", None: "-"}[c.get("type_correct")]
+        lines.append(
+            f"{c['case_id']:<12} {str(c['status']):<10} {str(c.get('label_service', '-')):<16} {predicted[:28]:<28} "
+            f"{str(c.get('service_rank') or '-'):>4} {type_mark:>6} {str(c['elapsed_seconds']):>9} {c['llm_calls']:>8} {c['total_tokens']:>9}"
+        )
+    accuracy = evaluation["accuracy"]
+    per_case = evaluation["per_case"]
+    lines.append("")
+    lines.append(
+        f"评分案例 {evaluation['scored_cases']}/{evaluation['total_cases']}，"
+        + "，".join(f"top-{k} 准确率 {accuracy[f'top{k}']}" for k in ks)
+        + f"，故障类型准确率 {accuracy['fault_type']}"
+    )
+    lines.append(
+        f"每案例平均耗时 {per_case['elapsed_seconds_mean']} 秒（p50 {per_case['elapsed_seconds_p50']}，最大 {per_case['elapsed_seconds_max']}），"
+        f"平均 LLM 调用 {per_case['llm_calls_mean']} 次，平均 token {per_case['total_tokens_mean']}，"
+        f"对话压缩平均节省 token {per_case['compaction_tokens_saved_mean']}（估计）"
+    )
+    return "\n".join(lines)
+
+
+def run_evaluation(
+        case_ids: List[str],
+        output_dir: str = None,
+        max_workers: int = None,
+        max_rounds: int = 100,
+        cache_mode: str = None,
+        labels_file: str = None,
+        ks: List[int] = None,
+        score_only: bool = False,
+        compaction: str = None
+) -> dict:
+    """
+    在进程池中并行运行案例（同 batch.py），再对结果评分，写出 evaluation.json；score_only 时只对已有结果目录评分
+    """
+    from batch import batch_output_path, batch_workers, run_batch
+
+    ks = ks or evaluate_top_k
+    output_dir = output_dir or os.path.join(batch_output_path, f"eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    if not score_only:
+        run_batch(case_ids, output_dir=output_dir, max_workers=max_workers or batch_workers, max_rounds=max_rounds, cache_mode=cache_mode, compaction=compaction)
+
+    evaluation = evaluate_output(output_dir, case_ids, load_labels(case_ids, labels_file), ks)
+    with open(os.path.join(output_dir, "evaluation.json"), "w", encoding="utf-8") as f:
+        json.dump(evaluation, f, ensure_ascii=False, indent=2)
+    print(format_evaluation(evaluation, ks))
+    print(f"评分结果：{os.path.join(output_dir, 'evaluation.json')}")
+    return evaluation
+
+
+def main(argv: List[str] = None) -> None:
+    from batch import batch_workers, parse_case_ids
+
+    parser = argparse.ArgumentParser(description="批量运行根因分析工作流，并对照标注评估准确率和开销")
+    parser.add_argument("--cases", required=True, help='案例ID列表，如 "1-10,15,20"，或 "all" 表示数据集中的全部案例')
+    parser.add_argument("--workers", type=int, default=batch_workers, help="并发进程数")
+    parser.add_argument("--output", default=None, help="结果输出目录")
+    parser.add_argument("--max-rounds", type=int, default=100, help="每个案例的最大对话轮数")
+    parser.add_argument("--llm-cache", choices=["record", "replay", "bypass"], default=None, help="LLM 响应缓存模式，默认取 config.llm_cache_mode")
+    parser.add_argument("--compaction", choices=["stage", "off"], default=None, help="对话压缩模式，默认取 config.compaction_mode")
+    parser.add_argument("--labels", default=None, help=f"标注文件（JSON），默认读取各案例目录中的 {evaluate_label_file}")
+    parser.add_argument("--top-k", default=",".join(str(k) for k in evaluate_top_k), help='逗号分隔的 k 值，如 "1,3"')
+    parser.add_argument("--score-only", action="store_true", help="不运行工作流，只对 --output 目录中已有的结果评分")
+    args = parser.parse_args(argv)
+    if args.score_only and not args.output:
+        sys.exit("--score-only 需要通过 --output 指定之前的结果目录")
+
+    case_ids = parse_case_ids(args.cases)
+    if not case_ids:
+        sys.exit("没有需要评估的案例")
+    run_evaluation(
+        case_ids, output_dir=args.output, max_workers=args.workers, max_rounds=args.max_rounds, cache_mode=args.llm_cache,
+        labels_file=args.labels, ks=[int(k) for k in args.top_k.split(",") if k.strip()], score_only=args.score_only,
+        compaction=args.compaction
+    )
+
+
+if __name__ == "__main__":
+    main()
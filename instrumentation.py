@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+from autogen import runtime_logging
+from autogen.io import IOStream
+from autogen.logger.base_logger import BaseLogger
+from autogen.agentchat.group import ReplyResult
+from autogen.events.agent_events import GroupChatRunChatEvent, ExecuteFunctionEvent, ExecutedFunctionEvent
+
+import config
+
+# 运行记录（JSONL）的输出目录，设置后每次 run_case 都会记录各轮次的智能体、LLM 耗时与 token、工具耗时和交接目标
+instrumentation_path = getattr(config, "instrumentation_path", None)
+
+# 当前线程所在的群聊轮次；复审线程和并行分析线程复制调用方上下文，LLM 调用和工具调用可归属到发起它们的轮次
+_current_round: ContextVar[Optional[dict]] = ContextVar("current_round", default=None)
+# 当前运行的记录器，供对话压缩等不经过 ag2 事件流的统计写入运行记录
+_current_recorder: ContextVar[Optional["RunRecorder"]] = ContextVar("current_recorder", default=None)
+
+
+def _elapsed_since(start_time: str) -> float:
+    """
+    ag2 以 UTC 字符串记录 LLM 请求开始时间，换算为到当前时刻的耗时（秒）
+    """
+    start = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - start).total_seconds()
+
+
+def _target_name(target: Any) -> str:
+    """
+    交接目标的可读名称：AgentNameTarget 取智能体名，其他目标取类名
+    """
+    if target is None:
+        return ""
+    return getattr(target, "agent_name", None) or type(target).__name__
+
+
+class RunRecorder:
+    """
+    单次运行的事件记录器：轮次（round）、LLM 调用（llm）、工具调用（tool）、对话压缩（compaction）四类事件，线程安全
+    """
+
+    def __init__(self):
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+        self._rounds = 0
+        self._pending_tools = {}
+        self._start = time.perf_counter()
+
+    def _now(self) -> float:
+        return round(time.perf_counter() - self._start, 4)
+
+    def _append(self, event: dict) -> dict:
+        current = _current_round.get()
+        event.setdefault("round", current["round"] if current else None)
+        event["thread"] = threading.current_thread().name
+        with self._lock:
+            self.events.append(event)
+        return event
+
+    def on_round(self, speaker: str) -> None:
+        """
+        新一轮发言开始：上一轮的交接目标即本轮发言的智能体
+        """
+        previous = _current_round.get()
+        if previous is not None:
+            previous["handoff_to"] = speaker
+        with self._lock:
+            self._rounds += 1
+            number = self._rounds
+        round_event = self._append({
+            "type": "round",
+            "round": number,
+            "agent": speaker,
+            "previous_agent": previous["agent"] if previous else "",
+            "t": self._now(),
+            "handoff_to": "",
+        })
+        _current_round.set(round_event)
+
+    def on_llm(self, agent: str, latency: float, usage: Any, cached: bool, model: str) -> None:
+        self._append({
+            "type": "llm",
+            "agent": agent,
+            "t": self._now(),
+            "latency": round(latency, 4),
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "cached": cached,
+            "model": model,
+        })
+
+    def on_tool_start(self, call_id: str, func_name: str) -> None:
+        with self._lock:
+            self._pending_tools[call_id or func_name] = time.perf_counter()
+
+    def on_tool_end(self, call_id: str, func_name: str, content: Any, success: bool) -> None:
+        with self._lock:
+            start = self._pending_tools.pop(call_id or func_name, None)
+        # 工具由群聊的工具执行智能体执行，发起调用的是上一轮发言的智能体
+        current = _current_round.get()
+        self._append({
+            "type": "tool",
+            "agent": current["previous_agent"] if current else "",
+            "function": func_name,
+            "t": self._now(),
+            "latency": round(time.perf_counter() - start, 4) if start is not None else None,
+            "success": success,
+            "target": _target_name(content.target) if isinstance(content, ReplyResult) else "",
+        })
+
+    def on_compaction(self, agent: str, tokens_before: int, tokens_after: int, messages_before: int, messages_after: int) -> None:
+        self._append({
+            "type": "compaction",
+            "agent": agent,
+            "t": self._now(),
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "messages_before": messages_before,
+            "messages_after": messages_after,
+        })
+
+    def export_jsonl(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+
+def record_compaction(agent: str, tokens_before: int, tokens_after: int, messages_before: int, messages_after: int) -> None:
+    """
+    将一次对话压缩写入当前运行记录；没有在记录的运行时忽略
+    """
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.on_compaction(agent, tokens_before, tokens_after, messages_before, messages_after)
+
+
+def summarize_events(events: List[dict]) -> dict:
+    """
+    按智能体汇总轮次数、LLM 调用次数/耗时/token 和对话压缩节省的 token，按工具汇总调用次数和耗时
+    """
+    agents = {}
+    tools = {}
+    compaction = {}
+    for event in events:
+        if event["type"] in ("round", "llm"):
+            row = agents.setdefault(event["agent"], {
+                "rounds": 0, "llm_calls": 0, "cached_calls": 0, "llm_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0
+            })
+            if event["type"] == "round":
+                row["rounds"] += 1
+            else:
+                row["llm_calls"] += 1
+                row["cached_calls"] += int(event["cached"])
+                row["llm_seconds"] += event["latency"]
+                row["prompt_tokens"] += event["prompt_tokens"]
+                row["completion_tokens"] += event["completion_tokens"]
+        elif event["type"] == "tool":
+            row = tools.setdefault(event["function"], {"calls": 0, "failures": 0, "seconds": 0.0, "max_seconds": 0.0})
+            latency = event["latency"] or 0.0
+            row["calls"] += 1
+            row["failures"] += int(not event["success"])
+            row["seconds"] += latency
+            row["max_seconds"] = max(row["max_seconds"], latency)
+        elif event["type"] == "compaction":
+            row = compaction.setdefault(event["agent"], {"calls": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0})
+            row["calls"] += 1
+            row["tokens_before"] += event["tokens_before"]
+            row["tokens_after"] += event["tokens_after"]
+            row["tokens_saved"] += event["tokens_before"] - event["tokens_after"]
+
+    for row in agents.values():
+        row["llm_seconds"] = round(row["llm_seconds"], 3)
+    for row in tools.values():
+        row["seconds"] = round(row["seconds"], 3)
+        row["max_seconds"] = round(row["max_seconds"], 3)
+    return {
+        "agents": dict(sorted(agents.items(), key=lambda item: -item[1]["llm_seconds"])),
+        "tools": dict(sorted(tools.items(), key=lambda item: -item[1]["seconds"])),
+        "compaction": dict(sorted(compaction.items(), key=lambda item: -item[1]["tokens_saved"])),
+    }
+
+
+def format_summary(summary: dict) -> str:
+    """
+    将汇总结果格式化为文本表格，按耗时从高到低排列
+    """
+    lines = [f"{'智能体':<20} {'轮次':>6} {'LLM调用':>8} {'缓存命中':>8} {'LLM耗时(秒)':>12} {'输入token':>10} {'输出token':>10}"]
+    for name, row in summary["agents"].items():
+        lines.append(
+            f"{name:<20} {row['rounds']:>6} {row['llm_calls']:>8} {row['cached_calls']:>8} {row['llm_seconds']:>12.3f} "
+            f"{row['prompt_tokens']:>10} {row['completion_tokens']:>10}"
+        )
+    lines.append("")
+    lines.append(f"{'工具':<28} {'调用次数':>8} {'失败次数':>8} {'总耗时(秒)':>12} {'最大耗时(秒)':>12}")
+    for name, row in summary["tools"].items():
+        lines.append(f"{name:<28} {row['calls']:>8} {row['failures']:>8} {row['seconds']:>12.3f} {row['max_seconds']:>12.3f}")
+    if summary.get("compaction"):
+        # token 数为压缩前后对话历史的估计值，不含系统提示词
+        lines.append("")
+        lines.append(f"{'对话压缩':<20} {'次数':>6} {'压缩前token':>12} {'压缩后token':>12} {'节省token':>10}")
+        for name, row in summary["compaction"].items():
+            lines.append(f"{name:<20} {row['calls']:>6} {row['tokens_before']:>12} {row['tokens_after']:>12} {row['tokens_saved']:>10}")
+        before = sum(row["tokens_before"] for row in summary["compaction"].values())
+        saved = sum(row["tokens_saved"] for row in summary["compaction"].values())
+        lines.append(f"{'合计':<20} {'':>6} {before:>12} {before - saved:>12} {saved:>10}")
+    return "\n".join(lines)
+
+
+class RecordingLogger(BaseLogger):
+    """
+    ag2 运行时日志接口：只记录 LLM 调用的耗时、token 和缓存命中情况
+    """
+
+    def __init__(self, recorder: RunRecorder):
+        self.recorder = recorder
+
+    def start(self) -> str:
+        return str(uuid.uuid4())
+
+    def log_chat_completion(self, invocation_id, client_id, wrapper_id, source, request, response, is_cached, cost, start_time) -> None:
+        if isinstance(response, str):
+            # 调用失败时 response 为错误描述，不计入统计
+            return
+        self.recorder.on_llm(
+            agent=getattr(source, "name", str(source)),
+            latency=_elapsed_since(start_time),
+            usage=getattr(response, "usage", None),
+            cached=bool(is_cached),
+            model=getattr(response, "model", "") or request.get("model", ""),
+        )
+
+    def log_new_agent(self, agent, init_args) -> None:
+        pass
+
+    def log_event(self, source, name, **kwargs) -> None:
+        pass
+
+    def log_new_wrapper(self, wrapper, init_args) -> None:
+        pass
+
+    def log_new_client(self, client, wrapper, init_args) -> None:
+        pass
+
+    def log_function_use(self, source, function, args, returns) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def get_connection(self) -> None:
+        return None
+
+
+class RecordingStream:
+    """
+    包装当前输出流：照常输出，同时从 ag2 事件中提取轮次发言者和工具执行时间
+    """
+
+    def __init__(self, recorder: RunRecorder, inner):
+        self.recorder = recorder
+        self.inner = inner
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False) -> None:
+        self.inner.print(*objects, sep=sep, end=end, flush=flush)
+
+    def send(self, message) -> None:
+        if isinstance(message, GroupChatRunChatEvent):
+            self.recorder.on_round(message.content.speaker)
+        elif isinstance(message, ExecuteFunctionEvent):
+            self.recorder.on_tool_start(message.content.call_id, message.content.func_name)
+        elif isinstance(message, ExecutedFunctionEvent):
+            event = message.content
+            self.recorder.on_tool_end(event.call_id, event.func_name, event.content, event.is_exec_success)
+        self.inner.send(message)
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        return self.inner.input(prompt, password=password)
+
+
+@contextmanager
+def instrumented_run(trace_file: str = None):
+    """
+    在上下文内记录群聊的轮次、LLM 调用和工具调用；退出时写出 JSONL 并打印汇总表。trace_file 为空时不做记录
+    """
+    if not trace_file:
+        yield None
+        return
+
+    recorder = RunRecorder()
+    token = _current_recorder.set(recorder)
+    runtime_logging.start(logger=RecordingLogger(recorder))
+    try:
+        with IOStream.set_default(RecordingStream(recorder, IOStream.get_default())):
+            yield recorder
+    finally:
+        runtime_logging.stop()
+        _current_recorder.reset(token)
+        recorder.export_jsonl(trace_file)
+        print(f"\n运行记录已写入：{trace_file}")
+        print(format_summary(summarize_events(recorder.events)))
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    打印已有运行记录文件的汇总表：python instrumentation.py <trace.jsonl>
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        sys.exit("用法：python instrumentation.py <trace.jsonl>")
+    with open(argv[0], encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    print(format_summary(summarize_events(events)))
+
+
+if __name__ == "__main__":
+    main()
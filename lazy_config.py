@@ -0,0 +1,129 @@
+import ast
+import sys
+import types
+import importlib.util
+from importlib.machinery import PathFinder
+from typing import Dict, Optional
+
+CONFIG_MODULE = "config"
+
+# config.py 顶层允许出现的语句；出现其他语句（条件、循环等）时无法静态确定设置项，退回直接导入
+STATIC_STATEMENTS = (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Expr, ast.FunctionDef, ast.ClassDef)
+
+
+def find_config() -> Optional[str]:
+    spec = PathFinder.find_spec(CONFIG_MODULE, sys.path)
+    return spec.origin if spec is not None and spec.origin and spec.origin.endswith(".py") else None
+
+
+def read_settings(path: str) -> Optional[tuple]:
+    """
+    静态解析 config.py：返回 (字面量设置项, 非字面量设置项 -> 表达式源码, 导入和定义的名称 -> 语句源码)，不执行文件。
+    无法静态解析时返回 None
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source, filename=path)
+
+    literals: Dict[str, object] = {}
+    dynamic: Dict[str, str] = {}
+    definitions: Dict[str, str] = {}
+    for node in tree.body:
+        if not isinstance(node, STATIC_STATEMENTS):
+            return None
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                name = (alias.asname or alias.name).split(".")[0]
+                literals.pop(name, None)
+                dynamic.pop(name, None)
+                definitions[name] = ast.unparse(node)
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            literals.pop(node.name, None)
+            dynamic.pop(node.name, None)
+            definitions[node.name] = ast.get_source_segment(source, node)
+            continue
+        if isinstance(node, ast.Expr):
+            continue
+
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        if not all(isinstance(target, ast.Name) for target in targets):
+            return None
+        try:
+            if isinstance(node, ast.AugAssign) or node.value is None:
+                raise ValueError
+            value = ast.literal_eval(node.value)
+            for target in targets:
+                dynamic.pop(target.id, None)
+                definitions.pop(target.id, None)
+                literals[target.id] = value
+        except ValueError:
+            for target in targets:
+                literals.pop(target.id, None)
+                definitions.pop(target.id, None)
+                dynamic[target.id] = ast.get_source_segment(source, node.value) if node.value is not None else ""
+    return literals, dynamic, definitions
+
+
+class LazyConfig(types.ModuleType):
+    """
+    config 模块的惰性替身：字面量设置项直接取静态解析的值，config.py 中未定义的设置项直接按不存在处理；
+    只有访问非字面量设置项（如 llm_config）或导入、定义的名称时才真正执行 config.py 并导入其依赖（autogen 等）。
+    只用于 care config / care cases 这类只读取设置项的命令，运行工作流的命令直接导入真正的 config
+    """
+
+    def __init__(self, path: str, literals: Dict[str, object], dynamic: Dict[str, str], definitions: Dict[str, str]):
+        super().__init__(CONFIG_MODULE)
+        self.__file__ = path
+        self.__dict__.update(literals)
+        self._dynamic = dynamic
+        self._definitions = definitions
+        self._module = None
+
+    def __getattr__(self, name: str):
+        if name.startswith("__") or (name not in self._dynamic and name not in self._definitions):
+            raise AttributeError(f"module '{CONFIG_MODULE}' has no attribute '{name}'")
+        return getattr(self.load(), name)
+
+    def load(self) -> types.ModuleType:
+        """
+        执行真正的 config.py；之后新的导入直接得到真正的模块，已持有替身的模块通过替身转发
+        """
+        if self._module is None:
+            spec = importlib.util.spec_from_file_location(CONFIG_MODULE, self.__file__)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._module = module
+            sys.modules[CONFIG_MODULE] = module
+        return self._module
+
+    @property
+    def dynamic_settings(self) -> Dict[str, str]:
+        return dict(self._dynamic)
+
+    @property
+    def definitions(self) -> Dict[str, str]:
+        return dict(self._definitions)
+
+
+def install() -> Optional[LazyConfig]:
+    """
+    在 config 尚未导入时以惰性替身占位；找不到 config.py 或无法静态解析时不做处理，照常导入
+    """
+    current = sys.modules.get(CONFIG_MODULE)
+    if current is not None:
+        return current if isinstance(current, LazyConfig) else None
+    path = find_config()
+    if path is None:
+        return None
+    try:
+        settings = read_settings(path)
+    except (OSError, SyntaxError):
+        return None
+    if settings is None:
+        return None
+    module = LazyConfig(path, *settings)
+    sys.modules[CONFIG_MODULE] = module
+    return module
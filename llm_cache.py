@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional
+from autogen.cache import Cache
+
+import config
+
+# LLM 响应缓存模式：record 命中则复用、未命中则调用并写入；replay 只读缓存，未命中即报错；bypass 不使用缓存
+llm_cache_mode = getattr(config, "llm_cache_mode", "bypass")
+llm_cache_path = getattr(config, "llm_cache_path", ".llm_cache")
+# 缓存总大小上限（字节），超出后按最近访问时间淘汰
+llm_cache_max_bytes = getattr(config, "llm_cache_max_bytes", 1024 * 1024 * 1024)
+
+CACHE_MODES = ("record", "replay", "bypass")
+
+
+class CacheMissError(KeyError):
+    """
+    replay 模式下请求未命中缓存
+    """
+
+
+def request_key(key: Any) -> str:
+    """
+    将请求参数（模型、消息含系统提示词、工具定义及其他生成参数）规范化后取哈希作为缓存键
+    """
+    payload = json.dumps(key, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """
+    基于 SQLite 的磁盘响应存储，按总大小做 LRU 淘汰；可被多线程、多进程共享
+    """
+
+    def __init__(self, path: str, max_bytes: int = llm_cache_max_bytes, mode: str = "record"):
+        os.makedirs(path, exist_ok=True)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "responses.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: Any, default: Optional[Any] = None) -> Optional[Any]:
+        digest = request_key(key)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM responses WHERE key = ?", (digest,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), digest))
+                self._conn.commit()
+        if row is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"replay 模式下缓存未命中：{digest}")
+            return default
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key: Any, value: Any) -> None:
+        if self.mode == "replay":
+            return
+        blob = pickle.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (request_key(key), blob, len(blob), time.time())
+            )
+            self.writes += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """
+        总大小超过上限时，从最久未访问的条目开始删除
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "ResponseStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # 每次 LLM 调用都会进入/退出缓存，连接在整个运行期间保持打开
+        return None
+
+
+class ResponseCache(Cache):
+    """
+    以 ResponseStore 为后端的 ag2 Cache，ConversableAgent / OpenAIWrapper 通过当前缓存上下文自动使用
+    """
+
+    def __init__(self, mode: str = "record", path: str = llm_cache_path, max_bytes: int = llm_cache_max_bytes):
+        self.config = {"cache_path_root": path}
+        self.cache = ResponseStore(path, max_bytes=max_bytes, mode=mode)
+
+    def __enter__(self) -> ResponseStore:
+        # OpenAIWrapper 在多个线程中并发进入同一缓存，这里不改动当前缓存上下文，避免 token 冲突
+        return self.cache
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        return None
+
+
+@contextmanager
+def response_cache(mode: str = None):
+    """
+    在上下文内为所有 LLM 调用启用响应缓存；bypass 模式下不做任何处理
+    """
+    mode = mode or llm_cache_mode
+    if mode not in CACHE_MODES:
+        raise ValueError(f"未知的 LLM 缓存模式：{mode}，可选值：{CACHE_MODES}")
+    if mode == "bypass":
+        yield None
+        return
+
+    cache = ResponseCache(mode=mode)
+    token = Cache._current_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        Cache._current_cache.reset(token)
+        cache.cache.close()
@@ -0,0 +1,154 @@
+import pandas as pd
+
+from schema import read_options
+
+import config
+
+# 日志文件超过该大小（字节）时改用分块流式统计，避免整表载入内存
+log_stream_threshold = getattr(config, "log_stream_threshold", 256 * 1024 * 1024)
+# 流式统计时每块读取的行数
+log_stream_chunksize = getattr(config, "log_stream_chunksize", 500_000)
+
+LOG_COLUMNS = ["timestamp", "level", "service"]
+
+# 服务级别统计列及其跨数据块的合并方式
+SERVICE_MERGE = {
+    "count": "sum",
+    "first": "min",
+    "errors": "sum",
+    "error_first": "min",
+    "error_last": "max",
+    "warn_first": "min",
+}
+
+
+def aggregate_services(datetime: pd.Series, level: pd.Series, service: pd.Series) -> pd.DataFrame:
+    """
+    一次分组聚合得到每个服务的日志数、首次出现时间、ERROR 数量与时间范围、首次 WARN 时间
+    """
+    is_error = level == "ERROR"
+    frame = pd.DataFrame({
+        "service": service,
+        "datetime": datetime,
+        "error": is_error,
+        "error_time": datetime.where(is_error),
+        "warn_time": datetime.where(level == "WARN"),
+    })
+    return frame.groupby("service", sort=False, observed=True).agg(
+        count=("datetime", "size"),
+        first=("datetime", "min"),
+        errors=("error", "sum"),
+        error_first=("error_time", "min"),
+        error_last=("error_time", "max"),
+        warn_first=("warn_time", "min"),
+    )
+
+
+class LogAggregate:
+    """
+    日志统计的累积状态：可一次性处理整表，也可逐块更新；内存占用只与服务数和 5 秒时间桶数有关
+    """
+
+    def __init__(self):
+        self.total_logs = 0
+        self.level_counts = pd.Series(dtype="int64")
+        # 服务级别统计，列含义见 SERVICE_MERGE
+        self.services = None
+        # 每个 5 秒时间桶的 ERROR 数量（没有 ERROR 但有日志的时间桶记为 0）
+        self.error_timeline = pd.Series(dtype="int64")
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        将一块日志数据合并进累积状态
+        """
+        if len(chunk) == 0:
+            return
+        datetime = pd.to_datetime(chunk["timestamp"], unit="s")
+        level = chunk["level"]
+
+        self.total_logs += len(chunk)
+        self.level_counts = self.level_counts.add(level.value_counts(), fill_value=0)
+
+        chunk_services = aggregate_services(datetime, level, chunk["service"])
+        if self.services is None:
+            self.services = chunk_services
+        else:
+            self.services = pd.concat([self.services, chunk_services]).groupby(level=0, sort=False, observed=True).agg(SERVICE_MERGE)
+
+        chunk_timeline = (level == "ERROR").groupby(datetime.dt.floor("5s")).sum()
+        self.error_timeline = self.error_timeline.add(chunk_timeline, fill_value=0)
+
+    def summary(self) -> dict:
+        """
+        输出 get_log 所需的统计结果：级别分布、异常检测、时间线分析和服务级别分析
+        """
+        services = self.services if self.services is not None else pd.DataFrame(columns=list(SERVICE_MERGE))
+        services = services.sort_values("first", kind="stable")
+        errors = services[services["errors"] > 0].sort_values("error_first", kind="stable")
+        warns = services[services["warn_first"].notna()].sort_values("warn_first", kind="stable")
+        error_count = int(self.level_counts.get("ERROR", 0))
+
+        anomalies = {
+            "error_count": error_count,
+            "warn_count": int(self.level_counts.get("WARN", 0)),
+            "error_services": errors.index.tolist(),
+            "warn_services": warns.index.tolist(),
+            "error_time_range": {
+                "start": errors["error_first"].min() if error_count > 0 else None,
+                "end": errors["error_last"].max() if error_count > 0 else None
+            }
+        }
+
+        error_timeline = self.error_timeline.sort_index().astype("int64")
+        if error_count > 0:
+            mean_errors = error_timeline.mean()
+            std_errors = error_timeline.std()
+            anomaly_threshold = mean_errors + 2 * std_errors
+            timeline_analysis = {
+                'total_periods': len(error_timeline),
+                'anomaly_periods': int((error_timeline > anomaly_threshold).sum()),
+                'peak_error_time': error_timeline.idxmax() if len(error_timeline) > 0 else None,
+                'peak_error_count': error_timeline.max() if len(error_timeline) > 0 else 0
+            }
+        else:
+            timeline_analysis = {'total_periods': len(error_timeline), 'anomaly_periods': 0}
+
+        service_analysis = {}
+        for service, row in zip(services.index.tolist(), services.itertuples(index=False)):
+            has_errors = row.errors > 0
+            service_analysis[service] = {
+                "total_logs": int(row.count),
+                "error_logs": int(row.errors),
+                "error_time_range": {
+                    "start": row.error_first if has_errors else None,
+                    "end": row.error_last if has_errors else None
+                }
+            }
+
+        return {
+            "total_logs": self.total_logs,
+            "services": services.index.tolist(),
+            "log_levels": {level: int(count) for level, count in self.level_counts.sort_values(ascending=False, kind="stable").items()},
+            "anomalies": anomalies,
+            "timeline_analysis": timeline_analysis,
+            "service_analysis": service_analysis,
+        }
+
+
+def analyze_log_frame(df: pd.DataFrame) -> dict:
+    """
+    对整表载入的日志数据做单次分组聚合统计
+    """
+    aggregate = LogAggregate()
+    aggregate.update(df)
+    return aggregate.summary()
+
+
+def stream_log_stats(logs_file: str, chunksize: int = None) -> dict:
+    """
+    分块读取 logs.csv，单次遍历完成级别统计、服务级别异常范围和 5 秒错误时间线
+    """
+    aggregate = LogAggregate()
+    for chunk in pd.read_csv(logs_file, chunksize=chunksize or log_stream_chunksize, **read_options(logs_file, LOG_COLUMNS, chunked=True)):
+        aggregate.update(chunk)
+    return aggregate.summary()
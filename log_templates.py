@@ -0,0 +1,352 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from case_store import CACHE_DIRNAME, cache_path, load_table
+
+import config
+
+# Drain 解析树的深度（含长度层和根节点），即按消息的前 depth - 2 个词元分组
+log_template_depth = getattr(config, "log_template_depth", 4)
+# 消息与模板的相似度（相同位置词元相同的比例）达到该值时并入模板，否则新建模板
+log_template_similarity = getattr(config, "log_template_similarity", 0.4)
+# 解析树每个内部节点的最大子节点数，超出后的词元统一走通配符分支
+log_template_max_children = getattr(config, "log_template_max_children", 100)
+# 模板计数的时间桶宽度（秒）
+log_template_bucket_seconds = getattr(config, "log_template_bucket_seconds", 60)
+# 日志开始后的若干个时间桶视为基线：之后才首次出现的（模板, 服务）记为新模板，基线内的平均每桶条数作为突发检测的期望
+log_template_baseline_buckets = getattr(config, "log_template_baseline_buckets", 10)
+# （模板, 服务）在某个时间桶的泊松 z 分数超过该值、且条数不少于 log_template_burst_min_count 时记为突发
+log_template_burst_z = getattr(config, "log_template_burst_z", 5.0)
+log_template_burst_min_count = getattr(config, "log_template_burst_min_count", 5)
+
+WILDCARD = "<*>"
+# 含数字的词元（请求编号、耗时、主机编号等）视为变量
+VARIABLE_TOKEN = re.compile(r"\d")
+INDEX_DIRNAME = "log_templates"
+INDEX_VERSION = 1
+TEMPLATE_COLUMNS = ["timestamp", "service", "message"]
+
+
+class TemplateMiner:
+    """
+    Drain 风格的日志模板挖掘：消息按词元数和前若干个词元落入固定深度的解析树叶节点，
+    在叶节点内与已有模板比较相似度，足够相似则并入（不同位置的词元变为 <*>），否则新建模板。
+    模板编号按创建顺序分配，并入后模板文本可能变得更泛化，但编号不变
+    """
+
+    def __init__(self, depth: int = None, similarity: float = None, max_children: int = None):
+        self.prefix_length = max((depth or log_template_depth) - 2, 1)
+        self.similarity = log_template_similarity if similarity is None else similarity
+        self.max_children = max_children or log_template_max_children
+        self.templates: List[List[str]] = []
+        # 词元数 -> 嵌套字典形式的前缀树，叶节点为模板编号列表
+        self.tree: Dict[int, dict] = {}
+
+    @staticmethod
+    def tokenize(message: str) -> List[str]:
+        return [WILDCARD if VARIABLE_TOKEN.search(token) else token for token in message.split()]
+
+    def _leaf(self, tokens: List[str]) -> list:
+        node = self.tree.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_length]:
+            if token not in node and len(node) >= self.max_children:
+                token = WILDCARD
+            node = node.setdefault(token, {})
+        return node.setdefault(None, [])
+
+    def _match(self, leaf: list, tokens: List[str]) -> Optional[int]:
+        """
+        在叶节点中找相似度最高的模板，同分时取通配符较多的（更泛化的）模板
+        """
+        best, best_key = None, (-1.0, -1)
+        for cluster in leaf:
+            template = self.templates[cluster]
+            same = sum(1 for a, b in zip(template, tokens) if a == b and a != WILDCARD)
+            wildcards = template.count(WILDCARD)
+            key = (same / len(tokens) if tokens else 1.0, wildcards)
+            if key > best_key:
+                best, best_key = cluster, key
+        if best is not None and best_key[0] >= self.similarity:
+            return best
+        return None
+
+    def add(self, message: str) -> int:
+        """
+        将一条消息并入模板集合，返回所属模板编号
+        """
+        tokens = self.tokenize(message)
+        leaf = self._leaf(tokens)
+        cluster = self._match(leaf, tokens)
+        if cluster is None:
+            self.templates.append(tokens)
+            leaf.append(len(self.templates) - 1)
+            return len(self.templates) - 1
+        template = self.templates[cluster]
+        self.templates[cluster] = [a if a == b else WILDCARD for a, b in zip(template, tokens)]
+        return cluster
+
+    def template(self, cluster: int) -> str:
+        return " ".join(self.templates[cluster])
+
+
+def message_codes(series: pd.Series) -> tuple:
+    """
+    将消息列编码为 (每行编码, 不同消息表)；列式缓存返回的分类列直接使用其编码，不逐行比较字符串
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories.astype(str)
+    return pd.factorize(series)
+
+
+class LogTemplateIndex:
+    """
+    日志模板索引：每行的模板编号，以及稀疏存储的 (模板, 服务, 时间桶) 计数和首次出现时间。
+
+    - row_template: 每行日志的模板编号，消息缺失的行为 -1
+    - cells: 每个出现过的 (模板, 服务, 时间桶) 一行，含条数和该桶内的首次出现时间；
+      按服务、按时间桶的模板计数都由它汇总得到，不需要 (模板 × 服务 × 时间桶) 的稠密矩阵
+
+    模板挖掘只在不同的消息文本上进行一次，行数只影响编码映射和分组计数
+    """
+
+    def __init__(self, row_template: np.ndarray, templates: List[str], services: List[str], cells: Dict[str, np.ndarray],
+                 start: float, bucket_count: int, bucket_seconds: float):
+        self.row_template = row_template
+        self.templates = templates
+        self.services = services
+        self.cells = cells
+        self.start = start
+        self.bucket_count = bucket_count
+        self.bucket_seconds = bucket_seconds
+
+    @classmethod
+    def build(cls, logs: pd.DataFrame, bucket_seconds: float = None) -> "LogTemplateIndex":
+        bucket_seconds = bucket_seconds or log_template_bucket_seconds
+        codes, messages = message_codes(logs["message"])
+        miner = TemplateMiner()
+        lookup = np.array([miner.add(str(message)) for message in messages] + [-1], dtype=np.int32)
+        row_template = lookup[np.where(codes < 0, len(lookup) - 1, codes)]
+
+        timestamps = logs["timestamp"].to_numpy(dtype=np.float64)
+        service, services = message_codes(logs["service"])
+        start = np.floor(timestamps.min() / bucket_seconds) * bucket_seconds if len(timestamps) else 0.0
+        bucket = ((timestamps - start) // bucket_seconds).astype(np.int64)
+        bucket_count = int(bucket.max()) + 1 if len(bucket) else 0
+
+        valid = (row_template >= 0) & (service >= 0)
+        frame = pd.DataFrame({
+            "template": row_template[valid],
+            "service": service[valid].astype(np.int32),
+            "bucket": bucket[valid].astype(np.int32),
+            "timestamp": timestamps[valid],
+        })
+        grouped = frame.groupby(["template", "service", "bucket"], sort=True)["timestamp"].agg(["size", "min"])
+        cells = {
+            "template": grouped.index.get_level_values(0).to_numpy(dtype=np.int32),
+            "service": grouped.index.get_level_values(1).to_numpy(dtype=np.int32),
+            "bucket": grouped.index.get_level_values(2).to_numpy(dtype=np.int32),
+            "count": grouped["size"].to_numpy(dtype=np.int64),
+            "first": grouped["min"].to_numpy(dtype=np.float64),
+        }
+        templates = [miner.template(cluster) for cluster in range(len(miner.templates))]
+        return cls(row_template, templates, [str(s) for s in services], cells, float(start), bucket_count, bucket_seconds)
+
+    def save(self, directory: str, source: dict) -> None:
+        """
+        写出索引目录：数组存 .npy，模板表和服务表存 meta.json；先写临时目录再原子替换
+        """
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=parent)
+        try:
+            np.save(os.path.join(tmp_dir, "row_template.npy"), self.row_template)
+            for name, values in self.cells.items():
+                np.save(os.path.join(tmp_dir, f"cell_{name}.npy"), values)
+            meta = {
+                "version": INDEX_VERSION,
+                "source": source,
+                "params": index_params(self.bucket_seconds),
+                "templates": self.templates,
+                "services": self.services,
+                "start": self.start,
+                "bucket_count": self.bucket_count,
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_dir, directory)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, meta: dict) -> "LogTemplateIndex":
+        cells = {name: np.load(os.path.join(directory, f"cell_{name}.npy")) for name in ("template", "service", "bucket", "count", "first")}
+        return cls(
+            np.load(os.path.join(directory, "row_template.npy"), mmap_mode="r"),
+            meta["templates"], meta["services"], cells,
+            meta["start"], meta["bucket_count"], meta["params"]["bucket_seconds"],
+        )
+
+    def bucket_time(self, bucket) -> pd.Timestamp:
+        return pd.to_datetime(self.start + bucket * self.bucket_seconds, unit="s")
+
+    def counts_by_service(self) -> pd.DataFrame:
+        """
+        (模板 × 服务) 的日志条数
+        """
+        counts = np.zeros((len(self.templates), len(self.services)), dtype=np.int64)
+        np.add.at(counts, (self.cells["template"], self.cells["service"]), self.cells["count"])
+        return pd.DataFrame(counts, index=self.templates, columns=self.services)
+
+    def counts_by_bucket(self) -> pd.DataFrame:
+        """
+        (模板 × 时间桶) 的日志条数
+        """
+        counts = np.zeros((len(self.templates), self.bucket_count), dtype=np.int64)
+        np.add.at(counts, (self.cells["template"], self.cells["bucket"]), self.cells["count"])
+        return pd.DataFrame(counts, index=self.templates, columns=self.bucket_time(np.arange(self.bucket_count)))
+
+    def first_seen(self) -> pd.Series:
+        """
+        每个模板首次出现的时间
+        """
+        first = np.full(len(self.templates), np.inf)
+        np.minimum.at(first, self.cells["template"], self.cells["first"])
+        return pd.Series(pd.to_datetime(first, unit="s"), index=self.templates)
+
+    def _pairs(self, baseline_buckets: int) -> pd.DataFrame:
+        """
+        按 (模板, 服务) 汇总：总条数、首次出现时间，以及基线窗口内的平均每桶条数
+        """
+        cells = pd.DataFrame(self.cells)
+        cells["baseline"] = np.where(cells["bucket"] < baseline_buckets, cells["count"], 0)
+        pairs = cells.groupby(["template", "service"], sort=False).agg(
+            total=("count", "sum"), first=("first", "min"), baseline=("baseline", "sum"))
+        pairs["rate"] = pairs["baseline"] / max(baseline_buckets, 1)
+        return pairs
+
+    def summary(self, top_k: int = 10) -> dict:
+        """
+        输出模板概况、新出现的（模板, 服务）和突发的（模板, 服务），各自按重要性排序
+        """
+        baseline_buckets = min(log_template_baseline_buckets, self.bucket_count)
+        pairs = self._pairs(baseline_buckets)
+
+        # 突发：基线窗口之后的时间桶按泊松分布计算 z 分数，期望为基线的平均每桶条数（下限 0.5，避免基线中未出现时分母为 0）
+        cells = pd.DataFrame(self.cells).join(pairs["rate"], on=["template", "service"])
+        expected = np.maximum(cells["rate"].to_numpy(), 0.5)
+        cells["z"] = (cells["count"] - expected) / np.sqrt(expected)
+        cells["excess"] = cells["count"] - expected
+        cells["burst"] = (cells["bucket"] >= baseline_buckets) & (cells["z"] > log_template_burst_z) & (cells["count"] >= log_template_burst_min_count)
+
+        template_total = np.bincount(self.cells["template"], weights=self.cells["count"], minlength=len(self.templates))
+        template_first = self.first_seen()
+        total = template_total.sum()
+
+        # 基线窗口之后才首次出现：模板本身是新的，或模板已有但在该服务上是新的
+        cutoff = self.start + baseline_buckets * self.bucket_seconds
+        new = pairs[pairs["first"] >= cutoff].sort_values("first", kind="stable")
+        new_templates = []
+        for (template, service), row in new.head(top_k).iterrows():
+            new_templates.append({
+                "模板": self.templates[template],
+                "服务": self.services[service],
+                "首次出现时间": pd.to_datetime(row["first"], unit="s"),
+                "条数": int(row["total"]),
+                "全局新模板": bool(template_first.iloc[template] >= pd.to_datetime(cutoff, unit="s")),
+            })
+
+        # 突发按超出期望的条数之和排序：持续多个时间桶的突发排在单桶的随机波动之前
+        bursting = []
+        burst_cells = cells[cells["burst"]]
+        if len(burst_cells):
+            stats = burst_cells.groupby(["template", "service"], sort=False).agg(
+                excess=("excess", "sum"), z=("z", "max"), buckets=("bucket", "size"), first=("first", "min"))
+            peaks = burst_cells.loc[burst_cells.groupby(["template", "service"], sort=False)["count"].idxmax()]
+            stats = stats.join(peaks.set_index(["template", "service"])[["bucket", "count"]])
+            stats = stats.sort_values(["excess", "z"], ascending=False, kind="stable")
+            for (template, service), row in stats.head(top_k).iterrows():
+                bursting.append({
+                    "模板": self.templates[template],
+                    "服务": self.services[service],
+                    "突发开始时间": pd.to_datetime(row["first"], unit="s"),
+                    "突发时间桶数": int(row["buckets"]),
+                    "超出基线条数": int(round(row["excess"])),
+                    "峰值时间": self.bucket_time(int(row["bucket"])),
+                    "峰值条数": int(row["count"]),
+                    "基线每桶条数": float(pairs.loc[(template, service), "rate"]),
+                    "峰值 z 分数": float(row["z"]),
+                })
+
+        order = np.argsort(-template_total, kind="stable")
+        return {
+            "模板概况": {
+                "日志条数": int(total),
+                "模板数": len(self.templates),
+                "时间桶宽度（秒）": self.bucket_seconds,
+                "基线结束时间": pd.to_datetime(cutoff, unit="s"),
+                "新出现的（模板, 服务）数": len(new),
+                "突发的（模板, 服务）数": int(burst_cells[["template", "service"]].drop_duplicates().shape[0]),
+            },
+            "新模板": new_templates,
+            "突发模板": bursting,
+            "高频模板": [
+                {
+                    "模板": self.templates[t],
+                    "条数": int(template_total[t]),
+                    "占比": round(float(template_total[t] / total), 4) if total else 0.0,
+                    "首次出现时间": template_first.iloc[t],
+                }
+                for t in order[:top_k]
+            ],
+        }
+
+
+def index_params(bucket_seconds: float = None) -> dict:
+    # 挖掘参数或时间桶宽度变化后，已持久化的索引失效
+    return {
+        "depth": log_template_depth,
+        "similarity": log_template_similarity,
+        "max_children": log_template_max_children,
+        "bucket_seconds": bucket_seconds or log_template_bucket_seconds,
+    }
+
+
+def index_dir(logs_file: str) -> str:
+    """
+    模板索引目录，与列式缓存放在一起
+    """
+    case_dir = os.path.dirname(os.path.abspath(logs_file))
+    if cache_path:
+        return os.path.join(cache_path, os.path.basename(case_dir), INDEX_DIRNAME)
+    return os.path.join(case_dir, CACHE_DIRNAME, INDEX_DIRNAME)
+
+
+def load_template_index(logs_file: str) -> LogTemplateIndex:
+    """
+    获取案例的日志模板索引：已持久化且日志文件和挖掘参数未变时直接加载，否则重新挖掘并写出
+    """
+    directory = index_dir(logs_file)
+    stat = os.stat(logs_file)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = None
+    if meta is not None and meta.get("version") == INDEX_VERSION and meta.get("source") == source and meta.get("params") == index_params():
+        return LogTemplateIndex.load(directory, meta)
+
+    index = LogTemplateIndex.build(load_table(logs_file, TEMPLATE_COLUMNS))
+    try:
+        index.save(directory, source)
+    except OSError:
+        # 数据目录只读时只在本次调用中使用
+        pass
+    return index
@@ -0,0 +1,111 @@
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# 指标类型及其在报告中的名称，列名格式为 <service>_<metric>
+METRIC_TYPES = {"cpu": "CPU", "mem": "内存", "latency": "延迟"}
+
+# 长表格式的列：每行一个 (时间, 服务, 指标, 数值)
+LONG_COLUMNS = {"service", "metric", "value"}
+
+
+def to_wide(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    将长表格式 (time, service, metric, value) 转换为宽表格式 time + <service>_<metric> 列；宽表原样返回
+    """
+    if not LONG_COLUMNS.issubset(df.columns):
+        return df
+    wide = df.pivot_table(index="time", columns=["service", "metric"], values="value", aggfunc="mean", observed=True)
+    wide.columns = [f"{service}_{metric}" for service, metric in wide.columns]
+    return wide.reset_index()
+
+
+def parse_metric_columns(columns) -> Dict[str, Dict[str, str]]:
+    """
+    一次性解析列名，建立 服务 -> 指标类型 -> 列名 的索引，服务顺序与列顺序一致
+    """
+    index = {}
+    for col in columns:
+        service, sep, metric = str(col).rpartition("_")
+        if sep and service and metric in METRIC_TYPES:
+            index.setdefault(service, {})[metric] = col
+    return index
+
+
+def column_stats(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    对 (行 × 列) 矩阵的所有列一次性计算统计量和 mean + 2*std 异常掩码，忽略缺失值
+    """
+    with warnings.catch_warnings():
+        # 整列缺失时结果为 NaN，与 pandas 行为一致，不需要告警
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0, ddof=1)
+        stats = {
+            "mean": mean,
+            "max": np.nanmax(values, axis=0),
+            "min": np.nanmin(values, axis=0),
+            "std": std,
+            "p95": np.nanpercentile(values, 95, axis=0),
+        }
+    stats["threshold"] = mean + 2 * std
+    stats["outliers"] = values > stats["threshold"]
+    return stats
+
+
+def analyze_metric_frame(df: pd.DataFrame) -> dict:
+    """
+    对指标数据做向量化统计：一次矩阵运算得到所有服务、所有指标的统计量、异常值和 CPU 高峰时间
+    """
+    df = to_wide(df)
+    # 只对时间列排序并按同一顺序取出数值矩阵，不向逐列存储的宽表插入新列（避免碎片化和整表复制）
+    order = np.argsort(df['time'].to_numpy(), kind='stable')
+    datetimes = pd.to_datetime(df['time'].to_numpy()[order], unit='s').to_numpy()
+    start = pd.Timestamp(datetimes.min()) if len(datetimes) else pd.NaT
+    end = pd.Timestamp(datetimes.max()) if len(datetimes) else pd.NaT
+
+    column_index = parse_metric_columns(df.columns)
+    columns = [col for metrics in column_index.values() for col in metrics.values()]
+    position = {col: i for i, col in enumerate(columns)}
+    values = df[columns].to_numpy(dtype=np.float64)[order] if columns else np.empty((len(df), 0))
+    stats = column_stats(values)
+
+    service_analysis = {}
+    peak_analysis = {}
+    for service, metrics in column_index.items():
+        service_analysis[service] = {}
+        for metric, label in METRIC_TYPES.items():
+            if metric not in metrics:
+                continue
+            i = position[metrics[metric]]
+            mask = stats["outliers"][:, i]
+            service_analysis[service][label] = {
+                '平均值': round(float(stats["mean"][i]), 2),
+                '最大值': round(float(stats["max"][i]), 2),
+                '最小值': round(float(stats["min"][i]), 2),
+                '标准差': round(float(stats["std"][i]), 2),
+                'P95': round(float(stats["p95"][i]), 2),
+                '异常值': [round(float(value), 2) for value in values[mask, i]]
+            }
+            # 趋势分析：CPU 超过 mean + 2*std 的时间点视为高峰期
+            if metric == "cpu":
+                peak_times = pd.DatetimeIndex(datetimes[mask]).tolist()
+                peak_analysis[service] = {
+                    "高峰时间": peak_times,
+                    "高峰次数": len(peak_times)
+                }
+
+    return {
+        "total_data_points": len(df),
+        "time_range": {
+            "开始时间": start,
+            "结束时间": end,
+            "持续时间（秒）": round((end - start).total_seconds(), 2)
+        },
+        # 相邻数据点的典型时间间隔（秒），用于把连续的高峰时间点合并为区间
+        "sample_interval": float(np.median(np.diff(datetimes).astype("timedelta64[ns]").astype(np.int64))) / 1e9 if len(datetimes) > 1 else 0.0,
+        "services": list(column_index),
+        "service_analysis": service_analysis,
+        "peak_analysis": peak_analysis,
+    }
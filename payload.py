@@ -0,0 +1,147 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+from typing import Any, List
+
+import config
+
+# 工具返回内容的 token 预算，超出时逐步减少排序集合保留的条目数；设为 None 不做限制
+payload_token_budget = getattr(config, "payload_token_budget", 3000)
+# 排序集合默认保留的前 k 项
+payload_top_k = getattr(config, "payload_top_k", 10)
+
+TRUNCATION_KEY = "_省略"
+# 按条目数截取后仍超出预算时加入结果的字段
+TRUNCATED_FIELD = "已截断"
+# 截短长文本时字符数上限的起点和下限，每次减半
+TEXT_LIMIT = 512
+MIN_TEXT_LIMIT = 16
+
+
+class Ranked:
+    """
+    按重要性排好序的集合（列表或字典），超出预算时只保留前若干项并附上省略标记
+    """
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估计 token 数：非 ASCII 字符（中文等）每字计 1，ASCII 字符每 4 个计 1
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def to_scalar(value: Any) -> Any:
+    """
+    将 pandas / numpy 标量转换为可 JSON 序列化的 Python 值，浮点数保留两位小数
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        if pd.isna(value):
+            return None
+        value = pd.Timestamp(value)
+        # 时间精确到毫秒即可，整秒时间不带小数部分
+        if value.microsecond == 0 and value.nanosecond == 0:
+            return str(value)
+        return value.isoformat(sep=" ", timespec="milliseconds")
+    if isinstance(value, pd.Timedelta):
+        return round(value.total_seconds(), 2)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        return None if math.isnan(value) else round(value, 2)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return str(value)
+
+
+def render(obj: Any, limit: int = None, text_limit: int = None) -> Any:
+    """
+    将结果转换为 JSON 结构，Ranked 集合最多保留 limit 项；给定 text_limit 时，字符串最多保留 text_limit 个字符，
+    普通列表最多保留 text_limit // 16 项（至少 1 项）
+    """
+    if isinstance(obj, Ranked):
+        items = obj.items
+        total = len(items)
+        shown = total if limit is None else min(limit, total)
+        marker = f"另有 {total - shown} 项未列出，共 {total} 项"
+        if isinstance(items, dict):
+            kept = {str(k): render(v, limit, text_limit) for k, v in list(items.items())[:shown]}
+            if shown < total:
+                kept[TRUNCATION_KEY] = marker
+        else:
+            kept = [render(v, limit, text_limit) for v in list(items)[:shown]]
+            if shown < total:
+                kept.append(f"{TRUNCATION_KEY}：{marker}")
+        return kept
+    if isinstance(obj, dict):
+        return {str(k): render(v, limit, text_limit) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        shown = len(obj) if text_limit is None else max(1, text_limit // 16)
+        kept = [render(v, limit, text_limit) for v in list(obj)[:shown]]
+        if shown < len(obj):
+            kept.append(f"{TRUNCATION_KEY}：另有 {len(obj) - shown} 项未列出，共 {len(obj)} 项")
+        return kept
+    value = to_scalar(obj)
+    if text_limit is not None and isinstance(value, str) and len(value) > text_limit:
+        return f"{value[:text_limit]}…"
+    return value
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_payload(obj: Any, budget: int = None, top_k: int = None) -> str:
+    """
+    生成紧凑 JSON：先按 top_k 截取排序集合，超出 token 预算时逐次减半；仍超出则逐次截短长文本和普通列表，
+    并在结果中加入"已截断"字段。输出始终是合法的 JSON
+    """
+    budget = payload_token_budget if budget is None else budget
+    limit = payload_top_k if top_k is None else top_k
+    if budget is None:
+        return dumps(render(obj))
+
+    text = dumps(render(obj, limit))
+    # limit 为 None 表示不限制排序集合的条目数，不做减半
+    while limit is not None and limit > 1 and estimate_tokens(text) > budget:
+        limit //= 2
+        text = dumps(render(obj, limit))
+
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text
+    text_limit = TEXT_LIMIT
+    while True:
+        rendered = render(obj, limit, text_limit)
+        note = f"原文约 {tokens} tokens，超出预算 {budget}，长文本和列表已截短"
+        rendered = dict(rendered, **{TRUNCATED_FIELD: note}) if isinstance(rendered, dict) else {TRUNCATED_FIELD: note, "内容": rendered}
+        text = dumps(rendered)
+        if estimate_tokens(text) <= budget or text_limit <= MIN_TEXT_LIMIT:
+            return text
+        text_limit //= 2
+
+
+def peak_intervals(times: List[pd.Timestamp], step: float) -> List[dict]:
+    """
+    将高峰时间点游程编码为区间：相邻时间点间隔不超过采样间隔 step（秒）的 1.5 倍时视为同一区间
+    """
+    if len(times) == 0:
+        return []
+    times = pd.DatetimeIndex(times).sort_values()
+    gaps = np.diff(times.asi8) / 1e9
+    breaks = np.flatnonzero(gaps > step * 1.5) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(times)]])
+    return [
+        {"开始": times[s], "结束": times[e - 1], "点数": int(e - s)}
+        for s, e in zip(starts, ends)
+    ]
@@ -0,0 +1,137 @@
+import os
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional
+
+from metric_engine import METRIC_TYPES
+
+import config
+
+# CSV 解析引擎：None 时安装了 pyarrow 就使用 pyarrow（多线程解析），否则使用 pandas 默认的 C 引擎
+csv_engine = getattr(config, "csv_engine", None)
+
+# 各案例文件已知列的类型。时间戳保留 float64：epoch 秒在 float32 下的精度只有约 2 分钟
+CASE_SCHEMAS = {
+    "logs.csv": {
+        "timestamp": "float64",
+        "level": "category",
+        "service": "category",
+    },
+    "metrics.csv": {
+        "time": "float64",
+        # 长表格式
+        "service": "category",
+        "metric": "category",
+        "value": "float32",
+    },
+    "traces.csv": {
+        "timestamp": "float64",
+        "trace_id": "category",
+        "service": "category",
+        "operation": "category",
+        "duration": "float32",
+    },
+}
+
+
+# 每行取值几乎都不同的标识列和日志消息：分类编码得不偿失，pyarrow 引擎下读为 Arrow 字符串，避免逐行创建 Python 字符串对象；
+# 重复度高时仍由 compact_frame 转为分类
+ID_COLUMNS = {"span_id", "parent_span_id", "parent_id", "message"}
+
+
+def resolve_engine() -> str:
+    if csv_engine:
+        return csv_engine
+    return "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+
+def read_header(csv_path: str) -> List[str]:
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+
+def column_dtypes(file_name: str, columns: Iterable[str], engine: str = "c") -> dict:
+    """
+    为给定列确定读取类型：已知列按 CASE_SCHEMAS，宽表格式的指标列（<service>_<metric>）读为 float32，其余列交给 pandas 推断
+    """
+    schema = CASE_SCHEMAS.get(file_name, {})
+    dtypes = {}
+    for col in columns:
+        if col in schema:
+            dtypes[col] = schema[col]
+        elif col in ID_COLUMNS and engine == "pyarrow":
+            dtypes[col] = "string[pyarrow]"
+        elif file_name == "metrics.csv" and str(col).rpartition("_")[2] in METRIC_TYPES:
+            dtypes[col] = "float32"
+    return dtypes
+
+
+def read_options(csv_path: str, columns: Optional[Iterable[str]] = None, header: Optional[List[str]] = None, chunked: bool = False) -> dict:
+    """
+    生成 pd.read_csv 的参数：只读取需要且存在的列（usecols），按模式设置列类型；分块读取时 pyarrow 引擎不可用，改用 C 引擎
+    """
+    header = header if header is not None else read_header(csv_path)
+    if columns is None:
+        usecols = header
+    else:
+        wanted = set(columns)
+        usecols = [col for col in header if col in wanted]
+    engine = "c" if chunked else resolve_engine()
+    return {
+        "usecols": usecols,
+        "dtype": column_dtypes(os.path.basename(csv_path), usecols, engine),
+        "engine": engine,
+    }
+
+
+def _read_arrow(csv_path: str, usecols: List[str], dtypes: dict) -> pd.DataFrame:
+    """
+    直接用 pyarrow.csv 解析：类型在解析时确定，分类列在解析时完成字典编码，不经过 pandas 的逐列类型转换
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    arrow_types = {
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "float32": pa.float32(),
+        "float64": pa.float64(),
+        "int32": pa.int32(),
+        "string[pyarrow]": pa.string(),
+    }
+    table = pa_csv.read_csv(csv_path, convert_options=pa_csv.ConvertOptions(
+        include_columns=usecols,
+        column_types={col: arrow_types[dtype] for col, dtype in dtypes.items()},
+    ))
+    # 标识列保留为 Arrow 字符串，其余类型按 pandas 默认方式转换
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def read_case_csv(csv_path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    按案例文件模式读取 CSV：列裁剪 + 紧凑类型，未被模式覆盖的列再做一次类型压缩
+    """
+    options = read_options(csv_path, columns)
+    if options["engine"] == "pyarrow":
+        df = _read_arrow(csv_path, options["usecols"], options["dtype"])
+    else:
+        df = pd.read_csv(csv_path, **options)
+    return compact_frame(df)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    压缩推断出的类型：整数列在取值范围内降为 int32，浮点列降为 float32（时间列除外），重复度高的字符串列转为分类
+    """
+    for col in df.columns:
+        series = df[col]
+        if col in ("time", "timestamp") or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(series.dtype) and series.dtype.itemsize > 4:
+            if len(series) == 0 or (series.min() >= np.iinfo(np.int32).min and series.max() <= np.iinfo(np.int32).max):
+                df[col] = series.astype(np.int32)
+        elif pd.api.types.is_float_dtype(series.dtype) and series.dtype.itemsize > 4:
+            df[col] = series.astype(np.float32)
+        elif series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            if series.nunique(dropna=True) <= len(series) // 2:
+                df[col] = series.astype("category")
+    return df
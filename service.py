@@ -0,0 +1,402 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import contextvars
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import config
+
+# 分析服务的监听地址
+service_host = getattr(config, "service_host", "127.0.0.1")
+service_port = getattr(config, "service_port", 8765)
+# 同时运行的分析任务数；超出的任务排队，排队任务数达到 service_queue_size 时拒绝新任务（HTTP 429）
+service_max_concurrency = getattr(config, "service_max_concurrency", 2)
+service_queue_size = getattr(config, "service_queue_size", 8)
+# 所有智能体共用的 LLM HTTP 连接池大小；复审和并行分析阶段会同时发起多个请求
+service_http_connections = getattr(config, "service_http_connections", 16)
+# 保留的已结束任务数，更早的任务不再可查询
+service_job_history = getattr(config, "service_job_history", 200)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 429: "Too Many Requests", 500: "Internal Server Error"}
+
+
+class Job:
+    """
+    一次分析任务：状态、进度事件和结果。事件只在事件循环线程中追加，订阅者按序号读取，先回放历史再等待新事件
+    """
+
+    def __init__(self, case_id: str, options: dict):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.case_id = case_id
+        self.options = options
+        self.status = "queued"
+        self.events: List[dict] = []
+        self.final_report = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: dict) -> None:
+        event = dict(event, seq=len(self.events), time=round(time.time() - self.submitted_at, 3))
+        if event["type"] == "started":
+            self.status, self.started_at = "running", time.time()
+        elif event["type"] in TERMINAL_STATUSES:
+            self.status, self.finished_at = event["type"], time.time()
+        self.events.append(event)
+        # 唤醒当前所有等待者，之后的等待者使用新的事件对象
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncIterator[dict]:
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.status in TERMINAL_STATUSES:
+                return
+            await self._changed.wait()
+
+    def describe(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "case_id": self.case_id,
+            "options": self.options,
+            "status": self.status,
+            "stage": next((e["stage"] for e in reversed(self.events) if e.get("stage")), None),
+            "queued_seconds": round((self.started_at or time.time()) - self.submitted_at, 3),
+            "run_seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "final_report": self.final_report,
+            "error": self.error,
+        }
+
+
+class JobStream:
+    """
+    任务线程的 ag2 输出流：不向终端打印对话内容，只把发言轮次、工具执行结果和对话压缩统计转为任务进度事件
+    """
+
+    def __init__(self, emit):
+        self.emit = emit
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False) -> None:
+        pass
+
+    def send(self, message) -> None:
+        from autogen.events.agent_events import GroupChatRunChatEvent, ExecutedFunctionEvent
+        from compaction import CompactionEvent
+
+        if isinstance(message, GroupChatRunChatEvent):
+            self.emit({"type": "round", "speaker": message.content.speaker})
+        elif isinstance(message, ExecutedFunctionEvent):
+            self.emit({"type": "tool", "name": message.content.func_name, "success": message.content.is_exec_success})
+        elif isinstance(message, CompactionEvent):
+            event = message.content
+            self.emit({"type": "compaction", "tokens_before": event.tokens_before, "tokens_after": event.tokens_after, "tokens_saved": event.tokens_saved})
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        # 服务中没有终端，所有智能体以 NEVER 模式运行，不会请求人工输入
+        return ""
+
+
+class RCAService:
+    """
+    常驻的根因分析服务：启动时预先导入工作流模块并建立共享的 LLM 连接池（只用于本服务创建的智能体，不修改全局 llm_config），
+    任务经有界队列准入后由固定数量的工作线程执行，进度以事件流推送给调用方
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = service_max_concurrency,
+            queue_size: int = service_queue_size,
+            http_connections: int = service_http_connections
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.http_connections = http_connections
+        self.jobs: Dict[str, Job] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="rca-job")
+        self.loop = None
+        self.http_client = None
+        self.llm_config = None
+
+    def warm_up(self) -> None:
+        """
+        导入 autogen、pandas 和工作流模块，并建立保持长连接的 httpx 连接池；每个任务仍创建全新的智能体，
+        创建时使用带该连接池的 LLM 配置副本，各任务的 OpenAI 客户端复用同一连接池
+        """
+        import httpx
+        # 预先导入工作流及其依赖，第一个任务不再承担导入耗时
+        import workflow
+        from agent import pooled_llm_config
+
+        self.http_client = httpx.Client(limits=httpx.Limits(max_connections=self.http_connections, max_keepalive_connections=self.http_connections))
+        self.llm_config = pooled_llm_config(self.http_client)
+
+    def submit(self, request: dict) -> Job:
+        """
+        校验请求并放入队列；队列已满时抛出 asyncio.QueueFull
+        """
+        case_id = str(request.get("case_id", "")).strip()
+        if not case_id:
+            raise ValueError("缺少 case_id")
+        if not os.path.isdir(os.path.join(config.dataset_path, f"case_{case_id}")):
+            raise LookupError(f"案例 {case_id} 不存在")
+        options = {
+            "mode": request.get("mode"),
+            "max_rounds": int(request.get("max_rounds", 100)),
+            "llm_cache": request.get("llm_cache"),
+            "resume": bool(request.get("resume", False)),
+            "compaction": request.get("compaction"),
+        }
+        if options["mode"] not in (None, "serial", "fanout"):
+            raise ValueError(f"未知的工作流模式：{options['mode']}")
+        if options["compaction"] not in (None, "stage", "off"):
+            raise ValueError(f"未知的对话压缩模式：{options['compaction']}")
+
+        job = Job(case_id, options)
+        self.queue.put_nowait(job)
+        self.jobs[job.job_id] = job
+        job.publish({"type": "queued", "position": self.queue.qsize()})
+        self._prune()
+        return job
+
+    def _prune(self) -> None:
+        finished = [job for job in self.jobs.values() if job.status in TERMINAL_STATUSES]
+        for job in finished[:max(0, len(finished) - service_job_history)]:
+            del self.jobs[job.job_id]
+
+    def stats(self) -> dict:
+        running = sum(job.status == "running" for job in self.jobs.values())
+        return {"status": "ok", "running": running, "queued": self.queue.qsize(), "max_concurrency": self.max_concurrency, "queue_size": self.queue_size}
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                # 复制事件循环的上下文，任务线程中设置的输出流和 LLM 缓存不会相互影响
+                await self.loop.run_in_executor(self.executor, contextvars.copy_context().run, self._run_job, job)
+            finally:
+                self.queue.task_done()
+
+    def _run_job(self, job: Job) -> None:
+        """
+        在工作线程中运行工作流，进度事件转交事件循环线程发布
+        """
+        from autogen.io import IOStream
+        from workflow import run_case, workflow_mode
+
+        def emit(event: dict) -> None:
+            self.loop.call_soon_threadsafe(job.publish, event)
+
+        def on_stage(stage: str, agent_name: str) -> None:
+            emit({"type": "stage", "stage": stage, "agent": agent_name})
+
+        emit({"type": "started"})
+        options = job.options
+        try:
+            with IOStream.set_default(JobStream(emit)):
+                _, final_context, _ = run_case(
+                    job.case_id,
+                    human_input_mode="NEVER",
+                    max_rounds=options["max_rounds"],
+                    mode=options["mode"] or workflow_mode,
+                    cache_mode=options["llm_cache"],
+                    # ag2 运行时日志是进程级的，多个任务并发时不做运行记录
+                    record=self.max_concurrency == 1,
+                    resume=options["resume"],
+                    on_stage=on_stage,
+                    compaction=options["compaction"],
+                    llm=self.llm_config,
+                )
+            job.final_report = final_context.get("final_report") or None
+            emit({"type": "succeeded", "stage": final_context.get("workflow_stage"), "final_report": job.final_report})
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            emit({"type": "failed", "error": job.error})
+
+    async def serve(self, host: str = service_host, port: int = service_port) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        await self.loop.run_in_executor(None, self.warm_up)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"根因分析服务已启动：http://{host}:{port}（并发 {self.max_concurrency}，队列 {self.queue_size}）", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if self.http_client is not None:
+                self.http_client.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        处理一个 HTTP/1.1 请求：
+        POST /jobs 提交任务，GET /jobs 列出任务，GET /jobs/<id> 查询任务，GET /jobs/<id>/events 以 NDJSON 流推送进度，GET /health 查看负载
+        """
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, body = request
+            parts = [p for p in path.split("?")[0].split("/") if p]
+
+            if parts == ["health"] and method == "GET":
+                await write_json(writer, 200, self.stats())
+            elif parts == ["jobs"] and method == "POST":
+                try:
+                    job = self.submit(json.loads(body or b"{}"))
+                except asyncio.QueueFull:
+                    await write_json(writer, 429, dict(self.stats(), error="任务队列已满，请稍后重试"), {"Retry-After": "5"})
+                except LookupError as e:
+                    await write_json(writer, 404, {"error": str(e)})
+                except (ValueError, TypeError) as e:
+                    await write_json(writer, 400, {"error": str(e)})
+                else:
+                    await write_json(writer, 202, job.describe())
+            elif parts == ["jobs"] and method == "GET":
+                await write_json(writer, 200, [job.describe() for job in self.jobs.values()])
+            elif len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+                job = self.jobs.get(parts[1])
+                if job is None:
+                    await write_json(writer, 404, {"error": f"任务 {parts[1]} 不存在"})
+                elif len(parts) == 2:
+                    await write_json(writer, 200, job.describe())
+                elif parts[2] == "events":
+                    await write_stream(writer, job.follow())
+                else:
+                    await write_json(writer, 404, {"error": "未知路径"})
+            elif parts[:1] in (["health"], ["jobs"]):
+                await write_json(writer, 405, {"error": "不支持的请求方法"})
+            else:
+                await write_json(writer, 404, {"error": "未知路径"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[tuple]:
+    """
+    读取请求行、请求头和按 Content-Length 给出的请求体
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method.upper(), path, body
+
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Any, headers: dict = None) -> None:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}", "Content-Type: application/json; charset=utf-8", f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def write_stream(writer: asyncio.StreamWriter, events: AsyncIterator[dict]) -> None:
+    """
+    以分块传输编码逐行写出事件（NDJSON），任务结束后结束响应
+    """
+    head = ["HTTP/1.1 200 OK", "Content-Type: application/x-ndjson; charset=utf-8", "Transfer-Encoding: chunked", "Connection: close"]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    async for event in events:
+        line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        writer.write(f"{len(line):x}\r\n".encode("latin-1") + line + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def submit_job(case_id: str, url: str = None, follow: bool = True, **options) -> dict:
+    """
+    提交任务并（可选地）逐行打印进度事件，返回任务结束时的状态
+    """
+    url = (url or f"http://{service_host}:{service_port}").rstrip("/")
+    request = urllib.request.Request(
+        f"{url}/jobs",
+        data=json.dumps(dict(options, case_id=case_id)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            job = json.load(response)
+    except urllib.error.HTTPError as e:
+        return dict(json.load(e), http_status=e.code)
+    if not follow:
+        return job
+
+    with urllib.request.urlopen(f"{url}/jobs/{job['job_id']}/events") as response:
+        for line in response:
+            event = json.loads(line)
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+    with urllib.request.urlopen(f"{url}/jobs/{job['job_id']}") as response:
+        return json.load(response)
+
+
+def main(argv: List[str] = None) -> None:
+    """
+    python service.py serve [--port 8765]：启动服务；python service.py submit --case 1：提交任务并跟随进度
+    """
+    parser = argparse.ArgumentParser(description="根因分析服务")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="启动服务")
+    serve.add_argument("--host", default=service_host)
+    serve.add_argument("--port", type=int, default=service_port)
+    serve.add_argument("--concurrency", type=int, default=service_max_concurrency, help="同时运行的任务数")
+    serve.add_argument("--queue-size", type=int, default=service_queue_size, help="排队任务数上限")
+
+    submit = subparsers.add_parser("submit", help="提交任务并跟随进度")
+    submit.add_argument("--case", required=True, help="案例ID")
+    submit.add_argument("--url", default=None, help=f"服务地址，默认 http://{service_host}:{service_port}")
+    submit.add_argument("--mode", choices=["serial", "fanout"], default=None, help="工作流模式，默认取服务端 config.workflow_mode")
+    submit.add_argument("--max-rounds", type=int, default=100)
+    submit.add_argument("--llm-cache", choices=["record", "replay", "bypass"], default=None)
+    submit.add_argument("--resume", action="store_true")
+    submit.add_argument("--compaction", choices=["stage", "off"], default=None, help="对话压缩模式，默认取服务端 config.compaction_mode")
+    submit.add_argument("--no-follow", action="store_true", help="提交后立即返回，不跟随进度")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = RCAService(max_concurrency=args.concurrency, queue_size=args.queue_size)
+        try:
+            asyncio.run(service.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    options = {"mode": args.mode, "max_rounds": args.max_rounds, "llm_cache": args.llm_cache, "resume": args.resume, "compaction": args.compaction}
+    result = submit_job(args.case, url=args.url, follow=not args.no_follow, **options)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if result.get("status") == "failed" or "http_status" in result:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
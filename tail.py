@@ -0,0 +1,290 @@
+import io
+import os
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from log_engine import LOG_COLUMNS, LogAggregate
+from metric_engine import METRIC_TYPES, parse_metric_columns, to_wide
+from schema import column_dtypes
+from detectors import MetricDetectors
+
+import config
+
+# 增量分析模式：案例文件在分析过程中持续追加（进行中的故障）时，工具只解析上次读取位置之后新增的行
+tail_mode = getattr(config, "tail_mode", False)
+
+
+class FileTail:
+    """
+    追加写入文件的读取位置：记录已消费的字节偏移量，每次只返回偏移量之后的完整行。
+    文件被截断或替换（轮转）时从头重新读取
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = b""
+        self.offset = 0
+        self.inode = None
+        # 最近一次读取是否因截断或替换而从头开始
+        self.rotated = False
+
+    def read_new(self) -> Optional[bytes]:
+        """
+        返回表头 + 新增的完整行；没有新增行时返回 None。末尾未写完的半行留到下次读取
+        """
+        stat = os.stat(self.path)
+        self.rotated = self.inode is not None and (stat.st_ino != self.inode or stat.st_size < self.offset)
+        if self.rotated or self.inode is None:
+            self.header, self.offset, self.inode = b"", 0, stat.st_ino
+        if stat.st_size == self.offset:
+            return None
+
+        with open(self.path, "rb") as f:
+            if not self.header:
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return None
+                self.header = header
+                self.offset = len(header)
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        self.offset += end
+        return self.header + data[:end]
+
+
+class LogTail:
+    """
+    logs.csv 的增量统计：新增行并入 LogAggregate（级别计数、服务级别错误范围、5 秒错误时间线），代价只与新增行数有关
+    """
+
+    def __init__(self, path: str):
+        self.file = FileTail(path)
+        self.lock = threading.Lock()
+        self.aggregate = LogAggregate()
+        self.new_rows = 0
+
+    def refresh(self) -> dict:
+        data = self.file.read_new()
+        if self.file.rotated:
+            # 文件被截断或替换，已有统计作废
+            self.aggregate = LogAggregate()
+        self.new_rows = 0
+        if data is not None:
+            chunk = pd.read_csv(io.BytesIO(data), usecols=LOG_COLUMNS, dtype=column_dtypes("logs.csv", LOG_COLUMNS))
+            self.aggregate.update(chunk)
+            self.new_rows = len(chunk)
+        return self.aggregate.summary()
+
+
+class MetricTail:
+    """
+    metrics.csv 的增量统计：每列用 Welford（Chan 合并公式）维护数量、均值和二阶中心矩，另维护最小值和最大值。
+    异常值和 CPU 高峰按新增行到达时的 mean + 2*std 判定并累积，已判定的点不随后续数据回溯修正；
+    P95 需要全部历史数据，增量模式下不提供。异常起始时间由 MetricDetectors 分块检测，结果与整表检测一致
+    """
+
+    def __init__(self, path: str):
+        self.file = FileTail(path)
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.columns: List[str] = []
+        self.count = np.zeros(0)
+        self.mean = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self.outliers: Dict[str, List[float]] = {}
+        self.peak_times: Dict[str, List[pd.Timestamp]] = {}
+        self.total_data_points = 0
+        self.start_time = None
+        self.end_time = None
+        self.sample_interval = 0.0
+        self.new_rows = 0
+        self.detectors = MetricDetectors()
+
+    def _ensure_columns(self, columns: List[str]) -> np.ndarray:
+        """
+        返回新数据块各列在累积状态中的位置，长表格式中途出现的新指标列追加到末尾
+        """
+        added = [col for col in columns if col not in self.outliers]
+        if added:
+            self.columns.extend(added)
+            pad = len(added)
+            self.count = np.concatenate([self.count, np.zeros(pad)])
+            self.mean = np.concatenate([self.mean, np.zeros(pad)])
+            self.m2 = np.concatenate([self.m2, np.zeros(pad)])
+            self.min = np.concatenate([self.min, np.full(pad, np.inf)])
+            self.max = np.concatenate([self.max, np.full(pad, -np.inf)])
+            for col in added:
+                self.outliers[col] = []
+        position = {col: i for i, col in enumerate(self.columns)}
+        return np.array([position[col] for col in columns], dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        将一块指标数据合并进累积状态
+        """
+        chunk = to_wide(chunk)
+        if len(chunk) == 0:
+            return
+        chunk = chunk.sort_values("time")
+        datetimes = pd.to_datetime(chunk["time"], unit="s")
+        column_index = parse_metric_columns(chunk.columns)
+        columns = [col for metrics in column_index.values() for col in metrics.values()]
+        index = self._ensure_columns(columns)
+        values = chunk[columns].to_numpy(dtype=np.float64) if columns else np.empty((len(chunk), 0))
+
+        # Chan 合并公式：块内统计量与累积统计量按数量加权合并，逐列忽略缺失值
+        valid = ~np.isnan(values)
+        n_b = valid.sum(axis=0).astype(np.float64)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            mean_b = np.where(n_b > 0, np.nansum(values, axis=0) / np.maximum(n_b, 1), 0.0)
+            m2_b = np.nansum((values - mean_b) ** 2, axis=0)
+            chunk_min = np.nanmin(np.where(valid, values, np.inf), axis=0) if len(values) else np.full(len(columns), np.inf)
+            chunk_max = np.nanmax(np.where(valid, values, -np.inf), axis=0) if len(values) else np.full(len(columns), -np.inf)
+        n_a = self.count[index]
+        n = n_a + n_b
+        delta = mean_b - self.mean[index]
+        ratio = np.divide(n_b, n, out=np.zeros_like(n), where=n > 0)
+        self.mean[index] += delta * ratio
+        self.m2[index] += m2_b + delta ** 2 * n_a * ratio
+        self.count[index] = n
+        self.min[index] = np.minimum(self.min[index], chunk_min)
+        self.max[index] = np.maximum(self.max[index], chunk_max)
+        self.detectors.update(chunk["time"].to_numpy(dtype=np.float64), values, columns)
+
+        # 新增行按合并后的 mean + 2*std 判定异常值
+        threshold = self.mean[index] + 2 * self._std()[index]
+        outliers = values > threshold
+        for j, col in enumerate(columns):
+            mask = outliers[:, j]
+            if mask.any():
+                self.outliers[col].extend(values[mask, j].tolist())
+        for service, metrics in column_index.items():
+            if "cpu" in metrics:
+                mask = outliers[:, columns.index(metrics["cpu"])]
+                self.peak_times.setdefault(service, []).extend(pd.DatetimeIndex(datetimes[mask]).tolist())
+
+        self.total_data_points += len(chunk)
+        self.start_time = datetimes.iloc[0] if self.start_time is None else min(self.start_time, datetimes.iloc[0])
+        self.end_time = datetimes.iloc[-1] if self.end_time is None else max(self.end_time, datetimes.iloc[-1])
+        if len(chunk) > 1:
+            self.sample_interval = float(np.median(np.diff(datetimes.to_numpy()).astype("timedelta64[ns]").astype(np.int64))) / 1e9
+
+    def _std(self) -> np.ndarray:
+        # 样本标准差（ddof=1），与整表统计一致；不足两个数据点时为 NaN
+        return np.sqrt(np.divide(self.m2, self.count - 1, out=np.full_like(self.m2, np.nan), where=self.count > 1))
+
+    def refresh(self) -> dict:
+        data = self.file.read_new()
+        if self.file.rotated:
+            # 文件被截断或替换，已有统计作废
+            self._reset()
+        self.new_rows = 0
+        if data is not None:
+            header = pd.read_csv(io.BytesIO(self.file.header), nrows=0).columns
+            chunk = pd.read_csv(io.BytesIO(data), dtype=column_dtypes("metrics.csv", header))
+            self.update(chunk)
+            self.new_rows = len(chunk)
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        输出与 analyze_metric_frame 相同结构的统计结果（不含 P95）
+        """
+        std = self._std()
+        position = {col: i for i, col in enumerate(self.columns)}
+        column_index = parse_metric_columns(self.columns)
+        service_analysis = {}
+        peak_analysis = {}
+        for service, metrics in column_index.items():
+            service_analysis[service] = {}
+            for metric, label in METRIC_TYPES.items():
+                if metric not in metrics:
+                    continue
+                i = position[metrics[metric]]
+                has_data = self.count[i] > 0
+                service_analysis[service][label] = {
+                    '平均值': round(float(self.mean[i]), 2) if has_data else float("nan"),
+                    '最大值': round(float(self.max[i]), 2) if has_data else float("nan"),
+                    '最小值': round(float(self.min[i]), 2) if has_data else float("nan"),
+                    '标准差': round(float(std[i]), 2),
+                    '异常值': [round(value, 2) for value in self.outliers[metrics[metric]]]
+                }
+            if "cpu" in metrics:
+                peak_times = self.peak_times.get(service, [])
+                peak_analysis[service] = {
+                    "高峰时间": peak_times,
+                    "高峰次数": len(peak_times)
+                }
+
+        duration = (self.end_time - self.start_time).total_seconds() if self.start_time is not None else 0.0
+        return {
+            "total_data_points": self.total_data_points,
+            "time_range": {
+                "开始时间": self.start_time,
+                "结束时间": self.end_time,
+                "持续时间（秒）": round(duration, 2)
+            },
+            "sample_interval": self.sample_interval,
+            "services": list(column_index),
+            "service_analysis": service_analysis,
+            "peak_analysis": peak_analysis,
+            "onsets": self.detectors.onsets(),
+        }
+
+
+# 进程内按文件路径保存的增量状态
+_tails: Dict[str, object] = {}
+_tails_lock = threading.Lock()
+
+
+def _get_tail(path: str, tail_class):
+    key = os.path.abspath(path)
+    with _tails_lock:
+        tail = _tails.get(key)
+        if not isinstance(tail, tail_class):
+            tail = _tails[key] = tail_class(key)
+        return tail
+
+
+def tail_log_stats(logs_file: str) -> dict:
+    """
+    增量读取 logs.csv，返回 get_log 所需的统计结果；new_rows 为本次并入的行数
+    """
+    tail = _get_tail(logs_file, LogTail)
+    # 同一文件的增量状态不能被并行的分析阶段同时更新
+    with tail.lock:
+        stats = tail.refresh()
+        return dict(stats, new_rows=tail.new_rows)
+
+
+def tail_metric_stats(metrics_file: str) -> dict:
+    """
+    增量读取 metrics.csv，返回 get_metric 所需的统计结果；new_rows 为本次并入的行数
+    """
+    tail = _get_tail(metrics_file, MetricTail)
+    with tail.lock:
+        stats = tail.refresh()
+        return dict(stats, new_rows=tail.new_rows)
+
+
+def reset_tail(path: str = None) -> None:
+    """
+    丢弃指定文件（或全部文件）的增量状态，下次调用从文件开头重新统计
+    """
+    with _tails_lock:
+        if path is None:
+            _tails.clear()
+        else:
+            _tails.pop(os.path.abspath(path), None)
@@ -0,0 +1,8 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 各模块在导入时以 getattr(config, ..., 默认值) 读取设置；测试使用空的 config 模块，结果只取决于默认设置，不受本地 config.py 影响
+sys.modules["config"] = types.ModuleType("config")
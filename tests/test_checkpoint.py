@@ -0,0 +1,86 @@
+from checkpoint import load_checkpoint, restore_context, save_checkpoint
+from context_variables import create_context_variables
+
+
+def saved(**values) -> dict:
+    data = create_context_variables().to_dict()
+    data.update(values)
+    return {"context_variables": data}
+
+
+def test_empty_checkpoint_restarts_planning():
+    context_variables, stage = restore_context({})
+    assert stage == "planning"
+    assert context_variables.get("workflow_stage") == "planning"
+
+
+def test_resumes_after_last_approved_stage_and_drops_pending_review():
+    checkpoint = saved(
+        workflow_stage="metric_consensus",
+        plan_result="plan",
+        log_analysis_result="log draft",
+        final_log_analysis_result="approved log",
+        metric_analysis_result="rejected metric draft",
+        current_task="review metrics",
+        consensus_votes=["approve", "reject"],
+        approve_count=1,
+        reject_count=1,
+        vote_rounds=3,
+    )
+    context_variables, stage = restore_context(checkpoint)
+    assert stage == "log_consensus"
+    assert context_variables.get("workflow_stage") == "log_consensus"
+    assert context_variables.get("plan_result") == "plan"
+    assert context_variables.get("vote_rounds") == 3
+    assert context_variables.get("log_analysis_result") == "log draft"
+    assert context_variables.get("final_log_analysis_result") == "approved log"
+    assert context_variables.get("metric_analysis_result") == ""
+    assert context_variables.get("current_task") == ""
+    assert context_variables.get("consensus_votes") == []
+    assert context_variables.get("approve_count") == 0
+
+
+def test_approved_stages_must_be_contiguous():
+    checkpoint = saved(final_log_analysis_result="", final_metric_analysis_result="approved metric")
+    _, stage = restore_context(checkpoint)
+    assert stage == "planning"
+
+
+def test_missing_analysis_falls_back_to_approved_result():
+    checkpoint = saved(final_log_analysis_result="approved log")
+    context_variables, _ = restore_context(checkpoint)
+    assert context_variables.get("log_analysis_result") == "approved log"
+
+
+def test_final_report_only_restored_when_present():
+    done = saved(
+        workflow_stage="final_report",
+        final_log_analysis_result="l",
+        final_metric_analysis_result="m",
+        final_trace_analysis_result="t",
+        final_report="report",
+    )
+    assert restore_context(done)[1] == "final_report"
+    unfinished = saved(
+        workflow_stage="final_report",
+        final_log_analysis_result="l",
+        final_metric_analysis_result="m",
+        final_trace_analysis_result="t",
+    )
+    assert restore_context(unfinished)[1] == "trace_consensus"
+
+
+def test_save_and_load_round_trip(tmp_path):
+    context_variables = create_context_variables()
+    context_variables["plan_result"] = "plan"
+    context_variables["final_log_analysis_result"] = "approved log"
+    path = tmp_path / "nested" / "case_1.json"
+    save_checkpoint(str(path), "1", context_variables, [{"role": "user", "content": "hi"}])
+    checkpoint = load_checkpoint(str(path))
+    assert checkpoint["case_id"] == "1"
+    assert checkpoint["messages"] == [{"role": "user", "content": "hi"}]
+    assert not (tmp_path / "nested" / "case_1.json.tmp").exists()
+    restored, stage = restore_context(checkpoint)
+    assert stage == "log_consensus"
+    assert restored.get("plan_result") == "plan"
+    assert load_checkpoint(str(tmp_path / "missing.json")) is None
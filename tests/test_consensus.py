@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+from autogen import ChatResult
+
+import consensus
+from consensus import parse_vote, vote_outcome, votes_to_decide
+
+
+@pytest.mark.parametrize("response, vote", [
+    ("APPROVE\n理由……", "APPROVE"),
+    ("结论：approve", "APPROVE"),
+    ("REJECT\n数据不一致", "REJECT"),
+    ("理由在前\nAPPROVE", "REJECT"),
+    ("", "REJECT"),
+    (None, "REJECT"),
+])
+def test_parse_vote_reads_first_line(response, vote):
+    assert parse_vote(response) == vote
+
+
+@pytest.mark.parametrize("votes, outcome", [
+    ([], ""),
+    (["APPROVE"], ""),
+    (["APPROVE", "APPROVE"], "APPROVE"),
+    (["REJECT", "REJECT"], "REJECT"),
+    (["APPROVE", "REJECT"], ""),
+    (["APPROVE", "REJECT", "APPROVE"], "APPROVE"),
+    (["approve", "reject", "reject"], "REJECT"),
+])
+def test_vote_outcome_majority_of_three(votes, outcome):
+    assert vote_outcome(votes, total=3, threshold=2) == outcome
+
+
+def test_vote_outcome_unanimous_threshold():
+    assert vote_outcome(["APPROVE", "APPROVE"], total=3, threshold=3) == ""
+    assert vote_outcome(["APPROVE", "REJECT"], total=3, threshold=3) == "REJECT"
+    assert vote_outcome(["APPROVE"] * 3, total=3, threshold=3) == "APPROVE"
+
+
+@pytest.mark.parametrize("votes, needed", [
+    ([], 2),
+    (["APPROVE"], 1),
+    (["REJECT"], 1),
+    (["APPROVE", "REJECT"], 1),
+])
+def test_votes_to_decide_majority_of_three(votes, needed):
+    assert votes_to_decide(votes, total=3, threshold=2) == needed
+
+
+def test_votes_to_decide_five_reviewers():
+    # 5 票 3 票通过：最理想情况下还需 3 票赞成或 3 票反对
+    assert votes_to_decide([], total=5, threshold=3) == 3
+    assert votes_to_decide(["APPROVE", "APPROVE"], total=5, threshold=3) == 1
+    assert votes_to_decide(["REJECT", "REJECT", "APPROVE"], total=5, threshold=3) == 1
+
+
+class FakeReviewer:
+    def __init__(self, name: str, vote: str):
+        self.name = name
+        self.vote = vote
+
+
+def run_nested(reply_func, reviewers, monkeypatch):
+    """
+    用假的 initiate_chats 运行嵌套复审，返回被调用的评审专家和执行 summary_method 的线程
+    """
+    called = []
+    summary_threads = []
+
+    def fake_initiate_chats(chats):
+        reviewer = chats[0]["recipient"]
+        called.append(reviewer.name)
+        assert chats[0]["summary_method"] == "last_msg"
+        return [ChatResult(chat_history=[{"content": reviewer.vote}], summary=reviewer.vote)]
+
+    def record(sender, recipient, summary_args):
+        summary_threads.append(threading.get_ident())
+        return f"{recipient.name}:{recipient.vote}"
+
+    monkeypatch.setattr(consensus, "initiate_chats", fake_initiate_chats)
+    queue = [{"recipient": reviewer, "message": "复审任务", "max_turns": 1, "summary_method": record} for reviewer in reviewers]
+    final, summary = reply_func(queue, object(), [{"content": "复审任务"}], None, None)
+    assert final
+    return called, summary_threads, summary
+
+
+def test_quorum_stops_once_vote_is_decided(monkeypatch):
+    reviewers = [FakeReviewer("agent_a", "APPROVE"), FakeReviewer("agent_b", "APPROVE"), FakeReviewer("agent_c", "REJECT")]
+    called, _, summary = run_nested(consensus.quorum_summary_from_nested_chats, reviewers, monkeypatch)
+    assert sorted(called) == ["agent_a", "agent_b"]
+    assert summary == "agent_b:APPROVE"
+
+
+def test_quorum_asks_tie_breaker_on_split_vote(monkeypatch):
+    reviewers = [FakeReviewer("agent_a", "APPROVE"), FakeReviewer("agent_b", "REJECT"), FakeReviewer("agent_c", "REJECT")]
+    called, _, summary = run_nested(consensus.quorum_summary_from_nested_chats, reviewers, monkeypatch)
+    assert sorted(called) == ["agent_a", "agent_b", "agent_c"]
+    assert summary == "agent_c:REJECT"
+
+
+def test_parallel_runs_summary_methods_in_calling_thread(monkeypatch):
+    reviewers = [FakeReviewer(f"agent_{c}", "APPROVE") for c in "abc"]
+    called, summary_threads, summary = run_nested(consensus.parallel_summary_from_nested_chats, reviewers, monkeypatch)
+    assert sorted(called) == ["agent_a", "agent_b", "agent_c"]
+    assert summary_threads == [threading.get_ident()] * 3
+    assert summary == "agent_c:APPROVE"
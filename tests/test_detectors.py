@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import detectors
+from detectors import DETECTORS, MetricDetectors
+
+INTERVAL = 5.0
+
+
+def make_series(rows: int = 2000, columns: int = 6, shift_row: int = 1400, seed: int = 0):
+    """
+    正态噪声指标，第 0 列在 shift_row 处 +3σ 水平偏移，第 1 列中间有一段缺失值
+    """
+    rng = np.random.default_rng(seed)
+    times = 1_700_000_000 + np.arange(rows) * INTERVAL
+    values = rng.normal(40, 5, (rows, columns))
+    values[shift_row:, 0] += 15
+    values[300:340, 1] = np.nan
+    names = [f"service-{j // 3}_{('cpu', 'mem', 'latency')[j % 3]}" for j in range(columns)]
+    return times, values, names, times[shift_row]
+
+
+def state(d: MetricDetectors) -> dict:
+    return {
+        **{f"first_alarm_{name}": d.first_alarm[name] for name in DETECTORS},
+        **{f"alarm_count_{name}": d.alarm_count[name] for name in DETECTORS},
+        **{f"direction_{name}": d.direction[name] for name in DETECTORS},
+        "change_point": d.change_point,
+    }
+
+
+def assert_same_state(a: MetricDetectors, b: MetricDetectors) -> None:
+    assert a.columns == b.columns
+    for key, value in state(a).items():
+        np.testing.assert_array_equal(value, state(b)[key], err_msg=key)
+    assert a.onsets() == b.onsets()
+
+
+def run_chunked(times, values, names, sizes) -> MetricDetectors:
+    d = MetricDetectors()
+    begin = 0
+    for size in sizes:
+        d.update(times[begin:begin + size], values[begin:begin + size], names)
+        begin += size
+    d.update(times[begin:], values[begin:], names)
+    return d
+
+
+def test_level_shift_is_located():
+    times, values, names, shift_time = make_series()
+    d = MetricDetectors()
+    d.update(times, values, names)
+    assert abs(d.change_point[0] - shift_time) <= 3 * INTERVAL
+    onsets = d.onsets()
+    assert list(onsets) == ["service-0"]
+    assert list(onsets["service-0"]["异常指标"]) == ["CPU"]
+
+
+@pytest.mark.parametrize("sizes", [
+    [1] * 50,                 # 基线建立前逐点到达
+    [7] * 200,                # 与 MAD 窗口不对齐
+    [29, 31, 30, 1, 59],      # 块边界落在窗口边界两侧
+    [1399, 1, 1],             # 块边界紧挨水平偏移
+    [1000],
+])
+def test_chunked_updates_match_whole_series(sizes):
+    times, values, names, _ = make_series()
+    whole = MetricDetectors()
+    whole.update(times, values, names)
+    assert_same_state(whole, run_chunked(times, values, names, sizes))
+
+
+def test_internal_row_slicing_matches_whole_series(monkeypatch):
+    times, values, names, _ = make_series()
+    whole = MetricDetectors()
+    whole.update(times, values, names)
+    monkeypatch.setattr(detectors, "UPDATE_ROWS", 97)
+    sliced = MetricDetectors()
+    sliced.update(times, values, names)
+    assert_same_state(whole, sliced)
+
+
+def test_columns_arriving_later_match_whole_series():
+    times, values, names, _ = make_series()
+    whole = MetricDetectors()
+    whole.update(times, values, names)
+
+    # 第二块才出现的列：先到的块中该列视为缺失
+    late = MetricDetectors()
+    late.update(times[:500], values[:500, :3], names[:3])
+    filled = values[500:].copy()
+    late.update(times[500:], filled, names)
+    reference = MetricDetectors()
+    early = values.copy()
+    early[:500, 3:] = np.nan
+    reference.update(times, early, names)
+    assert_same_state(reference, late)
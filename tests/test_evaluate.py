@@ -0,0 +1,66 @@
+import pytest
+
+from evaluate import extract_fault_type, extract_services, normalize_fault_type, score_report
+
+SERVICES = ["service-0", "service-1", "service-10", "checkout"]
+
+
+def test_service_line_is_ranked_first():
+    report = "案例 3\n根因服务：service-10、service-1\n故障类型：cpu\n分析中还提到 service-0 与 checkout。"
+    assert extract_services(report, SERVICES) == ["service-10", "service-1", "service-0", "checkout"]
+
+
+def test_service_line_tokens_are_cleaned_and_case_insensitive():
+    report = "根因服务（按可能性排序）: **Service-1**, `checkout`。"
+    assert extract_services(report, SERVICES) == ["service-1", "checkout"]
+
+
+def test_mentions_do_not_match_longer_service_names():
+    # service-1 不能匹配 service-10 中的前缀
+    assert extract_services("报告只提到 service-10 的 CPU 升高", SERVICES) == ["service-10"]
+
+
+def test_mentions_are_ordered_by_first_position():
+    report = "checkout 的延迟晚于 service-1 出现，但 service-1 首先被提及。"
+    assert extract_services(report, SERVICES) == ["checkout", "service-1"]
+
+
+def test_unknown_services_are_kept_when_catalog_is_empty():
+    assert extract_services("根因服务：payment, cart", []) == ["payment", "cart"]
+
+
+@pytest.mark.parametrize("text, fault_type", [
+    ("CPU", "cpu"),
+    ("内存泄漏导致 OOM", "memory"),
+    ("网络丢包", "network"),
+    ("请求超时，延迟升高", "latency"),
+    ("磁盘 IO 饱和", "disk"),
+    ("java.lang.Exception", "error"),
+    ("内存不足后 CPU 升高", "memory"),
+    ("未知", None),
+    ("", None),
+])
+def test_normalize_fault_type_takes_earliest_keyword(text, fault_type):
+    assert normalize_fault_type(text) == fault_type
+
+
+def test_fault_type_line_wins_over_body():
+    report = "正文先提到网络抖动。\n故障类型：CPU 资源耗尽"
+    assert extract_fault_type(report) == "cpu"
+    assert extract_fault_type("正文先提到网络抖动，随后 CPU 升高") == "network"
+
+
+def test_score_report_ranks_and_types():
+    report = "根因服务：service-1, service-0\n故障类型：内存"
+    score = score_report(report, {"service": "service-0", "type": "memory"}, SERVICES, ks=[1, 3])
+    assert score["service_rank"] == 2
+    assert score["top1"] is False and score["top3"] is True
+    assert score["predicted_services"] == ["service-1", "service-0"]
+    assert score["type_correct"] is True
+
+
+def test_score_report_missing_service_and_untyped_label():
+    score = score_report("根因服务：checkout", {"service": "service-0"}, SERVICES, ks=[1, 3])
+    assert score["service_rank"] is None
+    assert score["top1"] is False and score["top3"] is False
+    assert score["type_correct"] is None
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from log_templates import WILDCARD, LogTemplateIndex, TemplateMiner, message_codes
+
+
+def test_numeric_tokens_are_variables():
+    assert TemplateMiner.tokenize("user 42 took 13ms on node-7 ok") == ["user", WILDCARD, "took", WILDCARD, "on", WILDCARD, "ok"]
+
+
+def test_similar_messages_merge_into_one_template():
+    miner = TemplateMiner(depth=4, similarity=0.4)
+    first = miner.add("Connection to db failed after retry")
+    second = miner.add("Connection to cache failed after retry")
+    assert first == second
+    assert miner.template(first) == f"Connection to {WILDCARD} failed after retry"
+
+
+def test_template_ids_stay_stable_after_generalising():
+    miner = TemplateMiner(depth=4, similarity=0.4)
+    cluster = miner.add("request served by alpha in time")
+    miner.add("request served by beta in time")
+    assert miner.add("request served by gamma in time") == cluster
+    assert len(miner.templates) == 1
+
+
+def test_different_lengths_or_prefixes_do_not_merge():
+    miner = TemplateMiner(depth=4, similarity=0.4)
+    a = miner.add("disk full on volume data")
+    b = miner.add("disk full on volume")
+    c = miner.add("cache full on volume data")
+    assert len({a, b, c}) == 3
+
+
+def test_dissimilar_messages_in_same_leaf_stay_apart():
+    miner = TemplateMiner(depth=3, similarity=0.6)
+    a = miner.add("payment accepted for order quickly")
+    b = miner.add("payment rejected by bank with error")
+    c = miner.add("payment gateway timeout upstream now")
+    assert len({a, b, c}) == 3
+    assert miner.add("payment accepted for order slowly") == a
+
+
+def test_max_children_routes_overflow_to_wildcard_branch():
+    miner = TemplateMiner(depth=3, similarity=0.4, max_children=2)
+    miner.add("alpha event happened here")
+    miner.add("beta event happened here")
+    overflow = miner.add("gamma event happened here")
+    assert miner.add("delta event happened here") == overflow
+
+
+def test_message_codes_match_for_categorical_and_string_columns():
+    messages = pd.Series(["a b", "c d", "a b", None, "e"])
+    plain_codes, plain_values = message_codes(messages)
+    cat_codes, cat_values = message_codes(messages.astype("category"))
+    decode = lambda codes, values: [values[c] if c >= 0 else None for c in codes]
+    assert decode(plain_codes, list(plain_values)) == decode(cat_codes, list(cat_values))
+
+
+def test_index_counts_by_service_and_bucket():
+    logs = pd.DataFrame({
+        "timestamp": [0.0, 10.0, 65.0, 70.0, 130.0],
+        "service": ["api", "api", "db", "api", "db"],
+        "message": ["request GET /a returned 200", "request GET /b returned 200", "query took 120 ms",
+                    "request GET /c returned 500", None],
+    })
+    index = LogTemplateIndex.build(logs, bucket_seconds=60)
+    assert index.row_template[-1] == -1
+    assert len(index.templates) == 2
+    by_service = index.counts_by_service()
+    assert by_service.to_numpy().sum() == 4
+    assert by_service.loc[index.templates[index.row_template[0]], "api"] == 3
+    np.testing.assert_array_equal(index.counts_by_bucket().to_numpy().sum(axis=0), [2, 2, 0])
@@ -0,0 +1,45 @@
+import json
+
+from payload import TRUNCATED_FIELD, TRUNCATION_KEY, Ranked, build_payload, estimate_tokens
+
+
+def ranked_services(count: int, text: str = "x") -> dict:
+    return {"服务": Ranked({f"service-{i}": {"说明": text} for i in range(count)})}
+
+
+def test_top_k_limits_ranked_items():
+    payload = json.loads(build_payload(ranked_services(20), budget=10_000, top_k=5))
+    services = payload["服务"]
+    assert list(services)[:5] == [f"service-{i}" for i in range(5)]
+    assert services[TRUNCATION_KEY] == "另有 15 项未列出，共 20 项"
+
+
+def test_explicit_zero_top_k_is_kept():
+    payload = json.loads(build_payload(ranked_services(20), budget=10_000, top_k=0))
+    assert payload["服务"] == {TRUNCATION_KEY: "另有 20 项未列出，共 20 项"}
+
+
+def test_budget_halves_top_k_before_truncating_text():
+    obj = ranked_services(16, text="y" * 40)
+    full = build_payload(obj, budget=10_000, top_k=16)
+    text = build_payload(obj, budget=estimate_tokens(full) // 2, top_k=16)
+    payload = json.loads(text)
+    assert TRUNCATED_FIELD not in payload
+    assert len(payload["服务"]) - 1 < 16
+
+
+def test_over_budget_payload_stays_valid_json():
+    obj = {"日志": ["长" * 2000] * 50, "服务": Ranked({"a": "b" * 5000})}
+    text = build_payload(obj, budget=100, top_k=1)
+    payload = json.loads(text)
+    assert TRUNCATED_FIELD in payload
+    assert len(text) < len(json.dumps(obj["日志"], ensure_ascii=False))
+
+
+def test_none_top_k_setting_does_not_halve(monkeypatch):
+    import payload as payload_module
+
+    monkeypatch.setattr(payload_module, "payload_top_k", None)
+    payload = json.loads(build_payload(ranked_services(40, text="z" * 50), budget=50))
+    assert TRUNCATED_FIELD in payload
+    assert TRUNCATION_KEY not in payload["服务"]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trace_index import TraceIndex
+
+
+def spans(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["trace_id", "span_id", "parent_span_id", "service", "operation", "duration"])
+
+
+def test_parents_link_within_the_same_trace():
+    # 两条调用链复用相同的 span_id，父跨度只能在本链内查找
+    index = TraceIndex(spans([
+        ("t1", "a", "", "gateway", "GET /", 100.0),
+        ("t1", "b", "a", "cart", "get", 60.0),
+        ("t2", "a", "", "gateway", "GET /", 50.0),
+        ("t2", "b", "a", "cart", "get", 10.0),
+        ("t2", "c", "zz", "auth", "check", 5.0),
+        ("t2", "d", "d", "db", "query", 1.0),
+    ]))
+    assert index.parent.tolist() == [-1, 0, -1, 2, -1, -1]
+
+
+def test_self_time_and_critical_path():
+    index = TraceIndex(spans([
+        ("t1", "root", "", "gateway", "GET /", 100.0),
+        ("t1", "fast", "root", "cart", "get", 20.0),
+        ("t1", "slow", "root", "order", "create", 70.0),
+        ("t1", "db", "slow", "db", "insert", 50.0),
+        ("t1", "cache", "fast", "cache", "get", 30.0),
+    ]))
+    assert index.self_time.tolist() == [10.0, 0.0, 20.0, 50.0, 30.0]
+    assert index.critical_child.tolist() == [2, 4, 3, -1, -1]
+    assert index.on_critical_path.tolist() == [True, False, True, True, False]
+
+    attribution = index.attribution(critical_only=True)
+    assert attribution["sum"].to_dict() == {("db", "insert"): 50.0, ("order", "create"): 20.0, ("gateway", "GET /"): 10.0}
+    assert attribution["share"].sum() == pytest.approx(1.0)
+
+
+def reference(df: pd.DataFrame):
+    """
+    逐跨度的直接实现：按 (trace_id, span_id) 查父跨度，关键路径从根沿最长子跨度下行（等长时取靠后的行）
+    """
+    rows = list(df.itertuples(index=False))
+    position = {(r.trace_id, r.span_id): i for i, r in enumerate(rows)}
+    parent = [position.get((r.trace_id, r.parent_span_id), -1) for r in rows]
+    parent = [-1 if p == i else p for i, p in enumerate(parent)]
+    children = {i: [] for i in range(len(rows))}
+    for i, p in enumerate(parent):
+        if p >= 0:
+            children[p].append(i)
+    self_time = [max(rows[i].duration - sum(rows[c].duration for c in children[i]), 0.0) for i in range(len(rows))]
+    on_path = [False] * len(rows)
+    for root in (i for i, p in enumerate(parent) if p < 0):
+        node = root
+        while node >= 0 and not on_path[node]:
+            on_path[node] = True
+            kids = children[node]
+            node = max(kids, key=lambda c: (rows[c].duration, c)) if kids else -1
+    return parent, self_time, on_path
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_reference_on_random_trees(seed):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for t in range(20):
+        size = int(rng.integers(1, 30))
+        for s in range(size):
+            parent = f"s{rng.integers(0, s)}" if s else ""
+            if rng.random() < 0.05:
+                parent = "missing"
+            rows.append((f"t{t}", f"s{s}", parent, f"svc{rng.integers(0, 4)}", "op", float(rng.integers(1, 100))))
+    df = spans(rows).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    index = TraceIndex(df)
+    parent, self_time, on_path = reference(df)
+    assert index.parent.tolist() == parent
+    np.testing.assert_allclose(index.self_time, self_time)
+    assert index.on_critical_path.tolist() == on_path
@@ -2,6 +2,17 @@ import os
 import pandas as pd
 from typing import Annotated
 from config import dataset_path
+from case_store import load_table
+from log_engine import LOG_COLUMNS, log_stream_threshold, analyze_log_frame, stream_log_stats
+from log_templates import load_template_index
+from metric_engine import analyze_metric_frame, to_wide
+from detectors import detect_metric_onsets
+from tail import tail_mode, tail_log_stats, tail_metric_stats
+from trace_index import TRACE_COLUMNS, PARENT_COLUMNS, TraceIndex
+from correlation import load_correlation_index
+from catalog import list_case_entries
+from payload import Ranked, build_payload, peak_intervals
+from consensus import reviewer_names, vote_outcome
 from autogen.agentchat.group import ContextVariables, ReplyResult, RevertToUserTarget
 from typing import List, Annotated
 from autogen.agentchat.group.targets.transition_target import AgentNameTarget, RevertToUserTarget
@@ -13,38 +24,61 @@ def provide_analysis_plan(
     """
     提供日志分析计划
     """
-    context_variables['workflow_stage'] = 'planning'
+    # 从检查点恢复时阶段已越过规划，重新提交计划不应回退到日志分析
+    if context_variables['workflow_stage'] not in stage_routes or context_variables['workflow_stage'] == 'planning':
+        context_variables['workflow_stage'] = 'planning'
     context_variables['plan_result'] = analysis_plan
     return ReplyResult(
         message=f"分析计划已提供: {analysis_plan}",
         context_variables=context_variables
     )
 
+def list_cases(
+        service: Annotated[str, "只列出包含该服务的案例，留空表示全部"] = "",
+        sort_by: Annotated[str, "排序字段：total_bytes（数据量）、duration（时长）、start（开始时间）"] = "total_bytes",
+        limit: Annotated[int, "最多列出的案例数"] = 20
+) -> ReplyResult:
+    """
+    查询数据集清单，列出案例的数据量、行数、时间范围和服务，不读取案例数据
+    """
+    if sort_by not in ("total_bytes", "duration", "start"):
+        sort_by = "total_bytes"
+    entries = list_case_entries(service=service or None, sort_by=sort_by, descending=sort_by != "start")
+    cases = [
+        {
+            "案例ID": e["case_id"],
+            "数据量（MB）": e["total_bytes"] / 1024 / 1024,
+            "行数": e["rows"],
+            "开始时间": pd.to_datetime(e["start"], unit="s") if e["start"] is not None else None,
+            "结束时间": pd.to_datetime(e["end"], unit="s") if e["end"] is not None else None,
+            "服务数": len(e["services"]),
+        }
+        for e in entries[:limit]
+    ]
+    payload = build_payload({"案例总数": len(entries), "案例列表": Ranked(cases)})
+    return ReplyResult(
+        message=f"数据集中的案例如下：\n{payload}"
+    )
+
+# 工作流阶段 -> (下一个智能体, 交接说明)；route_to_agent 和快速编排路径共用
+stage_routes = {
+    "planning": ("log_agent", "已完成工作流规划，请继续进行日志分析。"),
+    "log_consensus": ("metric_agent", "已完成日志分析，请继续进行系统指标分析。"),
+    "metric_consensus": ("trace_agent", "已完成系统指标分析，请继续进行调用链分析。"),
+    "trace_consensus": ("report_agent", "已完成调用链分析，请继续进行最终报告生成。"),
+}
+
 def route_to_agent(
         context_variables: ContextVariables
 ) -> ReplyResult:
     """
     路由到具体分析代理
     """
-    if context_variables["workflow_stage"] == "planning":
-        return ReplyResult(
-            message="已完成工作流规划，请继续进行日志分析。",
-            target=AgentNameTarget("log_agent")
-        )
-    elif context_variables["workflow_stage"] == "log_consensus":
-        return ReplyResult(
-            message="已完成日志分析，请继续进行系统指标分析。",
-            target=AgentNameTarget("metric_agent")
-        )
-    elif context_variables["workflow_stage"] == "metric_consensus":
+    if context_variables["workflow_stage"] in stage_routes:
+        agent_name, message = stage_routes[context_variables["workflow_stage"]]
         return ReplyResult(
-            message="已完成系统指标分析，请继续进行调用链分析。",
-            target=AgentNameTarget("trace_agent")
-        )
-    elif context_variables["workflow_stage"] == "trace_consensus":
-        return ReplyResult(
-            message="已完成调用链分析，请继续进行最终报告生成。",
-            target=AgentNameTarget("report_agent")
+            message=message,
+            target=AgentNameTarget(agent_name)
         )
     elif context_variables["workflow_stage"] == "final_report":
         return ReplyResult(
@@ -69,76 +103,61 @@ def get_log(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyRes
     if not os.path.exists(logs_file):
         return {"error": f"找不到案例{case_id}的日志文件"}
     
-    # 读取日志数据
-    df = pd.read_csv(logs_file)
-    
-    # 转换时间戳
-    df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
-    df = df.sort_values('datetime')
-    
-    # 基础统计信息
-    total_logs = len(df)
-    services = df['service'].unique()
-    log_levels = df['level'].value_counts().to_dict()
-    
-    # 异常检测
-    error_logs = df[df['level'] == 'ERROR']
-    warn_logs = df[df['level'] == 'WARN']
-    
-    anomalies = {
-        "error_count": len(error_logs),
-        "warn_count": len(warn_logs),
-        "error_services": error_logs['service'].unique().tolist() if len(error_logs) > 0 else [],
-        "warn_services": warn_logs['service'].unique().tolist() if len(warn_logs) > 0 else [],
-        "error_time_range": {
-            "start": error_logs['datetime'].min() if len(error_logs) > 0 else None,
-            "end": error_logs['datetime'].max() if len(error_logs) > 0 else None
-        }
-    }
-    
-    # 时间线分析
-    df['time_bucket'] = df['datetime'].dt.floor('5s')
-    timeline = df.groupby(['time_bucket', 'level']).size().unstack(fill_value=0)
-    
-    if 'ERROR' in timeline.columns:
-        error_timeline = timeline['ERROR']
-        mean_errors = error_timeline.mean()
-        std_errors = error_timeline.std()
-        anomaly_threshold = mean_errors + 2 * std_errors
-        
-        anomaly_periods = timeline[timeline['ERROR'] > anomaly_threshold]
-        
-        timeline_analysis = {
-            'total_periods': len(timeline),
-            'anomaly_periods': len(anomaly_periods),
-            'peak_error_time': error_timeline.idxmax() if len(error_timeline) > 0 else None,
-            'peak_error_count': error_timeline.max() if len(error_timeline) > 0 else 0
-        }
+    if tail_mode:
+        # 增量模式：只解析上次调用之后追加的行，并入累积统计
+        stats = tail_log_stats(logs_file)
+    elif os.path.getsize(logs_file) > log_stream_threshold:
+        # 大文件分块流式统计，内存占用与文件大小无关
+        stats = stream_log_stats(logs_file)
     else:
-        timeline_analysis = {'total_periods': len(timeline), 'anomaly_periods': 0}
+        stats = analyze_log_frame(load_table(logs_file, LOG_COLUMNS))
+    
+    # 服务按错误数、日志数排序，超出 token 预算时只保留排在前面的服务
+    service_analysis = dict(sorted(
+        stats['service_analysis'].items(),
+        key=lambda item: (-item[1]['error_logs'], -item[1]['total_logs'])
+    ))
+    anomalies = dict(
+        stats['anomalies'],
+        error_services=Ranked(stats['anomalies']['error_services']),
+        warn_services=Ranked(stats['anomalies']['warn_services'])
+    )
+    payload = build_payload({
+        **({"本次新增日志数": stats['new_rows']} if tail_mode else {}),
+        "总日志数": stats['total_logs'],
+        "服务数量": len(stats['services']),
+        "日志级别分布": stats['log_levels'],
+        "异常检测": anomalies,
+        "时间线分析": stats['timeline_analysis'],
+        "服务级别分析（按错误数排序）": Ranked(service_analysis),
+    })
     
-    # 服务级别分析
-    service_analysis = {}
-    for service in services:
-        service_logs = df[df['service'] == service]
-        service_errors = service_logs[service_logs['level'] == 'ERROR']
-        service_analysis[service] = {
-            "total_logs": len(service_logs),
-            "error_logs": len(service_errors),
-            "error_time_range": {
-                "start": service_errors['datetime'].min() if len(service_errors) > 0 else None,
-                "end": service_errors['datetime'].max() if len(service_errors) > 0 else None
-            }
-        }
+    return ReplyResult(
+        message=f"案例 {case_id} 的日志信息如下：\n{payload}"
+    )
     
+def get_log_templates(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyResult:
+    """
+    将日志消息归并为模板，列出基线之后新出现和突发的模板（按服务），以及高频模板
+    """
+    # 构建数据文件路径
+    base_path = dataset_path
+    case_path = os.path.join(base_path, f"case_{case_id}")
+    logs_file = os.path.join(case_path, "logs.csv")
+    
+    if not os.path.exists(logs_file):
+        return ReplyResult(message=f"找不到案例{case_id}的日志文件")
+    
+    # 模板索引按案例持久化，日志文件不变时直接加载，不重新挖掘
+    summary = load_template_index(logs_file).summary()
+    payload = build_payload({
+        "模板概况": summary['模板概况'],
+        "新模板（按首次出现时间排序）": Ranked(summary['新模板']),
+        "突发模板（按超出基线条数排序）": Ranked(summary['突发模板']),
+        "高频模板": Ranked(summary['高频模板']),
+    })
     return ReplyResult(
-        message=f"案例 {case_id} 的日志信息如下：\n"
-                f"总日志数：{total_logs}\n"
-                f"服务数量：{len(services)}\n"
-                f"日志级别分布：{log_levels}\n"
-                f"异常检测：{anomalies}\n"
-                f"时间线分析：{timeline_analysis}\n"
-                f"服务级别分析：{service_analysis}"
+        message=f"案例 {case_id} 的日志模板分析如下：\n{payload}"
     )
     
 def provide_log_result(
@@ -151,6 +170,8 @@ def provide_log_result(
     # 更新上下文变量
     context_variables["log_analysis_result"] = analysis_result
     context_variables["workflow_stage"] = "log_analysis"
+    # 新的分析结果进入复审，清除上一轮的投票结论
+    context_variables["final_result"] = ""
     
     return ReplyResult(
         message=f"日志分析结果已保存：{analysis_result}",
@@ -171,8 +192,8 @@ def get_trace(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyR
     if not os.path.exists(traces_file):
         return ReplyResult(message=f"找不到案例{case_id}的调用链文件")
     
-    # 读取调用链数据
-    df = pd.read_csv(traces_file)
+    # 读取调用链数据，只加载统计用到的列
+    df = load_table(traces_file, ["timestamp", "trace_id", "service", "operation", "duration"])
     
     # 转换时间戳
     df['datetime'] = pd.to_datetime(df['timestamp'], unit='s')
@@ -202,26 +223,58 @@ def get_trace(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyR
     }
     
     # 服务级别性能分析
-    service_analysis = df.groupby('service')['duration'].agg(['count', 'mean', 'max', 'std']).round(2).to_dict('index')
+    service_analysis = df.groupby('service', observed=True)['duration'].agg(['count', 'mean', 'max', 'std']).round(2).to_dict('index')
     
     # trace模式分析
-    trace_spans = df.groupby('trace_id').size()
+    trace_spans = df.groupby('trace_id', observed=True).size()
     trace_analysis = {
         "平均调用链跨度": trace_spans.mean(),
         "最大调用链跨度": trace_spans.max(),
         "最小调用链跨度": trace_spans.min()
     }
     
+    # 服务按平均耗时从高到低排序，超出 token 预算时只保留排在前面的服务
+    service_analysis = dict(sorted(service_analysis.items(), key=lambda item: -item[1]['mean']))
+    payload = build_payload({
+        "总跨度数": total_spans,
+        "调用链数量": trace_count,
+        "时间范围": time_range,
+        "服务列表": Ranked(services),
+        "操作类型": Ranked(operations),
+        "性能统计": duration_stats,
+        "服务级别分析（按平均耗时排序）": Ranked(service_analysis),
+        "调用链分析": trace_analysis,
+    })
+    
+    return ReplyResult(
+        message=f"案例 {case_id} 的调用链信息如下：\n{payload}"
+    )
+
+def get_trace_critical_path(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyResult:
+    """
+    重建指定案例的调用树，给出关键路径和自身耗时在服务/操作上的归因
+    """
+    # 构建数据文件路径
+    base_path = dataset_path
+    case_path = os.path.join(base_path, f"case_{case_id}")
+    traces_file = os.path.join(case_path, "traces.csv")
+    
+    if not os.path.exists(traces_file):
+        return ReplyResult(message=f"找不到案例{case_id}的调用链文件")
+    
+    try:
+        index = TraceIndex(load_table(traces_file, TRACE_COLUMNS + PARENT_COLUMNS))
+    except ValueError as e:
+        return ReplyResult(message=f"案例 {case_id} 无法重建调用树：{e}")
+    
+    summary = index.summary()
+    payload = build_payload({
+        "调用树概况": summary['调用树概况'],
+        "关键路径耗时归因（按服务/操作）": Ranked(summary['关键路径耗时归因']),
+        "自身耗时归因（按服务/操作）": Ranked(summary['自身耗时归因']),
+    })
     return ReplyResult(
-        message=f"案例 {case_id} 的调用链信息如下：\n"
-                f"总跨度数：{total_spans}\n"
-                f"调用链数量：{trace_count}\n"
-                f"时间范围：{time_range}\n"
-                f"服务列表：{services}\n"
-                f"操作类型：{operations}\n"
-                f"性能统计：{duration_stats}\n"
-                f"服务级别分析：{service_analysis}\n"
-                f"调用链分析：{trace_analysis}"
+        message=f"案例 {case_id} 的调用树分析如下：\n{payload}"
     )
 
 def provide_trace_result(
@@ -234,6 +287,8 @@ def provide_trace_result(
     # 更新上下文变量
     context_variables["trace_analysis_result"] = analysis_result
     context_variables["workflow_stage"] = "trace_analysis"
+    # 新的分析结果进入复审，清除上一轮的投票结论
+    context_variables["final_result"] = ""
     
     return ReplyResult(
         message=f"调用链分析结果已保存：{analysis_result}",
@@ -254,94 +309,45 @@ def get_metric(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> Reply
     if not os.path.exists(metrics_file):
         return ReplyResult(message=f"找不到案例{case_id}的指标文件")
     
-    # 读取指标数据
-    df = pd.read_csv(metrics_file)
-    
-    # 转换时间戳
-    df['datetime'] = pd.to_datetime(df['time'], unit='s')
-    df = df.sort_values('datetime')
-    
-    # 提取服务名称和指标类型
-    services = []
-    metric_types = ['cpu', 'mem', 'latency']
-    
-    for col in df.columns:
-        if any(metric in col for metric in metric_types):
-            service = col.split('_')[0]
-            if service not in services:
-                services.append(service)
-    
-    # 基础统计信息
-    total_data_points = len(df)
-    time_range = {
-        "开始时间": df['datetime'].min(),
-        "结束时间": df['datetime'].max(),
-        "持续时间（秒）": round((df['datetime'].max() - df['datetime'].min()).total_seconds(), 2)
-    }
+    if tail_mode:
+        # 增量模式：新增数据点以 Welford 方式并入各指标的均值和标准差，异常检测器从上次的状态继续
+        stats = tail_metric_stats(metrics_file)
+    else:
+        # 读取指标数据，所有服务、所有指标的统计量在一次矩阵运算中完成；异常检测器单遍扫描全部指标列
+        metrics = to_wide(load_table(metrics_file))
+        stats = dict(analyze_metric_frame(metrics), onsets=detect_metric_onsets(metrics))
     
-    # 服务指标分析
+    # 异常值从大到小排列并给出数量；服务按异常值总数排序
     service_analysis = {}
-    for service in services:
-        cpu_col = f"{service}_cpu"
-        mem_col = f"{service}_mem"
-        latency_col = f"{service}_latency"
-        
+    outlier_counts = {}
+    for service, metrics in stats['service_analysis'].items():
         service_analysis[service] = {}
-        
-        # CPU分析
-        if cpu_col in df.columns:
-            cpu_data = df[cpu_col]
-            service_analysis[service]['CPU'] = {
-                '平均值': round(float(cpu_data.mean()), 2),
-                '最大值': round(float(cpu_data.max()), 2),
-                '最小值': round(float(cpu_data.min()), 2),
-                '标准差': round(float(cpu_data.std()), 2),
-                'P95': round(float(cpu_data.quantile(0.95)), 2),
-                '异常值': [round(float(value), 2) for value in cpu_data[cpu_data > cpu_data.mean() + 2 * cpu_data.std()]]
-            }
-        
-        # 内存分析
-        if mem_col in df.columns:
-            mem_data = df[mem_col]
-            service_analysis[service]['内存'] = {
-                '平均值': round(float(mem_data.mean()), 2),
-                '最大值': round(float(mem_data.max()), 2),
-                '最小值': round(float(mem_data.min()), 2),
-                '标准差': round(float(mem_data.std()), 2),
-                'P95': round(float(mem_data.quantile(0.95)), 2),
-                '异常值': [round(float(value), 2) for value in mem_data[mem_data > mem_data.mean() + 2 * mem_data.std()]]
-            }
-        
-        # 延迟分析
-        if latency_col in df.columns:
-            latency_data = df[latency_col]
-            service_analysis[service]['延迟'] = {
-                '平均值': round(float(latency_data.mean()), 2),
-                '最大值': round(float(latency_data.max()), 2),
-                '最小值': round(float(latency_data.min()), 2),
-                '标准差': round(float(latency_data.std()), 2),
-                'P95': round(float(latency_data.quantile(0.95)), 2),
-                '异常值': [round(float(value), 2) for value in latency_data[latency_data > latency_data.mean() + 2 * latency_data.std()]]
-            }
-    
-    # 趋势分析：计算时间序列中的高峰期
-    peak_analysis = {}
-    for service in services:
-        cpu_col = f"{service}_cpu"
-        if cpu_col in df.columns:
-            peak_times = df[df[cpu_col] > df[cpu_col].mean() + 2 * df[cpu_col].std()]['datetime'].tolist()
-            peak_analysis[service] = {
-                "高峰时间": peak_times,
-                "高峰次数": len(peak_times)
-            }
+        outlier_counts[service] = 0
+        for label, metric_stats in metrics.items():
+            outliers = sorted(metric_stats['异常值'], reverse=True)
+            outlier_counts[service] += len(outliers)
+            service_analysis[service][label] = dict(metric_stats, 异常值数量=len(outliers), 异常值=Ranked(outliers))
+    service_analysis = dict(sorted(service_analysis.items(), key=lambda item: -outlier_counts[item[0]]))
+    
+    # 高峰时间点游程编码为连续区间，只列出出现过高峰的服务，按高峰次数排序
+    peak_analysis = {
+        service: {"高峰次数": peak["高峰次数"], "高峰区间": Ranked(peak_intervals(peak["高峰时间"], stats['sample_interval']))}
+        for service, peak in sorted(stats['peak_analysis'].items(), key=lambda item: -item[1]["高峰次数"])
+        if peak["高峰次数"] > 0
+    }
+    
+    payload = build_payload({
+        **({"本次新增数据点数": stats['new_rows']} if tail_mode else {}),
+        "总数据点数": stats['total_data_points'],
+        "时间范围": stats['time_range'],
+        "服务列表": Ranked(stats['services']),
+        "服务指标分析（按异常值数量排序）": Ranked(service_analysis),
+        "趋势分析（CPU 高峰区间）": Ranked(peak_analysis),
+        "异常起始时间（EWMA / 分块 MAD / CUSUM 变点，按报警检测器数排序）": Ranked(stats['onsets']),
+    })
     
     return ReplyResult(
-        message=f"案例 {case_id} 的系统指标信息如下：\n"
-                f"总数据点数：{total_data_points}\n"
-                f"时间范围：{time_range}\n"
-                f"服务列表：{services}\n"
-                f"服务指标分析：{service_analysis}\n"
-                f"趋势分析：{peak_analysis}"
+        message=f"案例 {case_id} 的系统指标信息如下：\n{payload}"
     )
 
 def provide_metric_result(
@@ -354,6 +360,8 @@ def provide_metric_result(
     # 更新上下文变量
     context_variables["metric_analysis_result"] = analysis_result
     context_variables["workflow_stage"] = "metric_analysis"
+    # 新的分析结果进入复审，清除上一轮的投票结论
+    context_variables["final_result"] = ""
     
     return ReplyResult(
         message=f"系统指标分析结果已保存：{analysis_result}",
@@ -376,9 +384,9 @@ def prepare_vote(context_variables: ContextVariables) -> ReplyResult:
     
 
     context_variables["current_task"] = task
-    context_variables["agent_a_result"] = ""
-    context_variables["agent_b_result"] = ""
-    context_variables["agent_c_result"] = ""
+    for name in reviewer_names:
+        context_variables[f"{name}_result"] = ""
+    context_variables["review_complete"] = False
     context_variables["consensus_votes"] = []
     context_variables["approve_count"] = 0
     context_variables["reject_count"] = 0
@@ -390,47 +398,58 @@ def prepare_vote(context_variables: ContextVariables) -> ReplyResult:
     )
 
 
+def tally_votes(votes: List[str], context_variables: ContextVariables) -> str:
+    """
+    统计投票并推进工作流阶段，清空本轮复审任务，保留本轮投票结果；complete_vote 和快速编排路径共用
+    """
+    # 更新投票结果
+    context_variables["consensus_votes"] = votes
+    
+    # 统计投票结果
+    approve_count = sum(1 for v in votes if v.upper() == "APPROVE")
+    reject_count = sum(1 for v in votes if v.upper() == "REJECT")
+    passed = vote_outcome(votes) == "APPROVE"
+    
+    # 更新投票相关变量
+    context_variables["approve_count"] = approve_count
+    context_variables["reject_count"] = reject_count
+    context_variables["final_result"] = "APPROVE" if passed else "REJECT"
+    context_variables["vote_rounds"] = context_variables.get("vote_rounds", 0) + 1
+    
+    # 如果通过，保存当前分析结果
+    if passed:
+        if context_variables.get("log_analysis_result"):
+            context_variables["final_log_analysis_result"] = context_variables["log_analysis_result"]
+            context_variables["workflow_stage"] = "log_consensus"
+        if context_variables.get("metric_analysis_result"):
+            context_variables["final_metric_analysis_result"] = context_variables["metric_analysis_result"]
+            context_variables["workflow_stage"] = "metric_consensus"
+        if context_variables.get("trace_analysis_result"):
+            context_variables["final_trace_analysis_result"] = context_variables["trace_analysis_result"]
+            context_variables["workflow_stage"] = "trace_consensus"
+    
+    context_variables["current_task"] = ""
+    for name in reviewer_names:
+        context_variables[f"{name}_result"] = ""
+    context_variables["review_complete"] = False
+    
+    return f"投票统计结果：\n- 赞成票数：{approve_count}\n- 反对票数：{reject_count}\n- 最终结果：{'通过' if passed else '不通过'}"
+
+
 def complete_vote(votes: List[str], context_variables: ContextVariables) -> ReplyResult:
     """
     完成投票统计，根据结果更新上下文变量
     """
     try:
-        # 更新投票结果
-        context_variables["consensus_votes"] = votes
-        
-        # 统计投票结果
-        approve_count = sum(1 for v in votes if v.upper() == "APPROVE")
-        reject_count = sum(1 for v in votes if v.upper() == "REJECT")
-        passed = approve_count >= 2
+        message = tally_votes(votes, context_variables)
         
-        # 更新投票相关变量
-        context_variables["approve_count"] = approve_count
-        context_variables["reject_count"] = reject_count
-        context_variables["final_result"] = "APPROVE" if passed else "REJECT"
-        
-        # 如果通过，保存当前分析结果
-        if passed:
-            if context_variables.get("log_analysis_result"):
-                context_variables["final_log_analysis_result"] = context_variables["log_analysis_result"]
-                context_variables["workflow_stage"] = "log_consensus"
-            if context_variables.get("metric_analysis_result"):
-                context_variables["final_metric_analysis_result"] = context_variables["metric_analysis_result"]
-                context_variables["workflow_stage"] = "metric_consensus"
-            if context_variables.get("trace_analysis_result"):
-                context_variables["final_trace_analysis_result"] = context_variables["trace_analysis_result"]
-                context_variables["workflow_stage"] = "trace_consensus"
-        
-        context_variables["current_task"] = ""
-        context_variables["agent_a_result"] = ""
-        context_variables["agent_b_result"] = ""
-        context_variables["agent_c_result"] = ""
         context_variables["consensus_votes"] = []
         context_variables["approve_count"] = 0
         context_variables["reject_count"] = 0
         context_variables["final_result"] = ""
         
         return ReplyResult(
-            message=f"投票统计结果：\n- 赞成票数：{approve_count}\n- 反对票数：{reject_count}\n- 最终结果：{'通过' if passed else '不通过'}",
+            message=message,
             context_variables=context_variables
         )
     except Exception as e:
@@ -438,6 +457,31 @@ def complete_vote(votes: List[str], context_variables: ContextVariables) -> Repl
             message=f"投票统计出错: {str(e)}",
             context_variables=context_variables
         )
+
+def get_correlation(case_id: Annotated[str, "案例ID，如 '1', '2', '3'"]) -> ReplyResult:
+    """
+    将日志错误、系统指标和调用链耗时按统一时间桶对齐，按跨模态异常共现程度对服务排序
+    """
+    # 构建数据文件路径
+    base_path = dataset_path
+    case_path = os.path.join(base_path, f"case_{case_id}")
+    
+    if not os.path.isdir(case_path):
+        return ReplyResult(message=f"找不到案例{case_id}的数据目录")
+    
+    # 对齐索引每个案例只构建一次，之后的查询只与服务数 × 时间桶数有关
+    summary = load_correlation_index(case_path).summary()
+    payload = build_payload({
+        "对齐概况": summary['对齐概况'],
+        "服务排序（按跨模态共现时间桶数）": Ranked({
+            service: dict(info, 共现时间段=Ranked(info['共现时间段']), 跨模态相关系数=Ranked(info['跨模态相关系数']))
+            for service, info in summary['服务排序'].items()
+        }),
+        "全局共现时间段": Ranked(summary['全局共现时间段']),
+    })
+    return ReplyResult(
+        message=f"案例 {case_id} 的跨模态关联分析如下：\n{payload}"
+    )
     
 def provide_final_report(
     final_report: Annotated[str, "最终分析报告"],
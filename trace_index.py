@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# 构建调用树所需的列；父跨度列兼容 parent_span_id / parent_id 两种命名
+TRACE_COLUMNS = ["trace_id", "span_id", "service", "operation", "duration"]
+PARENT_COLUMNS = ["parent_span_id", "parent_id"]
+
+
+def parent_column(columns) -> str:
+    """
+    返回父跨度列名，不存在时返回空字符串
+    """
+    for col in PARENT_COLUMNS:
+        if col in columns:
+            return col
+    return ""
+
+
+class TraceIndex:
+    """
+    调用链索引：以数组表示所有调用树（每个跨度一行），不为单个跨度创建 Python 对象。
+
+    - parent: 父跨度的行号，根跨度或父跨度缺失时为 -1
+    - self_time: 自身耗时 = 耗时 - 子跨度耗时之和（下限为 0）
+    - critical_child: 耗时最长的子跨度行号，没有子跨度时为 -1
+    - on_critical_path: 是否位于所在调用链的关键路径上（从根沿 critical_child 逐层下行）
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        parent_col = parent_column(df.columns)
+        missing = [col for col in TRACE_COLUMNS if col not in df.columns]
+        if missing or not parent_col:
+            raise ValueError(f"调用链数据缺少构建调用树所需的列：{missing or PARENT_COLUMNS}")
+
+        self.size = len(df)
+        self.trace = pd.factorize(df["trace_id"])[0].astype(np.int64)
+        self.trace_count = int(self.trace.max()) + 1 if self.size else 0
+        # 服务和操作以整数编码保存，名称表只保留一份
+        self.service, self.service_names = pd.factorize(df["service"])
+        self.operation, self.operation_names = pd.factorize(df["operation"])
+        self.duration = df["duration"].to_numpy(dtype=np.float64)
+
+        self.parent = self._link_parents(df["span_id"], df[parent_col])
+        self.self_time = self._self_time()
+        self.critical_child = self._critical_child()
+        self.on_critical_path = self._critical_path()
+
+    def _link_parents(self, span_id: pd.Series, parent_span_id: pd.Series) -> np.ndarray:
+        """
+        将 (trace, parent_span_id) 映射为父跨度行号：对 (trace, span_id) 键排序后二分查找
+        """
+        span_code, uniques = pd.factorize(span_id)
+        parent_code = pd.Index(uniques).get_indexer(parent_span_id)
+        width = len(uniques) + 1
+        span_key = self.trace * width + span_code
+        parent_key = self.trace * width + parent_code
+
+        order = np.argsort(span_key, kind="stable")
+        sorted_keys = span_key[order]
+        pos = np.searchsorted(sorted_keys, parent_key)
+        pos_clipped = np.minimum(pos, max(self.size - 1, 0))
+        found = (parent_code >= 0) & (pos < self.size) & (sorted_keys[pos_clipped] == parent_key)
+
+        parent = np.full(self.size, -1, dtype=np.int64)
+        parent[found] = order[pos_clipped[found]]
+        # 自身为父跨度的异常数据视为根跨度，避免形成环
+        parent[parent == np.arange(self.size)] = -1
+        return parent
+
+    def _self_time(self) -> np.ndarray:
+        has_parent = self.parent >= 0
+        child_time = np.bincount(self.parent[has_parent], weights=self.duration[has_parent], minlength=self.size)
+        return np.maximum(self.duration - child_time, 0.0)
+
+    def _critical_child(self) -> np.ndarray:
+        """
+        每个跨度耗时最长的子跨度：按 (父跨度, 耗时) 排序后取每组最后一个
+        """
+        children = np.flatnonzero(self.parent >= 0)
+        critical = np.full(self.size, -1, dtype=np.int64)
+        if len(children) == 0:
+            return critical
+        order = children[np.lexsort((self.duration[children], self.parent[children]))]
+        parents = self.parent[order]
+        last_of_group = np.append(parents[1:] != parents[:-1], True)
+        critical[parents[last_of_group]] = order[last_of_group]
+        return critical
+
+    def _critical_path(self) -> np.ndarray:
+        """
+        从所有根跨度同时出发，沿 critical_child 逐层下行，迭代次数等于最大调用深度
+        """
+        on_path = np.zeros(self.size, dtype=bool)
+        frontier = np.flatnonzero(self.parent < 0)
+        while len(frontier):
+            frontier = frontier[~on_path[frontier]]
+            on_path[frontier] = True
+            frontier = self.critical_child[frontier]
+            frontier = frontier[frontier >= 0]
+        return on_path
+
+    def attribution(self, critical_only: bool = True, top_k: int = 10) -> pd.DataFrame:
+        """
+        按 (服务, 操作) 汇总自身耗时，critical_only 时只统计关键路径上的跨度
+        """
+        mask = self.on_critical_path if critical_only else np.ones(self.size, dtype=bool)
+        frame = pd.DataFrame({
+            "service": self.service[mask],
+            "operation": self.operation[mask],
+            "self_time": self.self_time[mask],
+        })
+        grouped = frame.groupby(["service", "operation"])["self_time"].agg(["sum", "count", "mean"])
+        total = grouped["sum"].sum()
+        grouped["share"] = grouped["sum"] / total if total > 0 else 0.0
+        grouped = grouped.sort_values("sum", ascending=False).head(top_k)
+        grouped.index = pd.MultiIndex.from_arrays([
+            np.asarray(self.service_names)[grouped.index.get_level_values(0)],
+            np.asarray(self.operation_names)[grouped.index.get_level_values(1)],
+        ], names=["service", "operation"])
+        return grouped
+
+    def summary(self, top_k: int = 10) -> dict:
+        """
+        输出调用树概况以及关键路径、全部跨度的自身耗时归因
+        """
+        roots = self.parent < 0
+        critical_time = np.bincount(self.trace[self.on_critical_path], weights=self.self_time[self.on_critical_path], minlength=self.trace_count)
+
+        def to_records(table: pd.DataFrame) -> list:
+            return [
+                {
+                    "服务": service,
+                    "操作": operation,
+                    "自身耗时合计": round(float(row["sum"]), 2),
+                    "跨度数": int(row["count"]),
+                    "平均自身耗时": round(float(row["mean"]), 2),
+                    "占比": round(float(row["share"]), 4),
+                }
+                for (service, operation), row in table.iterrows()
+            ]
+
+        return {
+            "调用树概况": {
+                "调用链数量": self.trace_count,
+                "跨度数": self.size,
+                "根跨度数": int(roots.sum()),
+                "关键路径跨度数": int(self.on_critical_path.sum()),
+                "关键路径平均耗时": round(float(critical_time.mean()), 2) if self.trace_count else 0.0,
+                "关键路径最大耗时": round(float(critical_time.max()), 2) if self.trace_count else 0.0,
+            },
+            "关键路径耗时归因": to_records(self.attribution(critical_only=True, top_k=top_k)),
+            "自身耗时归因": to_records(self.attribution(critical_only=False, top_k=top_k)),
+        }
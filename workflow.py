@@ -1,12 +1,39 @@
-from autogen import ConversableAgent
+from autogen import ConversableAgent, LLMConfig
 from autogen.agentchat import initiate_group_chat
-from autogen.agentchat.group import ExpressionContextCondition, ContextExpression, OnContextCondition, NestedChatTarget
+from autogen.agentchat.group import ContextVariables, ExpressionContextCondition, ContextExpression, OnContextCondition, NestedChatTarget
 from autogen.agentchat.group.patterns import DefaultPattern
-from autogen.agentchat.group.targets.transition_target import AgentNameTarget
-from context_variables import context_variables
-from agent import log_agent, metric_agent, trace_agent, report_agent, review_agent, vote_agent, reviewers, user_proxy, plan_agent
+from autogen.agentchat.group.targets.transition_target import AgentNameTarget, TerminateTarget, RevertToUserTarget, TransitionTarget
+import os
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from context_variables import create_context_variables
+from agent import create_agents
+from consensus import parallel_summary_from_nested_chats, quorum_summary_from_nested_chats, review_mode, reviewer_names, parse_vote, vote_outcome
+from llm_cache import response_cache
+from instrumentation import instrumentation_path, instrumented_run
+from tool import stage_routes, tally_votes
+from checkpoint import checkpoint_path, checkpoint_file, load_checkpoint, restore_context, Checkpointer
+from compaction import CompactionPolicy
+from autogen.agentchat.chat import ChatResult
 
-redundant_agent_names = ["agent_a", "agent_b", "agent_c"]
+import config
+
+# 工作流模式：serial 按 日志→指标→调用链 顺序分析，fanout 三类分析并行进行后再生成报告
+workflow_mode = getattr(config, "workflow_mode", "serial")
+# 编排模式：agent 由 vote_agent 统计投票、plan_agent 调用 route_to_agent 路由；
+# fast 在复审结束后直接解析投票并按 workflow_stage 交接，省去这些只做确定性工作的 LLM 调用
+orchestration_mode = getattr(config, "orchestration_mode", "agent")
+
+redundant_agent_names = reviewer_names
+
+# 并行分析阶段：阶段名 -> (分析智能体, 通过复审后的阶段, 通过复审后的结果键)
+analysis_stages = {
+    "log": ("log_agent", "log_consensus", "final_log_analysis_result"),
+    "metric": ("metric_agent", "metric_consensus", "final_metric_analysis_result"),
+    "trace": ("trace_agent", "trace_consensus", "final_trace_analysis_result"),
+}
 
 def extract_task_message(recipient: ConversableAgent, messages: list, sender: ConversableAgent, config) -> str:
     """从上下文变量中提取任务消息"""
@@ -15,77 +42,373 @@ def extract_task_message(recipient: ConversableAgent, messages: list, sender: Co
         return "There's no task, return UNKNOWN."
     return task
 
-def record_agent_response(sender: ConversableAgent, recipient: ConversableAgent, summary_args: dict) -> str:
-    """记录每个嵌套代理的响应"""
-    context_var_key = f"{recipient.name.lower()}_result"
-    review_agent.context_variables.set(context_var_key, recipient.chat_messages[sender][-1]["content"])
+def create_record_agent_response(review_agent: ConversableAgent):
+    """创建记录函数，将嵌套代理的响应写入 review_agent 的上下文变量"""
+    def record_agent_response(sender: ConversableAgent, recipient: ConversableAgent, summary_args: dict) -> str:
+        """记录每个嵌套代理的响应"""
+        context_var_key = f"{recipient.name.lower()}_result"
+        review_agent.context_variables.set(context_var_key, recipient.chat_messages[sender][-1]["content"])
+
+        results = {key: review_agent.context_variables.get(f"{key}_result") for key in redundant_agent_names}
+        task_completed = all(result != "" for result in results.values())
+        if review_mode == "quorum":
+            # 法定票数模式下，投票结果确定即视为复审完成，未被调用的评审专家不再等待
+            task_completed = task_completed or bool(vote_outcome([parse_vote(result) for result in results.values() if result]))
+
+        if not task_completed:
+            return ""
+        else:
+            review_agent.context_variables.set("review_complete", True)
+            combined_responses = "\n".join(
+                [f"{agent_name}:\n{result}\n\n---"
+                 for agent_name, result in results.items() if result != ""]
+            )
+            return combined_responses
+
+    return record_agent_response
+
+def create_fast_tally(review_agent: ConversableAgent, reply_func):
+    """包装嵌套对话的执行函数：复审完成后直接解析各评审专家的投票并统计，替代 vote_agent 的 LLM 调用"""
+    def tally_after_review(chat_queue: list, recipient: ConversableAgent, messages: list = None, sender: ConversableAgent = None, config=None) -> tuple:
+        final, summary = reply_func(chat_queue, recipient, messages, sender, config)
+        context_variables = review_agent.context_variables
+        if context_variables.get("review_complete"):
+            votes = [parse_vote(context_variables.get(f"{name}_result")) for name in redundant_agent_names
+                     if context_variables.get(f"{name}_result")]
+            message = tally_votes(votes, context_variables)
+            _, route_message = stage_routes.get(context_variables["workflow_stage"], ("", ""))
+            summary = "\n".join(part for part in (summary, message, route_message) if part)
+        return final, summary
+
+    return tally_after_review
+
+def register_fast_routes(agents: dict, approved_target, rejected_target: TransitionTarget) -> None:
+    """快速编排：按 workflow_stage 注册确定性的交接规则。
+    approved_target(stage) 给出投票通过后的交接目标，未通过时交接给 rejected_target"""
+    agents["plan_agent"].handoffs.add_context_conditions([
+        OnContextCondition(
+            target=AgentNameTarget(stage_routes["planning"][0]),
+            condition=ExpressionContextCondition(
+                ContextExpression("${workflow_stage} == 'planning' and len(${plan_result}) > 0")
+            )
+        )
+    ])
+
+    conditions = [
+        OnContextCondition(
+            target=approved_target(stage),
+            condition=ExpressionContextCondition(
+                ContextExpression(f"len(${{current_task}}) == 0 and ${{final_result}} == 'APPROVE' and ${{workflow_stage}} == '{stage}'")
+            )
+        )
+        for stage in ("log_consensus", "metric_consensus", "trace_consensus")
+    ]
+    conditions.append(
+        OnContextCondition(
+            target=rejected_target,
+            condition=ExpressionContextCondition(
+                ContextExpression("len(${current_task}) == 0 and ${final_result} == 'REJECT'")
+            )
+        )
+    )
+    agents["review_agent"].handoffs.add_context_conditions(conditions)
+
+def register_review_handoffs(agents: dict) -> None:
+    """为 review_agent 注册复审（嵌套对话）和投票的交接规则"""
+    review_agent = agents["review_agent"]
+    record_agent_response = create_record_agent_response(review_agent)
 
-    task_completed = all(review_agent.context_variables.get(f"{key}_result") != ""
-                        for key in redundant_agent_names)
+    nested_chat_queue = []
+    for reviewer in agents["reviewers"]:
+        nested_chat = {
+            "recipient": reviewer,
+            "message": extract_task_message,
+            "max_turns": 1,
+            "summary_method": record_agent_response,
+        }
+        nested_chat_queue.append(nested_chat)
 
-    if not task_completed:
-        return ""
-    else:
-        combined_responses = "\n".join(
-            [f"{agent_name}:\n{review_agent.context_variables.get(f'{agent_name}_result')}\n\n---"
-             for agent_name in redundant_agent_names]
+    nested_chat_config = {"chat_queue": nested_chat_queue}
+    if review_mode == "parallel":
+        # 三个评审专家同时复审，一轮复审的耗时约等于一次 LLM 调用
+        nested_chat_config["reply_func_from_nested_chats"] = parallel_summary_from_nested_chats
+    elif review_mode == "quorum":
+        # 分批复审，意见一致时省去多余的评审调用
+        nested_chat_config["reply_func_from_nested_chats"] = quorum_summary_from_nested_chats
+    if orchestration_mode == "fast":
+        nested_chat_config["reply_func_from_nested_chats"] = create_fast_tally(
+            review_agent,
+            nested_chat_config.get("reply_func_from_nested_chats", ConversableAgent._summary_from_nested_chats)
         )
-        return combined_responses
-
-nested_chat_queue = []
-for reviewer in reviewers:
-    nested_chat = {
-        "recipient": reviewer,
-        "message": extract_task_message,
-        "max_turns": 1,
-        "summary_method": record_agent_response,
-    }
-    nested_chat_queue.append(nested_chat)
-
-review_agent.handoffs.add_context_conditions([
-    OnContextCondition(
-        target=NestedChatTarget(
-            nested_chat_config={
-                "chat_queue": nested_chat_queue
-            }
+
+    review_agent.handoffs.add_context_conditions([
+        OnContextCondition(
+            target=NestedChatTarget(
+                nested_chat_config=nested_chat_config
+            ),
+            condition=ExpressionContextCondition(
+                ContextExpression("len(${current_task}) > 0 and not ${review_complete}")
+            )
         ),
-        condition=ExpressionContextCondition(
-            ContextExpression("len(${current_task}) > 0 and (len(${agent_a_result}) == 0 or len(${agent_b_result}) == 0 or len(${agent_c_result}) == 0)")
+        OnContextCondition(
+            target=AgentNameTarget("vote_agent"),
+            condition=ExpressionContextCondition(
+                ContextExpression("len(${current_task}) > 0 and ${review_complete}")
+            )
         )
-    ),
-    OnContextCondition(
-        target=AgentNameTarget("vote_agent"),
-        condition=ExpressionContextCondition(
-            ContextExpression("len(${current_task}) > 0 and len(${agent_a_result}) != 0 and len(${agent_b_result}) != 0 and len(${agent_c_result}) != 0")
+    ])
+
+def create_pattern(agents: dict, context_variables: ContextVariables, initial_agent: str = "plan_agent") -> DefaultPattern:
+    """为一套智能体注册复审和投票的交接规则，并构建群聊模式"""
+    register_review_handoffs(agents)
+    agents["vote_agent"].handoffs.set_after_work(AgentNameTarget("plan_agent"))
+    if orchestration_mode == "fast":
+        # 未通过复审时与 plan_agent 调用 route_to_agent 的结果一致：交回用户
+        register_fast_routes(agents, lambda stage: AgentNameTarget(stage_routes[stage][0]), RevertToUserTarget())
+
+    return DefaultPattern(
+        initial_agent=agents[initial_agent],
+        agents=[
+            agents["plan_agent"],
+            agents["log_agent"],
+            agents["metric_agent"],
+            agents["trace_agent"],
+            agents["review_agent"],
+            agents["vote_agent"],
+            agents["report_agent"]
+        ],
+        user_agent=agents["user_proxy"],
+        context_variables=context_variables,
+    )
+
+def create_stage_pattern(agents: dict, context_variables: ContextVariables, stage: str) -> DefaultPattern:
+    """构建单个分析阶段的群聊模式：分析 → 复审 → 投票，通过后结束，未通过则退回分析智能体重做"""
+    analyst_name, consensus_stage, _ = analysis_stages[stage]
+    register_review_handoffs(agents)
+    agents["vote_agent"].handoffs.add_context_conditions([
+        OnContextCondition(
+            target=TerminateTarget(),
+            condition=ExpressionContextCondition(
+                ContextExpression(f"${{workflow_stage}} == '{consensus_stage}'")
+            )
         )
+    ])
+    agents["vote_agent"].handoffs.set_after_work(AgentNameTarget(analyst_name))
+    if orchestration_mode == "fast":
+        register_fast_routes(agents, lambda stage: TerminateTarget() if stage == consensus_stage else AgentNameTarget(analyst_name), AgentNameTarget(analyst_name))
+
+    return DefaultPattern(
+        initial_agent=agents[analyst_name],
+        agents=[agents[analyst_name], agents["review_agent"], agents["vote_agent"]],
+        context_variables=context_variables,
+    )
+
+class StageMonitor:
+    """在智能体每次回复前检查 workflow_stage，阶段变化时调用 on_stage(阶段, 智能体名)，用于向调用方推送进度"""
+
+    def __init__(self, on_stage: Callable[[str, str], None]):
+        self.on_stage = on_stage
+        self._last_stage = None
+
+    def attach(self, agents: list) -> None:
+        for agent in agents:
+            agent.register_hook(hookable_method="update_agent_state", hook=self.on_turn)
+
+    def on_turn(self, agent: ConversableAgent, messages: list) -> None:
+        stage = agent.context_variables.get("workflow_stage")
+        if stage != self._last_stage:
+            self._last_stage = stage
+            self.on_stage(stage, agent.name)
+
+def run_case_fanout(case_id: str, human_input_mode: str = "ALWAYS", max_rounds: int = 100, checkpoint_dir: str = None, resume: bool = False, on_stage: Callable[[str, str], None] = None, compaction: CompactionPolicy = None, llm: LLMConfig = None):
+    """日志、指标、调用链三个分析阶段（各自含复审）并行运行，全部结束后再由 report_agent 生成最终报告"""
+    current_task = f"Case ID 为{case_id}的任务发生异常，请帮我分析故障原因"
+
+    report_path = checkpoint_file(checkpoint_dir, case_id) if checkpoint_dir else None
+    checkpoint = load_checkpoint(report_path) if report_path and resume else None
+    if checkpoint and restore_context(checkpoint)[1] == "final_report":
+        return completed_run(checkpoint, human_input_mode, llm=llm)
+
+    # 恢复模式下，检查点中已通过复审的阶段不再重跑
+    stage_contexts = {}
+    for stage, (_, _, result_key) in analysis_stages.items():
+        checkpoint = load_checkpoint(checkpoint_file(checkpoint_dir, case_id, stage)) if resume and checkpoint_dir else None
+        if checkpoint and checkpoint["context_variables"].get(result_key):
+            stage_contexts[stage] = ContextVariables(data=checkpoint["context_variables"])
+
+    # 每个阶段使用独立的上下文变量和智能体实例；llm_config 上下文不可跨线程重入，因此先在当前线程中创建
+    stage_patterns = {}
+    stage_checkpointers = {}
+    for stage in analysis_stages:
+        if stage in stage_contexts:
+            continue
+        stage_agents = create_agents(human_input_mode="NEVER", llm=llm)
+        stage_context = create_context_variables()
+        stage_patterns[stage] = create_stage_pattern(stage_agents, stage_context, stage)
+        if checkpoint_dir:
+            checkpointer = Checkpointer(checkpoint_file(checkpoint_dir, case_id, stage), case_id, stage_context)
+            checkpointer.attach([stage_agents[analysis_stages[stage][0]], stage_agents["review_agent"], stage_agents["vote_agent"]])
+            stage_checkpointers[stage] = (checkpointer, stage_agents[analysis_stages[stage][0]])
+        if on_stage is not None:
+            StageMonitor(on_stage).attach([stage_agents[analysis_stages[stage][0]], stage_agents["review_agent"], stage_agents["vote_agent"]])
+        if compaction is not None:
+            compaction.attach([stage_agents[analysis_stages[stage][0]], stage_agents["review_agent"], stage_agents["vote_agent"]])
+
+    def run_stage(stage: str) -> ContextVariables:
+        try:
+            _, stage_context, _ = initiate_group_chat(
+                pattern=stage_patterns[stage],
+                messages=current_task,
+                max_rounds=max_rounds,
+            )
+        finally:
+            if stage in stage_checkpointers:
+                checkpointer, analyst = stage_checkpointers[stage]
+                checkpointer.save_from(analyst)
+        return stage_context
+
+    # 每个阶段携带当前线程上下文的副本，使 LLM 响应缓存在阶段线程中同样生效
+    with ThreadPoolExecutor(max_workers=len(analysis_stages)) as pool:
+        futures = {stage: pool.submit(contextvars.copy_context().run, run_stage, stage) for stage in stage_patterns}
+        stage_contexts.update({stage: future.result() for stage, future in futures.items()})
+
+    # 汇总各阶段通过复审的结果，进入与串行流程相同的报告生成阶段
+    context_variables = create_context_variables()
+    context_variables["plan_result"] = f"根因分析计划：案例ID={case_id}，步骤：日志分析、指标分析、调用链分析并行（各自复审）→报告生成"
+    for stage, (_, _, result_key) in analysis_stages.items():
+        context_variables[result_key] = stage_contexts[stage].get(result_key, "")
+    context_variables["workflow_stage"] = "trace_consensus"
+
+    agents = create_agents(human_input_mode=human_input_mode, llm=llm)
+    report_pattern = DefaultPattern(
+        initial_agent=agents["report_agent"],
+        agents=[agents["report_agent"]],
+        user_agent=agents["user_proxy"],
+        context_variables=context_variables,
     )
-])
-
-vote_agent.handoffs.set_after_work(AgentNameTarget("plan_agent"))
-
-agents = [  
-    plan_agent,  
-    log_agent,  
-    metric_agent,   
-    trace_agent,  
-    review_agent,  
-    vote_agent,  
-    report_agent  
-]  
-
-agent_pattern = DefaultPattern(
-    initial_agent=plan_agent,
-    agents=agents,
-    user_agent=user_proxy,
-    context_variables=context_variables,
-)
-
-current_task = "Case ID 为1的任务发生异常，请帮我分析故障原因"
-
-chat_result, final_context, last_agent = initiate_group_chat(
-    pattern=agent_pattern,
-    messages=f"{current_task}",
-    max_rounds=100,
-)
-
-# 加入结果评分代码
\ No newline at end of file
+
+    checkpointer = None
+    if report_path:
+        checkpointer = Checkpointer(report_path, case_id, context_variables)
+        checkpointer.attach([agents["report_agent"]])
+    if on_stage is not None:
+        StageMonitor(on_stage).attach([agents["report_agent"]])
+    if compaction is not None:
+        compaction.attach([agents["report_agent"]])
+
+    try:
+        return initiate_group_chat(
+            pattern=report_pattern,
+            messages=f"Case ID 为{case_id}的日志、系统指标、调用链分析已完成复审，请生成最终根因分析报告。\n"
+                     f"日志分析结果：{context_variables['final_log_analysis_result'] or '未通过复审'}\n"
+                     f"系统指标分析结果：{context_variables['final_metric_analysis_result'] or '未通过复审'}\n"
+                     f"调用链分析结果：{context_variables['final_trace_analysis_result'] or '未通过复审'}",
+            max_rounds=max_rounds,
+        )
+    finally:
+        if checkpointer is not None:
+            checkpointer.save_from(agents["report_agent"])
+
+def run_case(
+        case_id: str,
+        human_input_mode: str = "ALWAYS",
+        max_rounds: int = 100,
+        mode: str = workflow_mode,
+        cache_mode: str = None,
+        trace_file: str = None,
+        checkpoint_dir: str = None,
+        resume: bool = False,
+        on_stage: Callable[[str, str], None] = None,
+        compaction: str = None,
+        record: bool = True,
+        llm: LLMConfig = None
+):
+    """使用全新的上下文变量和智能体实例，对单个案例运行完整的根因分析工作流。
+    cache_mode 为 LLM 响应缓存模式，trace_file 为运行记录输出文件，record 为 False 时不做运行记录，checkpoint_dir 为检查点目录，
+    resume 时从最近一个已通过复审的阶段继续，on_stage 在工作流阶段变化时被调用，compaction 为对话压缩模式（stage / off，默认取 config.compaction_mode），
+    llm 为创建智能体使用的 LLM 配置（默认取 config.llm_config）"""
+    if not record:
+        trace_file = None
+    elif trace_file is None and instrumentation_path:
+        trace_file = os.path.join(instrumentation_path, f"case_{case_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    checkpoint_dir = checkpoint_dir or checkpoint_path
+
+    # 对话历史压缩（compaction_mode 为 stage 时）：已通过复审的阶段只以结论出现在后续智能体的上下文中，运行结束时输出节省的 token
+    policy = CompactionPolicy(compaction)
+    with response_cache(cache_mode), instrumented_run(trace_file):
+        try:
+            if mode == "fanout":
+                return run_case_fanout(case_id, human_input_mode=human_input_mode, max_rounds=max_rounds, checkpoint_dir=checkpoint_dir, resume=resume, on_stage=on_stage, compaction=policy, llm=llm)
+            return run_case_serial(case_id, human_input_mode=human_input_mode, max_rounds=max_rounds, checkpoint_dir=checkpoint_dir, resume=resume, on_stage=on_stage, compaction=policy, llm=llm)
+        finally:
+            policy.report()
+
+def completed_run(checkpoint: dict, human_input_mode: str = "NEVER", llm: LLMConfig = None):
+    """检查点中报告已生成时不再运行群聊，按 initiate_group_chat 的返回格式给出检查点中的结果"""
+    context_variables, _ = restore_context(checkpoint)
+    agents = create_agents(human_input_mode=human_input_mode, llm=llm)
+    chat_result = ChatResult(chat_history=checkpoint["messages"], summary=context_variables["final_report"], cost={}, human_input=[])
+    return chat_result, context_variables, agents["report_agent"]
+
+def resume_message(current_task: str, context_variables: ContextVariables, stage: str) -> str:
+    """恢复运行时发给下一个智能体的消息：列出已通过复审的结果和接下来的步骤"""
+    lines = [current_task, "已从检查点恢复，此前的进展如下："]
+    if context_variables["plan_result"]:
+        lines.append(f"分析计划：{context_variables['plan_result']}")
+    for label, key in (("日志分析结果", "final_log_analysis_result"), ("系统指标分析结果", "final_metric_analysis_result"), ("调用链分析结果", "final_trace_analysis_result")):
+        if context_variables[key]:
+            lines.append(f"{label}（已通过复审）：{context_variables[key]}")
+    lines.append(stage_routes[stage][1])
+    return "\n".join(lines)
+
+def run_case_serial(case_id: str, human_input_mode: str = "ALWAYS", max_rounds: int = 100, checkpoint_dir: str = None, resume: bool = False, on_stage: Callable[[str, str], None] = None, compaction: CompactionPolicy = None, llm: LLMConfig = None):
+    """按 日志→指标→调用链→报告 顺序运行根因分析工作流"""
+
+    context_variables = create_context_variables()
+    agents = create_agents(human_input_mode=human_input_mode, llm=llm)
+
+    current_task = f"Case ID 为{case_id}的任务发生异常，请帮我分析故障原因"
+    messages = current_task
+    initial_agent = "plan_agent"
+
+    path = checkpoint_file(checkpoint_dir, case_id) if checkpoint_dir else None
+    checkpoint = load_checkpoint(path) if path and resume else None
+    if checkpoint:
+        context_variables, stage = restore_context(checkpoint)
+        if stage == "final_report":
+            return completed_run(checkpoint, human_input_mode, llm=llm)
+        if stage != "planning" or context_variables["plan_result"]:
+            # 从最近一个已通过复审的阶段继续，直接交给该阶段之后的智能体
+            initial_agent = stage_routes[stage][0]
+            messages = resume_message(current_task, context_variables, stage)
+
+    agent_pattern = create_pattern(agents, context_variables, initial_agent=initial_agent)
+
+    checkpointer = None
+    if path:
+        checkpointer = Checkpointer(path, case_id, context_variables)
+        checkpointer.attach([agents[name] for name in ("plan_agent", "log_agent", "metric_agent", "trace_agent", "review_agent", "vote_agent", "report_agent")])
+    if on_stage is not None:
+        StageMonitor(on_stage).attach([agents[name] for name in ("plan_agent", "log_agent", "metric_agent", "trace_agent", "review_agent", "vote_agent", "report_agent")])
+    if compaction is not None:
+        compaction.attach([agents[name] for name in ("plan_agent", "log_agent", "metric_agent", "trace_agent", "review_agent", "vote_agent", "report_agent")])
+
+    try:
+        return initiate_group_chat(
+            pattern=agent_pattern,
+            messages=messages,
+            max_rounds=max_rounds,
+        )
+    finally:
+        if checkpointer is not None:
+            checkpointer.save_from(agents["plan_agent"])
+
+
+if __name__ == "__main__":
+    chat_result, final_context, last_agent = run_case("1")
+
+    # 有标注时对照标注为最终报告评分
+    from evaluate import case_services, load_labels, score_report
+    labels = load_labels(["1"])
+    if "1" in labels and final_context is not None:
+        print(score_report(final_context.get("final_report"), labels["1"], case_services(["1"])["1"]))